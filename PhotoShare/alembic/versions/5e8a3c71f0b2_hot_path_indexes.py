@@ -0,0 +1,38 @@
+"""hot path indexes
+
+Revision ID: 5e8a3c71f0b2
+Revises: d41b7e9a2c58
+Create Date: 2024-06-05 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8a3c71f0b2'
+down_revision: Union[str, None] = 'd41b7e9a2c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_images_created_at_id', 'images', ['created_at', 'id']),
+    ('ix_images_rate_id', 'images', ['rate', 'id']),
+    ('ix_images_user_id_created_at', 'images', ['user_id', 'created_at']),
+    ('ix_comments_image_id_created_at', 'comments', ['image_id', 'created_at']),
+    ('ix_users_username', 'users', ['username']),
+    ('ix_image_m2m_tag_tag_id_image_id', 'image_m2m_tag', ['tag_id', 'image_id']),
+    ('ix_image_m2m_tag_image_id_tag_id', 'image_m2m_tag', ['image_id', 'tag_id']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
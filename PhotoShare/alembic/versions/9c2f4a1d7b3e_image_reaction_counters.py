@@ -0,0 +1,46 @@
+"""image reaction counters
+
+Revision ID: 9c2f4a1d7b3e
+Revises: 478377e897d5
+Create Date: 2024-06-03 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2f4a1d7b3e'
+down_revision: Union[str, None] = '478377e897d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('images', sa.Column(
+        'likes_count', sa.Integer(), server_default='0', nullable=False
+    ))
+    op.add_column('images', sa.Column(
+        'dislikes_count', sa.Integer(), server_default='0', nullable=False
+    ))
+    # Backfill the counters from the reactions stored so far.
+    op.execute("""
+        UPDATE images SET
+            likes_count = (
+                SELECT count(*) FROM image_m2m_user
+                WHERE image_m2m_user.image_id = images.id
+                AND image_m2m_user.user_id_like IS NOT NULL
+            ),
+            dislikes_count = (
+                SELECT count(*) FROM image_m2m_user
+                WHERE image_m2m_user.image_id = images.id
+                AND image_m2m_user.user_id_dislike IS NOT NULL
+            )
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('images', 'dislikes_count')
+    op.drop_column('images', 'likes_count')
@@ -0,0 +1,70 @@
+"""image full text search
+
+Revision ID: a7c9e2f41d06
+Revises: 5e8a3c71f0b2
+Create Date: 2024-06-06 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c9e2f41d06'
+down_revision: Union[str, None] = '5e8a3c71f0b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            ALTER TABLE images ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('simple', coalesce(description, ''))
+            ) STORED
+        """)
+        op.create_index(
+            'ix_images_search_vector', 'images', ['search_vector'],
+            postgresql_using='gin'
+        )
+        return
+    op.execute("""
+        CREATE VIRTUAL TABLE images_fts USING fts5(
+            description, content='images', content_rowid='id'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER images_fts_ai AFTER INSERT ON images BEGIN
+            INSERT INTO images_fts (rowid, description)
+            VALUES (new.id, new.description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER images_fts_ad AFTER DELETE ON images BEGIN
+            INSERT INTO images_fts (images_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER images_fts_au AFTER UPDATE OF description ON images
+        BEGIN
+            INSERT INTO images_fts (images_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+            INSERT INTO images_fts (rowid, description)
+            VALUES (new.id, new.description);
+        END
+    """)
+    op.execute("INSERT INTO images_fts (images_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_images_search_vector', table_name='images')
+        op.drop_column('images', 'search_vector')
+        return
+    for trigger in ('images_fts_ai', 'images_fts_ad', 'images_fts_au'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS images_fts")
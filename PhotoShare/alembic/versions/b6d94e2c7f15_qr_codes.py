@@ -0,0 +1,33 @@
+"""content addressed qr codes
+
+Revision ID: b6d94e2c7f15
+Revises: e5f27b8c1a43
+Create Date: 2024-06-09 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d94e2c7f15'
+down_revision: Union[str, None] = 'e5f27b8c1a43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'qr_codes',
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('url', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('digest')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('qr_codes')
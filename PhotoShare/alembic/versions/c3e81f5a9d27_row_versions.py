@@ -0,0 +1,32 @@
+"""row versions
+
+Revision ID: c3e81f5a9d27
+Revises: a7c9e2f41d06
+Create Date: 2024-06-07 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e81f5a9d27'
+down_revision: Union[str, None] = 'a7c9e2f41d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('images', 'tags', 'users')
+
+
+def upgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column(
+            'version', sa.Integer(), server_default='1', nullable=False
+        ))
+
+
+def downgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.drop_column(table, 'version')
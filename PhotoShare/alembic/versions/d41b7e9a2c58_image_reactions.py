@@ -0,0 +1,100 @@
+"""image reactions
+
+Revision ID: d41b7e9a2c58
+Revises: 9c2f4a1d7b3e
+Create Date: 2024-06-04 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41b7e9a2c58'
+down_revision: Union[str, None] = '9c2f4a1d7b3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'image_reactions',
+        sa.Column('image_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.SmallInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.CheckConstraint('value IN (1, -1)', name='reaction_value'),
+        sa.ForeignKeyConstraint(
+            ['image_id'], ['images.id'], ondelete='CASCADE'
+        ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('image_id', 'user_id')
+    )
+    # A user who somehow both liked and disliked an image keeps the like.
+    op.execute("""
+        INSERT INTO image_reactions (image_id, user_id, value, created_at)
+        SELECT DISTINCT image_id, user_id_like, 1, CURRENT_TIMESTAMP
+        FROM image_m2m_user WHERE user_id_like IS NOT NULL
+    """)
+    op.execute("""
+        INSERT INTO image_reactions (image_id, user_id, value, created_at)
+        SELECT DISTINCT image_id, user_id_dislike, -1, CURRENT_TIMESTAMP
+        FROM image_m2m_user AS m
+        WHERE user_id_dislike IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM image_reactions AS r
+            WHERE r.image_id = m.image_id AND r.user_id = m.user_id_dislike
+        )
+    """)
+    op.execute("""
+        UPDATE images SET
+            likes_count = (
+                SELECT count(*) FROM image_reactions
+                WHERE image_reactions.image_id = images.id
+                AND image_reactions.value = 1
+            ),
+            dislikes_count = (
+                SELECT count(*) FROM image_reactions
+                WHERE image_reactions.image_id = images.id
+                AND image_reactions.value = -1
+            )
+    """)
+    op.execute("""
+        UPDATE images SET rate = CASE
+            WHEN likes_count + dislikes_count = 0 THEN 0.0
+            ELSE round(CAST(
+                CAST(likes_count AS FLOAT) * 100
+                / (likes_count + dislikes_count) AS NUMERIC
+            ), 1)
+        END
+    """)
+    op.drop_table('image_m2m_user')
+
+
+def downgrade() -> None:
+    op.create_table(
+        'image_m2m_user',
+        sa.Column('image_id', sa.Integer(), nullable=True),
+        sa.Column('user_id_like', sa.Integer(), nullable=True),
+        sa.Column('user_id_dislike', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['image_id'], ['images.id']),
+        sa.ForeignKeyConstraint(['user_id_like'], ['users.id']),
+        sa.ForeignKeyConstraint(['user_id_dislike'], ['users.id']),
+        sa.UniqueConstraint('image_id', 'user_id_like', name='unique_like'),
+        sa.UniqueConstraint(
+            'image_id', 'user_id_dislike', name='unique_dislike'
+        ),
+        sa.UniqueConstraint(
+            'image_id', 'user_id_like', 'user_id_dislike',
+            name='unique_like_dislike'
+        )
+    )
+    op.execute("""
+        INSERT INTO image_m2m_user (image_id, user_id_like, user_id_dislike)
+        SELECT image_id,
+            CASE WHEN value = 1 THEN user_id END,
+            CASE WHEN value = -1 THEN user_id END
+        FROM image_reactions
+    """)
+    op.drop_table('image_reactions')
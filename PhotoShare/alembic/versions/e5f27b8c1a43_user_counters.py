@@ -0,0 +1,47 @@
+"""user profile counters
+
+Revision ID: e5f27b8c1a43
+Revises: c3e81f5a9d27
+Create Date: 2024-06-08 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f27b8c1a43'
+down_revision: Union[str, None] = 'c3e81f5a9d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = ('images_count', 'comments_count', 'likes_received')
+
+
+def upgrade() -> None:
+    for counter in COUNTERS:
+        op.add_column('users', sa.Column(
+            counter, sa.Integer(), server_default='0', nullable=False
+        ))
+    op.execute("""
+        UPDATE users SET
+            images_count = (
+                SELECT count(*) FROM images
+                WHERE images.user_id = users.id
+            ),
+            comments_count = (
+                SELECT count(*) FROM comments
+                WHERE comments.user_id = users.id
+            ),
+            likes_received = (
+                SELECT coalesce(sum(images.likes_count), 0) FROM images
+                WHERE images.user_id = users.id
+            )
+    """)
+
+
+def downgrade() -> None:
+    for counter in reversed(COUNTERS):
+        op.drop_column('users', counter)
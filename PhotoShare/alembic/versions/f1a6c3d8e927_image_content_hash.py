@@ -0,0 +1,32 @@
+"""image content hash
+
+Revision ID: f1a6c3d8e927
+Revises: b6d94e2c7f15
+Create Date: 2024-06-10 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a6c3d8e927'
+down_revision: Union[str, None] = 'b6d94e2c7f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('images', sa.Column(
+        'content_hash', sa.String(length=64), nullable=True
+    ))
+    op.create_index(
+        'ix_images_content_hash', 'images', ['content_hash'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_images_content_hash', table_name='images')
+    op.drop_column('images', 'content_hash')
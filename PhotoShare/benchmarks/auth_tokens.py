@@ -0,0 +1,97 @@
+"""
+Benchmark of access token verification with and without the token cache.
+
+Requests are drawn from a Zipf distribution over the live access tokens:
+a few busy clients send most requests, a long tail sends a few each, and
+every client keeps resending its token until it expires.
+
+Run from the PhotoShare directory with the application settings in the
+environment::
+
+    python -m benchmarks.auth_tokens --tokens 500 --requests 50000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import photoshare.services.auth as auth
+from photoshare.conf.config import settings
+from photoshare.services.cache import TokenCache
+
+
+def make_tokens(count: int) -> list[str]:
+    """
+    Function to issue one access token per simulated client
+
+    :param count: int: Number of clients
+    :return: list[str]: Encoded access tokens
+    """
+    async def issue():
+        return [
+            await auth.auth_service.create_access_token(
+                {"sub": f"client{i}@example.com"}
+            )
+            for i in range(count)
+        ]
+    return asyncio.run(issue())
+
+
+def make_requests(tokens: list[str], count: int, skew: float, seed: int):
+    """
+    Function to draw the token sent with every request
+
+    :param tokens: list[str]: Access tokens, the first ones are busiest
+    :param count: int: Number of requests
+    :param skew: float: Zipf exponent
+    :param seed: int: Random seed
+    :return: list[str]: Token of each request
+    """
+    weights = [1 / rank ** skew for rank in range(1, len(tokens) + 1)]
+    return random.Random(seed).choices(tokens, weights=weights, k=count)
+
+
+def run(requests: list[str], cache: TokenCache) -> tuple[float, dict]:
+    """
+    Function to verify every request's token with the given cache
+
+    :param requests: list[str]: Token of each request
+    :param cache: TokenCache: Cache used by the auth service
+    :return: tuple: CPU microseconds per request and the cache counters
+    """
+    auth.token_cache = cache
+    started = time.process_time()
+    for token in requests:
+        if auth.auth_service.decode_access_token(token) is None:
+            raise RuntimeError("token rejected")
+    elapsed = time.process_time() - started
+    return elapsed / len(requests) * 1e6, cache.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument(
+        "--cache-size", type=int, default=settings.token_cache_size
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    requests = make_requests(
+        make_tokens(args.tokens), args.requests, args.skew, args.seed
+    )
+    baseline, _ = run(requests, TokenCache(0))
+    cached, stats = run(requests, TokenCache(args.cache_size))
+
+    print(f"requests: {args.requests}, tokens: {args.tokens}, "
+          f"zipf skew: {args.skew}, cache size: {args.cache_size}")
+    print(f"jwt.decode on every request: {baseline:8.2f} us CPU/request")
+    print(f"token cache:                 {cached:8.2f} us CPU/request")
+    print(f"speedup: {baseline / cached:.1f}x, "
+          f"hit rate: {stats['hit_rate']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of the local transformation engine, cold and from the cache.
+
+Every preset of a set of generated photos is requested concurrently, first
+with an empty derived image cache, which renders them in the job process
+pool, and then again, which serves them from the cache. Nothing leaves the
+machine, so it runs offline.
+
+Run from the PhotoShare directory with the application settings in the
+environment::
+
+    python -m benchmarks.transformations --photos 20 --size 3000x2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image
+
+from photoshare.services.derived import DerivedCache
+from photoshare.services.jobs import shutdown_process_pool
+from photoshare.services.render import PRESETS
+
+
+def make_photos(root: str, count: int, size: tuple[int, int], seed: int):
+    """
+    Function to write noisy JPEG photos, which compress like real ones
+
+    :param root: str: Directory of the photos
+    :param count: int: Number of photos
+    :param size: tuple[int, int]: Width and height of every photo
+    :param seed: int: Random seed
+    :return: list[str]: Paths of the photos
+    """
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        photo = Image.blend(
+            Image.new("RGB", size, color),
+            Image.effect_noise(size, 64).convert("RGB"),
+            0.3,
+        )
+        path = os.path.join(root, f"photo{i}.jpg")
+        photo.save(path, format="JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+async def run(cache: DerivedCache, photos: list[str]) -> float:
+    """
+    Function to request every preset of every photo at once
+
+    :param cache: DerivedCache: Cache serving the renderings
+    :param photos: list[str]: Paths of the photos
+    :return: float: Wall clock milliseconds per rendering
+    """
+    started = time.perf_counter()
+    paths = await asyncio.gather(*(
+        cache.get(photo, preset) for photo in photos for preset in PRESETS
+    ))
+    elapsed = time.perf_counter() - started
+    for path in paths:
+        cache.release(path)
+    return elapsed / (len(photos) * len(PRESETS)) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--photos", type=int, default=20)
+    parser.add_argument("--size", default="3000x2000")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    size = tuple(int(side) for side in args.size.split("x"))
+
+    with tempfile.TemporaryDirectory(prefix="photoshare-bench-") as root:
+        photos = make_photos(root, args.photos, size, args.seed)
+        cache = DerivedCache(os.path.join(root, "derived"), 1 << 40)
+        try:
+            cold = asyncio.run(run(cache, photos))
+            warm = asyncio.run(run(cache, photos))
+        finally:
+            shutdown_process_pool()
+        stats = cache.stats()
+
+    print(f"photos: {args.photos} of {args.size}, presets: {len(PRESETS)}")
+    print(f"rendered:   {cold:8.2f} ms/rendering")
+    print(f"from cache: {warm:8.2f} ms/rendering")
+    print(f"speedup: {cold / warm:.1f}x, hit rate: {stats['hit_rate']:.2%}, "
+          f"cached: {stats['size_bytes'] / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
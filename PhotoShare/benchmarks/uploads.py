@@ -0,0 +1,185 @@
+"""
+Benchmark of the memory taken by concurrent streaming image uploads.
+
+Many clients upload large images at once through the upload path of the
+API: the body limit, the multipart parser, the streaming size, type and
+hash check and the local disk storage. Bodies are streamed in chunks
+without a Content-Length, like a client would send a file, and the peak
+RSS of the process is sampled while they arrive. A second round sends
+bodies over the limit, which are cut off as soon as they pass it.
+
+Run from the PhotoShare directory with the application settings in the
+environment, on Linux::
+
+    python -m benchmarks.uploads --uploads 100 --size-mb 16
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from photoshare.services.ingest import (
+    CHUNK_SIZE, MULTIPART_OVERHEAD, UploadLimitMiddleware, inspect_upload
+)
+from photoshare.services.storage import LocalStorage
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def rss() -> int:
+    """
+    Function to read the resident set size of this process
+
+    :return: int: Resident bytes
+    """
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * PAGE_SIZE
+
+
+class PeakRss:
+    """
+    Context manager sampling the resident set size in a thread and keeping
+    the peak above the size on entry.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss() - self.base)
+
+    def __enter__(self):
+        self.base = rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+class ImageStream:
+    """
+    File-like PNG body of a given size, produced chunk by chunk.
+    """
+
+    header = b"\x89PNG\r\n\x1a\n"
+    block = os.urandom(CHUNK_SIZE)
+
+    def __init__(self, size: int):
+        self.left = size
+        self.first = True
+
+    def read(self, size: int = -1) -> bytes:
+        size = CHUNK_SIZE if size < 0 else min(size, CHUNK_SIZE)
+        chunk = (self.header + self.block)[:size] if self.first \
+            else self.block[:size]
+        self.first = False
+        chunk = chunk[:self.left]
+        self.left -= len(chunk)
+        return chunk
+
+
+def make_app(storage: LocalStorage, max_bytes: int) -> FastAPI:
+    """
+    Function to build an application with the upload path of the API
+
+    :param storage: LocalStorage: Storage of the uploads
+    :param max_bytes: int: Largest accepted image
+    :return: FastAPI: The application
+    """
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        _, suffix = await run_in_threadpool(
+            inspect_upload, file.file, max_bytes
+        )
+        url = await run_in_threadpool(storage.upload, file.file, suffix)
+        await run_in_threadpool(storage.delete, url)
+        return {"url": url}
+
+    app.add_middleware(UploadLimitMiddleware, limits={
+        "/upload": max_bytes + MULTIPART_OVERHEAD
+    })
+    return app
+
+
+async def run(app: FastAPI, uploads: int, size: int) -> tuple[list, float]:
+    """
+    Function to send concurrent uploads
+
+    :param app: FastAPI: The application
+    :param uploads: int: Number of concurrent uploads
+    :param size: int: Size of every image in bytes
+    :return: tuple: Status codes and wall clock seconds
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/upload", files={
+                "file": ("photo.png", ImageStream(size), "image/png")
+            })
+            for _ in range(uploads)
+        ))
+    return [response.status_code for response in responses], \
+        time.perf_counter() - started
+
+
+def run_and_check(app: FastAPI, uploads: int, size: int, expected: int):
+    """
+    Function to run a round of uploads and check their outcome
+
+    :param app: FastAPI: The application
+    :param uploads: int: Number of concurrent uploads
+    :param size: int: Size of every image in bytes
+    :param expected: int: Status code every upload should get
+    :return: tuple: Status codes and wall clock seconds
+    """
+    codes, elapsed = asyncio.run(run(app, uploads, size))
+    if set(codes) != {expected}:
+        raise RuntimeError(f"expected {expected}, got {sorted(set(codes))}")
+    return codes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--size-mb", type=float, default=16)
+    parser.add_argument("--max-mb", type=float, default=20)
+    args = parser.parse_args()
+    size = int(args.size_mb * 1024 * 1024)
+    max_bytes = int(args.max_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory(prefix="photoshare-bench-") as root:
+        app = make_app(LocalStorage(root, "/media"), max_bytes)
+        with PeakRss() as accepted:
+            _, elapsed = run_and_check(app, args.uploads, size, 200)
+        with PeakRss() as refused:
+            _, cut = run_and_check(app, args.uploads, max_bytes * 2, 413)
+
+    total = args.uploads * size / 1024 ** 2
+    print(f"uploads: {args.uploads} x {args.size_mb:g} MiB, "
+          f"limit: {args.max_mb:g} MiB")
+    print(f"accepted: {accepted.peak / 1024 ** 2:8.1f} MiB peak RSS, "
+          f"{accepted.peak / args.uploads / 1024:.0f} KiB per upload, "
+          f"{total / elapsed:.0f} MiB/s")
+    print(f"oversized: {refused.peak / 1024 ** 2:7.1f} MiB peak RSS, "
+          f"all refused in {cut:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,52 @@
 import sys
-from fastapi import FastAPI, HTTPException, Depends
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from photoshare.routes import images, tags, auth, comment, users
+from photoshare.routes import (
+    images, tags, auth, comment, users, metrics, reactions, jobs, media
+)
 import uvicorn
 from photoshare.conf.config import settings
 
-from photoshare.database.db import Session, get_db
+from photoshare.database.db import (
+    AsyncLocalSession, AsyncSession, async_engine, get_read_db
+)
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
 from fastapi.responses import HTMLResponse
-from photoshare.database.models import Image, Tag
+from photoshare.database.models import Image, Tag, create_schema
+from photoshare.repository.images import PAGE_SIZE, get_feed_func
+from photoshare.services.ingest import (
+    MULTIPART_OVERHEAD, UploadLimitMiddleware
+)
+from photoshare.services.jobs import shutdown_process_pool
+from photoshare.services.leaderboard import ensure_built
+from photoshare.services.pagination import NEXT_CURSOR_HEADER
+from photoshare.services.storage import (
+    LocalStorage, media_mount_path, storage
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates the tables of a database without migrations and builds the
+    image leaderboard on start up if they don't exist yet, and stops the
+    job process pool on shutdown.
+
+    :param app: The application.
+    """
+    async with async_engine.begin() as connection:
+        await connection.run_sync(create_schema)
+    async with AsyncLocalSession() as db:
+        await ensure_built(db)
+    yield
+    shutdown_process_pool()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 origins = ["*"]
 
@@ -21,13 +56,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/photoshare/images/add_from_pc":
+        settings.upload_max_bytes + MULTIPART_OVERHEAD,
+    "/photoshare/images/add_batch": settings.batch_upload_max_files
+        * (settings.upload_max_bytes + MULTIPART_OVERHEAD),
+})
 
 app.include_router(images.router, prefix='/photoshare')
 app.include_router(comment.router, prefix='/photoshare')
+app.include_router(reactions.router, prefix='/photoshare')
 app.include_router(auth.router, prefix='/api')
 app.include_router(tags.router, prefix='/photoshare')
 app.include_router(users.router, prefix='/photoshare')
+app.include_router(metrics.router, prefix='/api')
+app.include_router(jobs.router, prefix='/photoshare')
+if isinstance(storage, LocalStorage):
+    # Before the media mount, which would serve the originals under it
+    app.include_router(media.router)
 
 # If we generate the documentation with Sphinx, we need to mock the
 # StaticFiles class. And if we run the application, everything will work ok.
@@ -42,6 +90,11 @@ if 'StaticFiles' in globals():
     app.mount(
         "/static", StaticFiles(directory="photoshare/static"), name="static"
     )
+    if isinstance(storage, LocalStorage):
+        app.mount(
+            media_mount_path(), StaticFiles(directory=storage.root),
+            name="media"
+        )
 
 templates = Jinja2Templates(directory="photoshare/services/templates")
 
@@ -49,18 +102,23 @@ templates = Jinja2Templates(directory="photoshare/services/templates")
 @app.get("/", response_class=HTMLResponse)
 async def main_page(
     request: Request,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Main page for the PhotoShare application.
 
     :param request: The request object.
+    :param cursor: The cursor returned with the previous page.
+    :param limit: The number of images on the page.
     :param db: Database session
     :return: The main page
     """
-    images = db.query(Image).all()
+    images, next_cursor = await get_feed_func(db, cursor, limit)
     return templates.TemplateResponse(
-        "index.html", {"request": request, "images": images}
+        "index.html",
+        {"request": request, "images": images, "next_cursor": next_cursor}
     )
 
 
@@ -9,6 +9,13 @@ class Settings(BaseSettings):
 
     Attributes:
     - sqlalchemy_database_url (str): The URL for connecting to the PostgreSQL database.
+    - sqlalchemy_replica_url (str | None): The URL of a read replica, reads use the primary if unset.
+    - replica_read_your_writes_seconds (int): Seconds a client reads from the primary after a write.
+    - db_pool_size (int): The number of connections kept open in the pool.
+    - db_max_overflow (int): The number of extra connections allowed above the pool size.
+    - db_pool_timeout (float): Seconds to wait for a free connection before giving up.
+    - db_pool_recycle (int): Seconds after which a pooled connection is replaced.
+    - db_pool_pre_ping (bool): Whether to test connections before handing them out.
     - secret_key (str): The secret key used for cryptographic operations.
     - algorithm (str): The algorithm used for cryptographic operations.
     - mail_username (str): The username for accessing the mail server.
@@ -18,6 +25,29 @@ class Settings(BaseSettings):
     - mail_server (str): The address of the mail server.
     - redis_host (str): The hostname of the Redis server.
     - redis_port (int): The port number for the Redis server.
+    - redis_password (str): The password of the Redis server.
+    - redis_timeout (float): Seconds to wait for Redis before falling back to the database.
+    - user_cache_ttl (int): Seconds an authenticated user snapshot stays cached.
+    - token_cache_size (int): Number of verified access tokens kept in memory, 0 disables the cache.
+    - tag_cache_size (int): Number of tag name to id mappings kept in memory, 0 disables the cache.
+    - leaderboard_backend (str): Where the image leaderboard lives, "redis" or "memory" for a single process.
+    - upload_workers (int): The number of threads uploading to the media storage.
+    - upload_queue_size (int): The number of uploads waiting for a thread before new ones are rejected.
+    - upload_timeout (float): Seconds a request waits for its upload to the media storage.
+    - upload_max_bytes (int): The size of the largest image file accepted.
+    - batch_upload_max_files (int): The number of files one batch upload may carry.
+    - batch_upload_concurrency (int): The number of files of one batch uploaded at a time.
+    - storage_backend (str): Where image files are stored, "cloudinary" or "local" for the local disk.
+    - media_root (str): The directory of the local storage.
+    - media_url (str): The URL the local storage is served at, a path or an absolute URL.
+    - derived_root (str): The directory caching transformed images of the local storage.
+    - derived_cache_bytes (int): The size the cached transformed images are kept under.
+    - job_backend (str): Where background jobs wait, "redis" for separate workers or "memory" to run them in the API process.
+    - job_ttl (int): Seconds the status of a background job is kept.
+    - job_concurrency (int): The number of jobs a worker runs at a time.
+    - job_processes (int): The number of processes running CPU bound job steps.
+    - job_timeout (int): Seconds a background job may run before it fails.
+    - job_max_attempts (int): Runs of a background job before it fails for good when its workers die.
     - cloudinary_name (str): The name of the Cloudinary account.
     - cloudinary_api_key (str): The API key for accessing the Cloudinary API.
     - cloudinary_api_secret (str): The API secret for accessing the Cloudinary API.
@@ -28,6 +58,13 @@ class Settings(BaseSettings):
     - extra (str): The behavior for extra fields in the environment file (default: "ignore").
     """
     sqlalchemy_database_url: str
+    sqlalchemy_replica_url: str | None = None
+    replica_read_your_writes_seconds: int = 5
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
     secret_key: str
     algorithm: str
     mail_username: str
@@ -38,6 +75,28 @@ class Settings(BaseSettings):
     redis_host: str
     redis_port: int
     redis_password: str
+    redis_timeout: float = 1.0
+    user_cache_ttl: int = 60
+    token_cache_size: int = 4096
+    tag_cache_size: int = 10000
+    leaderboard_backend: str = "redis"
+    upload_workers: int = 8
+    upload_queue_size: int = 32
+    upload_timeout: float = 60.0
+    upload_max_bytes: int = 20 * 1024 * 1024
+    batch_upload_max_files: int = 20
+    batch_upload_concurrency: int = 4
+    storage_backend: str = "cloudinary"
+    media_root: str = "media"
+    media_url: str = "/media"
+    derived_root: str = "derived"
+    derived_cache_bytes: int = 512 * 1024 * 1024
+    job_backend: str = "redis"
+    job_ttl: int = 86400
+    job_concurrency: int = 4
+    job_processes: int = 2
+    job_timeout: int = 600
+    job_max_attempts: int = 3
     cloudinary_name: str
     cloudinary_api_key: int | str
     cloudinary_api_secret: str
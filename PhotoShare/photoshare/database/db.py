@@ -1,26 +1,234 @@
-from sqlalchemy import create_engine
+import time
+
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncSession, async_sessionmaker, create_async_engine
+)
 from sqlalchemy.orm import sessionmaker, Session
 
 
 from photoshare.conf.config import settings
+from photoshare.database.pool import MonitoredQueuePool, pool_status
+
+PRIMARY_COOKIE = "photoshare_primary_until"
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def to_async_url(url: str | URL) -> URL:
+    """
+    The to_async_url function swaps the driver of a database URL for its
+    asyncio counterpart, so the same setting can feed both engines.
+
+    :param url: Synchronous database URL
+    :return: The URL with an async driver
+    """
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=drivername)
+
+
+def pool_options(url: str | URL) -> dict:
+    """
+    The pool_options function builds the connection pool arguments from the
+    settings. SQLite keeps the pool SQLAlchemy picks for it, because its
+    single-file and in-memory pools do not accept sizing arguments.
+
+    :param url: Database URL
+    :return: Keyword arguments for create_engine
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def enable_foreign_keys(engine) -> None:
+    """
+    The enable_foreign_keys function turns on foreign key enforcement for
+    every connection of a SQLite engine. SQLite leaves it off, and the
+    models rely on ON DELETE CASCADE to remove the rows of deleted images
+    and users. Other databases always enforce foreign keys.
+
+    :param engine: A synchronous Engine, or the sync_engine of an AsyncEngine
+    :return: None
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def create_app_engine(url: str | URL):
+    """
+    The create_app_engine function creates the async engine used to serve
+    requests, with the configured and monitored connection pool.
+
+    :param url: Synchronous database URL
+    :return: An AsyncEngine
+    """
+    options = pool_options(url)
+    if options:
+        options["poolclass"] = MonitoredQueuePool
+    async_engine = create_async_engine(to_async_url(url), **options)
+    enable_foreign_keys(async_engine.sync_engine)
+    return async_engine
+
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+# The synchronous engine stays for Alembic, schema creation and the tests.
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL)
+)
+enable_foreign_keys(engine)
 
 LocalSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_app_engine(SQLALCHEMY_DATABASE_URL)
+
+AsyncLocalSession = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+SQLALCHEMY_REPLICA_URL = settings.sqlalchemy_replica_url
+
+replica_engine = (
+    create_app_engine(SQLALCHEMY_REPLICA_URL)
+    if SQLALCHEMY_REPLICA_URL else None
+)
+
+AsyncReplicaSession = (
+    async_sessionmaker(
+        replica_engine, autoflush=False, expire_on_commit=False
+    )
+    if replica_engine is not None else AsyncLocalSession
+)
+
 
-def get_db():
+def dialect_insert(db: AsyncSession, table):
     """
-    The get_db function opens a new database connection if there is none yet
-    for the current application context.
-    It also binds the session to the current context so that you don’t have to
-    use db.session in each view function.
+    The dialect_insert function builds an INSERT for the database behind the
+    session, with the ON CONFLICT clauses used for upserts. PostgreSQL and
+    SQLite share the same API for them.
 
-    :return: A generator object
+    :param db: The session the statement will run on
+    :param table: The model or table to insert into
+    :return: A dialect specific Insert construct
+    """
+    return DIALECT_INSERTS[db.get_bind().dialect.name](table)
+
+
+async def touch_versions(db: AsyncSession, model, *criteria) -> None:
+    """
+    The touch_versions function moves the version of rows whose response
+    changed without the row itself being updated through the ORM, e.g. an
+    image getting a comment. Clients holding the old ETag get a fresh copy.
+
+    :param db: The session the statement will run on
+    :param model: The versioned model
+    :param criteria: Filter criteria of the rows to touch
+    :return: None
+    """
+    await db.execute(
+        update(model).where(*criteria)
+        .values(version=model.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def get_pool_status(replica: bool = False) -> dict:
+    """
+    The get_pool_status function reports the state of a request engine's
+    connection pool: checked-out, idle and overflow connections along with
+    checkout wait times.
+
+    :param replica: Report the read replica pool instead of the primary
+    :return: A dictionary with the pool statistics
+    """
+    if replica and replica_engine is not None:
+        return pool_status(replica_engine.pool)
+    return pool_status(async_engine.pool)
+
+
+def pin_primary(response: Response) -> None:
+    """
+    The pin_primary dependency marks the client as a recent writer. For the
+    next few seconds its reads go to the primary, so it sees its own
+    changes even if the replica is lagging behind.
+
+    :param response: The outgoing response carrying the cookie
+    :return: None
+    """
+    window = settings.replica_read_your_writes_seconds
+    response.set_cookie(
+        PRIMARY_COOKIE,
+        str(int(time.time()) + window),
+        max_age=window,
+        httponly=True,
+        samesite="lax",
+    )
+
+
+def read_sessionmaker(request: Request) -> async_sessionmaker:
+    """
+    The read_sessionmaker function picks the session factory for a
+    read-only request: the replica, unless there is none or the client wrote
+    something recently.
+
+    :param request: The incoming request
+    :return: The session factory to read with
     """
-    db = LocalSession()
     try:
+        pinned_until = int(request.cookies.get(PRIMARY_COOKIE, 0))
+    except ValueError:
+        pinned_until = 0
+    if pinned_until >= time.time():
+        return AsyncLocalSession
+    return AsyncReplicaSession
+
+
+async def get_db():
+    """
+    The get_db function opens a new asynchronous database session for the
+    current request and closes it once the response has been sent.
+    Sessions do not expire objects on commit, so the returned models can be
+    serialized without extra round-trips.
+
+    :return: An async generator object
+    """
+    async with AsyncLocalSession() as db:
+        yield db
+
+
+async def get_read_db(request: Request):
+    """
+    The get_read_db function opens a session for read-only requests. It is
+    bound to the read replica when one is configured and the client has not
+    written anything within the read-your-writes window.
+
+    :param request: The incoming request
+    :return: An async generator object
+    """
+    async with read_sessionmaker(request)() as db:
         yield db
-    finally:
-        db.close()
@@ -1,12 +1,13 @@
 from sqlalchemy import (
-    Table, Column, String, Integer, ForeignKey, func, UniqueConstraint
+    Table, Column, String, Integer, SmallInteger, ForeignKey, func,
+    CheckConstraint, Index, event, inspect
 )
 from sqlalchemy.orm import (
-    Mapped, mapped_column, relationship, declarative_base
+    Mapped, mapped_column, relationship, declarative_base, backref
 )
 from datetime import datetime
 
-from photoshare.database.db import engine
+from photoshare.database.search import attach_search_ddl
 
 Base = declarative_base()
 
@@ -16,23 +17,11 @@ image_m2m_tag = Table(
     Column("id", Integer, primary_key=True),
     Column("image_id", Integer, ForeignKey("images.id", ondelete="CASCADE")),
     Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE")),
+    # Tag search joins from tags, loading image tags joins from images
+    Index("ix_image_m2m_tag_tag_id_image_id", "tag_id", "image_id"),
+    Index("ix_image_m2m_tag_image_id_tag_id", "image_id", "tag_id"),
 )
 
-image_m2m_user = Table(
-    'image_m2m_user',
-    Base.metadata,
-    Column('image_id', Integer, ForeignKey('images.id')),
-    Column('user_id_like', Integer, ForeignKey('users.id'), nullable=True),
-    Column('user_id_dislike', Integer, ForeignKey('users.id'), nullable=True),
-    UniqueConstraint('image_id', 'user_id_like', name='unique_like'),
-    UniqueConstraint('image_id', 'user_id_dislike', name='unique_dislike'),
-    UniqueConstraint(
-        'image_id', 'user_id_like', 'user_id_dislike',
-        name='unique_like_dislike'
-    )
-)
-
-
 
 class Image(Base):
     """
@@ -43,109 +32,98 @@ class Image(Base):
     :param description: str: Image description
     :param tags: List[Tag]: Image tags
     :param comments: List[Comment]: Image comments
+    :param reactions: List[ImageReaction]: Likes and dislikes
     :param rate: float: Image rate
+    :param likes_count: int: Number of likes
+    :param dislikes_count: int: Number of dislikes
     :param url_view: str: Edited image view url
     :param qr_code_view: str: Edited image QR code view url
     :param created_at: datetime: Image creation date
     :param user_id: int: User id
     :param user: User: User object
+    :param version: int: Row version, moves when the image response changes
+    :param content_hash: str: SHA-256 of the uploaded file, shared by the
+        images storing the same file
     """
     __tablename__ = "images"
+    __table_args__ = (
+        # Keyset pagination of the feed and the rating
+        Index("ix_images_created_at_id", "created_at", "id"),
+        Index("ix_images_rate_id", "rate", "id"),
+        # Profile image counts and search by user
+        Index("ix_images_user_id_created_at", "user_id", "created_at"),
+        # Upload deduplication
+        Index("ix_images_content_hash", "content_hash"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     url: Mapped[str] = mapped_column(String(255))
     description: Mapped[str] = mapped_column(String(255))
     tags = relationship("Tag", secondary=image_m2m_tag, backref="images")
-    comments = relationship('Comment', backref='images')
-    _likes = relationship(
-        'User', secondary=image_m2m_user,
-        primaryjoin='Image.id == image_m2m_user.c.image_id',
-        secondaryjoin='User.id == image_m2m_user.c.user_id_like',
-        foreign_keys='[image_m2m_user.c.image_id, image_m2m_user.c.user_id_like]',
-        backref='liked_images',
-        overlaps="disliked_images,dislikes,_dislikes"
-    )
-    _dislikes = relationship(
-        'User', secondary=image_m2m_user,
-        primaryjoin='Image.id == image_m2m_user.c.image_id',
-        secondaryjoin='User.id == image_m2m_user.c.user_id_dislike',
-        foreign_keys='[image_m2m_user.c.image_id, image_m2m_user.c.user_id_dislike]',
-        backref='disliked_images',
-        overlaps="liked_images,likes,_likes"
+    comments = relationship(
+        'Comment', backref='images', cascade='all, delete-orphan',
+        passive_deletes=True
     )
     rate: Mapped[float] = mapped_column(default=0.0)
+    likes_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    dislikes_count: Mapped[int] = mapped_column(
+        default=0, server_default="0"
+    )
     url_view: Mapped[str | None] = mapped_column(String(255), default=None)
     qr_code_view: Mapped[str | None] = mapped_column(String(255), default=None)
     created_at: Mapped[datetime] = mapped_column(default=func.now())
     user_id: Mapped[int] = mapped_column(
         ForeignKey('users.id', ondelete='CASCADE')
     )
-    user = relationship('User', backref="images")
+    # Profiles read the user's counters instead of this collection, so it
+    # raises rather than lazy loading and user deletes cascade in the DB.
+    user = relationship(
+        'User', backref=backref("images", lazy="raise", passive_deletes=True)
+    )
+    reactions = relationship(
+        'ImageReaction', cascade='all, delete-orphan', passive_deletes=True
+    )
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
+    content_hash: Mapped[str | None] = mapped_column(
+        String(64), default=None
+    )
 
     def __init__(self, *args, **kwargs):
+        kwargs.setdefault("likes_count", 0)
+        kwargs.setdefault("dislikes_count", 0)
         super().__init__(*args, **kwargs)
-        self._likes = []
-        self._dislikes = []
 
     @property
     def likes(self):
         """int: The number of likes for the image"""
-        return len(self._likes)
+        return self.likes_count
 
     @property
     def dislikes(self):
         """int: The number of dislikes for the image"""
-        return len(self._dislikes)
-
-    def update_like(self, user, operation):
-        """
-        Method for updating likes for the image
-
-        :param user: User: User object
-        :param operation: str: Operation type ('add' or 'remove')
-        :return: None
-        """
-        if operation == 'add':
-            # Перевірка чи користувач не ставив вже лайк на картинку
-            if user not in self._likes:
-                # Якщо користувач вже ставив дизлайк, то видаляємо його
-                if user in self._dislikes:
-                    self._dislikes.remove(user)
-                # Додаємо користувача до списку лайків
-                self._likes.append(user)
-                self.update_rate()
-        elif operation == 'remove':
-            if user in self._likes:
-                self._likes.remove(user)
-                self.update_rate()
-
-    def update_dislike(self, user, operation):
-        """
-        Method for updating dislikes for the image
-
-        :param user: User: User object
-        :param operation: str: Operation type ('add' or 'remove')
-        :return: None
-        """
-        if operation == 'add':
-            if user not in self._dislikes:
-                if user in self._likes:
-                    self._likes.remove(user)
-                self._dislikes.append(user)
-                self.update_rate()
-        elif operation == 'remove':
-            self._dislikes.remove(user)
-            self.update_rate()
-
-    # Автоматично оновлює рейтинг коли змінюється кількість лайків або
-    # дизлайків через методи update_like та update_dislike
-    def update_rate(self):
-        """Method for updating image rate"""
-        total_amount = self.likes + self.dislikes
-
-        if total_amount == 0:
-            self.rate =  0.0
-        else:
-            self.rate = round((self.likes / total_amount) * 100, 1)
+        return self.dislikes_count
+
+
+class ImageReaction(Base):
+    """
+    Model for image_reactions table, one row per user who reacted to an image
+
+    :param image_id: int: Image id
+    :param user_id: int: User id
+    :param value: int: 1 for a like, -1 for a dislike
+    :param created_at: datetime: Reaction date
+    """
+    __tablename__ = "image_reactions"
+    __table_args__ = (
+        CheckConstraint('value IN (1, -1)', name='reaction_value'),
+    )
+    image_id: Mapped[int] = mapped_column(
+        ForeignKey('images.id', ondelete='CASCADE'), primary_key=True
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('users.id', ondelete='CASCADE'), primary_key=True
+    )
+    value: Mapped[int] = mapped_column(SmallInteger)
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
 
 
 class Tag(Base):
@@ -154,13 +132,31 @@ class Tag(Base):
 
     :param id: int: Tag id
     :param name: str: Tag name
+    :param version: int: Row version
     """
     __tablename__ = "tags"
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(50), unique=True)
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
 
 
 
+class QrCode(Base):
+    """
+    Model for qr_codes table, stored QR codes addressed by their content
+
+    :param digest: str: SHA-256 of the QR style and the encoded text
+    :param url: str: Stored QR code url
+    :param created_at: datetime: Render date
+    :param last_used_at: datetime: Last time a transformation used it
+    """
+    __tablename__ = "qr_codes"
+    digest: Mapped[str] = mapped_column(String(64), primary_key=True)
+    url: Mapped[str] = mapped_column(String(255))
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
+    last_used_at: Mapped[datetime] = mapped_column(default=func.now())
+
+
 class Comment(Base):
     """
     Method for creating a comment model
@@ -174,6 +170,9 @@ class Comment(Base):
     :param user: User: User object
     """
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_image_id_created_at", "image_id", "created_at"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     text: Mapped[str] = mapped_column(String(255))
     created_at: Mapped[datetime] = mapped_column(default=func.now())
@@ -184,7 +183,10 @@ class Comment(Base):
     user_id: Mapped[int] = mapped_column(
         ForeignKey('users.id', ondelete='CASCADE')
     )
-    user = relationship('User', backref='comments')
+    user = relationship(
+        'User',
+        backref=backref('comments', lazy="raise", passive_deletes=True)
+    )
 
 
 class User(Base):
@@ -199,15 +201,59 @@ class User(Base):
     :param created_at: datetime: User creation date
     :param is_active: bool: User active status
     :param refresh_token: str: User refresh token, nullable
+    :param images_count: int: Number of images uploaded by the user
+    :param comments_count: int: Number of comments written by the user
+    :param likes_received: int: Number of likes on the user's images
+    :param version: int: Row version, moves whenever the profile changes
     """
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(primary_key=True)
-    username: Mapped[str] = mapped_column(String(100))
+    username: Mapped[str] = mapped_column(String(100), index=True)
     email: Mapped[str] = mapped_column(String(150), unique=True)
     password: Mapped[str]
     role: Mapped[str] = mapped_column(default='user')
     created_at: Mapped[datetime] = mapped_column(default=func.now())
     is_active: Mapped[bool] = mapped_column(default=True)
     refresh_token: Mapped[str | None]
+    images_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    comments_count: Mapped[int] = mapped_column(
+        default=0, server_default="0"
+    )
+    likes_received: Mapped[int] = mapped_column(
+        default=0, server_default="0"
+    )
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
 
-Base.metadata.create_all(bind=engine)
+
+@event.listens_for(Image, "before_update")
+@event.listens_for(Tag, "before_update")
+@event.listens_for(User, "before_update")
+def bump_version(mapper, connection, target) -> None:
+    """
+    Function to move the version of a row changed through the ORM
+
+    The version is incremented in SQL rather than from the loaded value, so
+    an UPDATE racing with a counter update never reuses a version number.
+
+    :param mapper: Mapper of the changed model
+    :param connection: Connection running the flush
+    :param target: The changed object
+    :return: None
+    """
+    target.version = mapper.class_.version + 1
+
+attach_search_ddl(Image.__table__)
+
+
+def create_schema(connection) -> None:
+    """
+    Function to create the tables of a database Alembic doesn't manage,
+    such as a fresh local one. Migrated databases are left to
+    ``alembic upgrade head``, which would fail on tables created ahead of
+    their migration.
+
+    :param connection: Synchronous connection to the database
+    :return: None
+    """
+    if not inspect(connection).has_table("alembic_version"):
+        Base.metadata.create_all(connection)
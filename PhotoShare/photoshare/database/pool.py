@@ -0,0 +1,106 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolStats:
+    """
+    Class accumulating connection checkout statistics for a pool.
+
+    :param checkouts: int: Number of connections handed out
+    :param timeouts: int: Number of checkouts that gave up waiting
+    :param wait_total: float: Seconds spent acquiring connections
+    :param wait_max: float: Longest single acquisition in seconds
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        """
+        Method for recording a single checkout attempt
+
+        :param waited: float: Seconds spent waiting for the connection
+        :param timed_out: bool: Whether the attempt hit the pool timeout
+        :return: None
+        """
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def snapshot(self) -> dict:
+        """
+        Method for reading the statistics as a dictionary
+
+        :return: dict: checkout counters and wait times in milliseconds
+        """
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(
+                    self.wait_total / attempts * 1000, 3
+                ) if attempts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async queue pool that measures how long each checkout waits for a
+    connection. The statistics survive ``recreate()``, which SQLAlchemy
+    calls when the engine is disposed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return record
+
+    def recreate(self) -> "MonitoredQueuePool":
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def pool_status(pool: Pool) -> dict:
+    """
+    Function to describe the current state of a connection pool
+
+    :param pool: Pool: SQLAlchemy connection pool
+    :return: dict: pool sizing, live connection counts and wait statistics
+    """
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
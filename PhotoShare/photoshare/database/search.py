@@ -0,0 +1,116 @@
+import re
+
+from sqlalchemy import (
+    DDL, Table, column, event, func, literal_column, select, table
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+# PostgreSQL text search configuration. "simple" lowercases words without
+# stemming, descriptions are written in more than one language.
+SEARCH_CONFIG = "simple"
+
+POSTGRES_DDL = [
+    f"""
+    ALTER TABLE images ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('{SEARCH_CONFIG}', coalesce(description, ''))
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_images_search_vector
+    ON images USING gin (search_vector)
+    """,
+]
+
+# External content FTS5 table: it indexes images.description without a
+# second copy of the text and is kept in sync by triggers.
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5(
+        description, content='images', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS images_fts_ai AFTER INSERT ON images BEGIN
+        INSERT INTO images_fts (rowid, description)
+        VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS images_fts_ad AFTER DELETE ON images BEGIN
+        INSERT INTO images_fts (images_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS images_fts_au
+    AFTER UPDATE OF description ON images BEGIN
+        INSERT INTO images_fts (images_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO images_fts (rowid, description)
+        VALUES (new.id, new.description);
+    END
+    """,
+]
+
+def attach_search_ddl(image_table: Table) -> None:
+    """
+    Function to create the search structures along with the images table
+
+    :param image_table: Table: the images table
+    :return: None
+    """
+    for statement in POSTGRES_DDL:
+        event.listen(
+            image_table, "after_create",
+            DDL(statement).execute_if(dialect="postgresql")
+        )
+    for statement in SQLITE_DDL:
+        event.listen(
+            image_table, "after_create",
+            DDL(statement).execute_if(dialect="sqlite")
+        )
+    event.listen(
+        image_table, "before_drop",
+        DDL("DROP TABLE IF EXISTS images_fts").execute_if(dialect="sqlite")
+    )
+
+
+images_fts = table("images_fts", column("rowid"), column("rank"))
+images = table("images", column("id"), column("search_vector", TSVECTOR))
+
+
+def search_terms(text: str) -> list[str]:
+    """
+    Function to split a search string into lowercase words
+
+    :param text: str: text typed by the user
+    :return: list[str]: words, without operators or punctuation
+    """
+    return re.findall(r"\w+", text.lower())
+
+
+def search_hits(dialect: str, terms: list[str]):
+    """
+    Function to build a subquery of the images matching every term
+
+    The last word of a query is usually still being typed, so every term
+    matches as a prefix. Lower scores rank higher on both backends.
+
+    :param dialect: str: name of the database dialect
+    :param terms: list[str]: words returned by search_terms
+    :return: Subquery with the image ``id`` and its ``score``
+    """
+    if dialect == "postgresql":
+        query = func.to_tsquery(
+            SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms)
+        )
+        return select(
+            images.c.id,
+            (-func.ts_rank(images.c.search_vector, query)).label("score")
+        ).where(images.c.search_vector.op("@@")(query)).subquery("hits")
+    query = " ".join(f'"{term}"*' for term in terms)
+    return select(
+        images_fts.c.rowid.label("id"),
+        images_fts.c.rank.label("score")
+    ).where(literal_column("images_fts").op("MATCH")(query)).subquery("hits")
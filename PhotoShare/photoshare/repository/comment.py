@@ -1,12 +1,17 @@
 
 from fastapi import FastAPI, Depends,  APIRouter, HTTPException
+from sqlalchemy import select
 from photoshare.schemas import *
-from photoshare.database.db import Session
+from photoshare.database.db import AsyncSession, touch_versions
 from photoshare.database.models import Comment, User, Image
+from photoshare.repository.users import user_counters_update
 from photoshare.routes import *
 
 
-def get_comments_by_photo(db: Session, image_id: int) -> List[Comment]:
+async def get_comments_by_photo(
+    db: AsyncSession,
+    image_id: int
+) -> List[Comment]:
     """
     The get_comments_by_photo function returns all comments associated with a
     given photo.
@@ -15,13 +20,16 @@ def get_comments_by_photo(db: Session, image_id: int) -> List[Comment]:
     :param image_id: Filter the comments by image_id
     :return: A list of Comment objects
     """
-    return db.query(Comment).filter(Comment.image_id == image_id).all()
+    result = await db.scalars(
+        select(Comment).filter(Comment.image_id == image_id)
+    )
+    return result.all()
 
 
-def create_comment_func(
+async def create_comment_func(
     image_id: int,
     comment: CommentCreate,
-    db: Session,
+    db: AsyncSession,
     user: User
 ) -> Comment:
     """
@@ -31,20 +39,29 @@ def create_comment_func(
     :param comment: Create a new comment
     :param db: Access the database
     :param user: Get the user_id of the comment creator
+    :raises HTTPException: If the image does not exist
     :return: A Comment object
     """
-    image = db.query(Image).filter(Image.id == image_id).first()
+    image = await db.get(Image, image_id)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
     db_comment = Comment(text=comment.text, image_id=image_id)
     db_comment.user_id = user.id
     db_comment.created_at = datetime.now()
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
-    image.comments.append(db_comment)
+    await touch_versions(db, Image, Image.id == image_id)
+    await db.execute(
+        user_counters_update(User.id == user.id, comments_count=1)
+    )
+    await db.commit()
+    await db.refresh(db_comment)
     return db_comment
 
 
-def read_comments_func(image_id: int, db: Session) -> List[Comment]:
+async def read_comments_func(
+    image_id: int,
+    db: AsyncSession
+) -> List[Comment]:
     """
     The read_comments_func function returns all comments for a given image_id.
 
@@ -52,14 +69,16 @@ def read_comments_func(image_id: int, db: Session) -> List[Comment]:
     :param db: Pass the database session to the function
     :return: A list of comments
     """
-    comments = db.query(Comment).filter(Comment.image_id == image_id).all()
-    return comments
+    comments = await db.scalars(
+        select(Comment).filter(Comment.image_id == image_id)
+    )
+    return comments.all()
 
 
-def edit_comment_func(
+async def edit_comment_func(
     comment_id: int,
     comment_update: CommentCreate,
-    db: Session,
+    db: AsyncSession,
     user: User
 ) -> Comment:
     """
@@ -74,21 +93,22 @@ def edit_comment_func(
     :param user: Get the user id from the database
     :return: The edited comment
     """
-    db_comment = db.query(Comment).filter(
-        Comment.id == comment_id, Comment.user_id == user.id).first()
+    db_comment = await db.scalar(select(Comment).filter(
+        Comment.id == comment_id, Comment.user_id == user.id))
     if db_comment is None:
         raise HTTPException(status_code=404, detail="Comment not found")
     if db_comment:
         db_comment.text = comment_update.text
         db_comment.updated_at = datetime.now()
-        db.commit()
-        db.refresh(db_comment)
+        await touch_versions(db, Image, Image.id == db_comment.image_id)
+        await db.commit()
+        await db.refresh(db_comment)
     return db_comment
 
 
-def delete_comment_func(
+async def delete_comment_func(
     comment_id: int,
-    db: Session,
+    db: AsyncSession,
     user: User
 ) -> dict:
     """
@@ -102,10 +122,16 @@ def delete_comment_func(
     """
     if user.role not in ["admin", "moderator"]:
         raise HTTPException(status_code=403, detail="You don't have permission to delete it.")
-    db_comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    db_comment = await db.scalar(
+        select(Comment).filter(Comment.id == comment_id)
+    )
     if db_comment:
-        db.delete(db_comment)
-        db.commit()
+        await db.delete(db_comment)
+        await touch_versions(db, Image, Image.id == db_comment.image_id)
+        await db.execute(user_counters_update(
+            User.id == db_comment.user_id, comments_count=-1
+        ))
+        await db.commit()
     else:
         raise HTTPException(status_code=404, detail="Comment not found")
     return {"detail": "Comment deleted successfully"}
@@ -1,29 +1,92 @@
-from photoshare.database.db import Session
-from photoshare.database.models import Image, User, Tag
+from photoshare.database.db import AsyncSession
+from photoshare.database.models import (
+    Comment, Image, User, Tag, image_m2m_tag
+)
 from photoshare.schemas import *
 from photoshare.conf.config import settings
+from photoshare.database.search import search_hits, search_terms
+from photoshare.repository.qr_codes import get_qr_code_url
+from photoshare.repository.tags import attach_tags, attach_tags_many
+from photoshare.repository.users import user_counters_update
+from photoshare.services.jobs import job_queue, run_in_process
+from photoshare.services.leaderboard import leaderboard
+from photoshare.services.pagination import decode_cursor, encode_cursor
+from photoshare.services.qr import render_qr_png
+from photoshare.services.ingest import inspect_upload
+from photoshare.services.storage import TRANSFORMATIONS, storage
+from photoshare.services.uploads import UploadRejected, upload_executor
 from fastapi import HTTPException
 from fastapi import FastAPI, File, UploadFile
-from sqlalchemy import and_
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, distinct, exists, func, select, tuple_
+from sqlalchemy.orm import selectinload
 
-import cloudinary
-import cloudinary.uploader
-from cloudinary import CloudinaryImage
+import asyncio
 from io import BytesIO
-import re
-import qrcode
-from qrcode.image.styles.moduledrawers import RoundedModuleDrawer
-from qrcode.image.styledpil import StyledPilImage
-
-cloudinary.config(
-    cloud_name=settings.cloudinary_name,
-    api_key=settings.cloudinary_api_key,
-    api_secret=settings.cloudinary_api_secret
-)
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Loading profiles: the relationships each response schema serializes.
+# Async sessions cannot lazy load, so every query returning images to the
+# API batch-loads exactly these with one SELECT ... IN per relationship.
+LOAD_PROFILES = {
+    # ImageSummary: feed, rating pages and their templates
+    "list": ("tags",),
+    # ImageDB: single images and searches
+    "detail": ("tags", "comments"),
+}
+IMAGE_RELATION_NAMES = list(LOAD_PROFILES["detail"])
+
+
+def load_options(profile: str = "detail") -> list:
+    """
+    Function to build the loader options of a loading profile
+
+    :param profile: name of the profile in LOAD_PROFILES
+    :return: list of selectinload options
+    """
+    return [
+        selectinload(getattr(Image, name)) for name in LOAD_PROFILES[profile]
+    ]
+
+
+PAGE_SIZE = 20
+
+
+async def _get_image(db: AsyncSession, *criteria) -> Image | None:
+    """
+    Function to get a single image with the detail loading profile
+
+    :param db: SQLAlchemy async session
+    :param criteria: filter criteria for the image
+    :return: Image object or None
+    """
+    return await db.scalar(
+        select(Image).options(*load_options("detail")).filter(*criteria)
+        .execution_options(populate_existing=True)
+    )
+
+
+async def _get_images(
+    db: AsyncSession,
+    stmt,
+    profile: str = "detail"
+) -> list[Image]:
+    """
+    Function to run an image query with the given loading profile
+
+    :param db: SQLAlchemy async session
+    :param stmt: select statement for images
+    :param profile: name of the profile in LOAD_PROFILES
+    :return: list of Image objects
+    """
+    result = await db.scalars(stmt.options(*load_options(profile)))
+    return list(result.all())
 
 
-def load_image_func(
-    db: Session,
+async def load_image_func(
+    db: AsyncSession,
     image: ImageBase,
     tags: List[str],
     user: User
@@ -31,110 +94,348 @@ def load_image_func(
     """
     Function to load image to the database
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param image: ImageBase object
     :param tags: list of tags
     :param user: User object
     :return: ImageDB object
     """
-    image_tags = []
-    for tag_name in tags:
-        # Перевіряємо, чи існує тег з такою назвою
-        tag = db.query(Tag).filter(Tag.name == tag_name).first()
-        if not tag:
-            # Якщо тега не існує, створюємо новий
-            tag = Tag(name=tag_name)
-            db.add(tag)
-            db.commit()
-            db.refresh(tag)
-        image_tags.append(tag)
-
-    db_image = Image(**image.model_dump())
+    db_image = Image(**image.model_dump(exclude={"tags"}))
     db_image.user_id = user.id
-    db_image.tags = image_tags
     db.add(db_image)
-    db.commit()
-    db.refresh(db_image)
+    await db.flush()
+    await attach_tags(db_image.id, tags, db)
+    await db.execute(
+        user_counters_update(User.id == user.id, images_count=1)
+    )
+    await db.commit()
+    await leaderboard.update(db_image.id, db_image.rate)
+    await db.refresh(db_image, attribute_names=IMAGE_RELATION_NAMES)
     return db_image
 
 
-def load_image_from_pc_func(
-    db: Session,
+async def _store(func, *args):
+    """
+    Function to run a blocking media storage call on the upload pool
+
+    :param func: storage call, e.g. storage.upload
+    :param args: arguments of the call
+    :raise HTTPException: If the upload queue is full or the call times out
+    :return: result of the call
+    """
+    try:
+        return await upload_executor.run(func, *args)
+    except UploadRejected:
+        raise HTTPException(
+            status_code=503, detail="Too many uploads, try again later",
+            headers={"Retry-After": "1"}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Upload timed out")
+
+
+async def _discard_stored(db: AsyncSession, url: str | None) -> None:
+    """
+    Function to remove the stored file of a deleted image, if it is ours
+    and no other image shares it. Uploads reusing the file keep the images
+    sharing it from being deleted until they commit, so the check sees
+    them. The image row is gone already, so failures are only logged.
+
+    :param db: SQLAlchemy async session
+    :param url: url of the image
+    :return: None
+    """
+    if not storage.owns(url):
+        return
+    if await db.scalar(select(exists().where(Image.url == url))):
+        # Another upload of the same file still shows it
+        return
+    try:
+        await upload_executor.run(storage.delete, url)
+    except Exception:
+        logger.warning("Deleting stored image %s failed", url, exc_info=True)
+
+
+def _split_tags(tags: Optional[str]) -> List[str]:
+    """
+    Function to split comma separated tags
+
+    :param tags: comma separated tags
+    :return: list of tags
+    """
+    return [tag.strip() for tag in tags.split(",")] if tags else []
+
+
+async def _store_files(
+    db: AsyncSession,
+    files: List[UploadFile],
+    concurrency: int = 1
+) -> list[tuple[str, str] | Exception]:
+    """
+    Function to store uploaded images, skipping the ones stored already.
+    Files are checked and uploaded ``concurrency`` at a time and equal
+    files are uploaded once, named after the type sniffed from their
+    content. The images whose file is reused stay locked against deletion
+    until the transaction ends.
+
+    :param db: SQLAlchemy async session
+    :param files: UploadFile objects
+    :param concurrency: number of files checked or uploaded at a time
+    :return: url and content hash of every file, or the exception storing
+        it raised
+    """
+    limit = asyncio.Semaphore(concurrency)
+
+    async def bounded(func, *args):
+        async with limit:
+            return await func(*args)
+
+    inspected = await asyncio.gather(*(
+        bounded(
+            run_in_threadpool, inspect_upload, file.file,
+            settings.upload_max_bytes
+        )
+        for file in files
+    ), return_exceptions=True)
+    hashed = {
+        result[0] for result in inspected if isinstance(result, tuple)
+    }
+    # The images sharing a file can't be deleted until the new ones commit,
+    # so _discard_stored sees them and keeps the file
+    rows = await db.execute(
+        select(Image.content_hash, Image.url)
+        .where(Image.content_hash.in_(hashed))
+        .with_for_update(read=True, key_share=True)
+    )
+    urls = dict(rows.tuples().all())
+    uploads = {}
+    for file, result in zip(files, inspected):
+        if isinstance(result, tuple) and result[0] not in urls:
+            uploads.setdefault(result[0], (file, result[1]))
+    stored = await asyncio.gather(*(
+        bounded(_store, storage.upload, file.file, suffix)
+        for file, suffix in uploads.values()
+    ), return_exceptions=True)
+    urls.update(zip(uploads, stored))
+
+    results = []
+    for file, result in zip(files, inspected):
+        if isinstance(result, Exception):
+            results.append(result)
+            continue
+        digest, _ = result
+        if isinstance(urls[digest], Exception):
+            results.append(urls[digest])
+        else:
+            if uploads.get(digest, (None,))[0] is not file:
+                upload_executor.stats.record(0.0, "deduplicated")
+            results.append((urls[digest], digest))
+    return results
+
+
+async def load_image_from_pc_func(
+    db: AsyncSession,
     description: str,
     user: User,
     file: UploadFile = File(),
     tags: Optional[str] = None
 ) -> ImageDB:
     """
-    Function to load image from PC to the database
+    Function to load image from PC to the database. A file stored already
+    isn't uploaded again, the new image shares it and keeps its own
+    description and tags.
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param description: description of the image
     :param user: User object
     :param file: UploadFile object
-    :param tags: list of tags
-    :raise HTTPException: if tags have uncorrect format
+    :param tags: comma separated tags
     :return: ImageDB object
     """
-    upload_result = cloudinary.uploader.upload(
-        file.file,
-        overwrite=True
-    )
-    if tags:
-        try:
-            tags_list = [tag.strip() for tag in tags.split(",")]
-            image_tags = []
-            for tag_name in tags_list:
-                # Перевіряємо, чи існує тег з такою назвою
-                tag = db.query(Tag).filter(Tag.name == tag_name).first()
-                if not tag:
-                    # Якщо тега не існує, створюємо новий
-                    tag = Tag(name=tag_name)
-                    db.add(tag)
-                    db.commit()
-                    db.refresh(tag)
-                image_tags.append(tag)
-        except:
-            raise HTTPException(
-                status_code=400, detail="Uncorrect fromat of tags"
-            )
+    stored, = await _store_files(db, [file])
+    if isinstance(stored, Exception):
+        raise stored
+    image_url, digest = stored
 
-    image_url = upload_result["url"]
-    print("image_url", image_url)
     new_image = Image()
     new_image.url = image_url
+    new_image.content_hash = digest
     new_image.description = description
     new_image.created_at = datetime.now()
     new_image.user_id = user.id
-    if tags:
-        new_image.tags = image_tags
-    db.add(new_image)
-    db.commit()
-    db.refresh(new_image)
+    try:
+        db.add(new_image)
+        await db.flush()
+        await attach_tags(new_image.id, _split_tags(tags), db)
+        await db.execute(
+            user_counters_update(User.id == user.id, images_count=1)
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await _discard_stored(db, image_url)
+        raise
+    await leaderboard.update(new_image.id, new_image.rate)
+    await db.refresh(new_image, attribute_names=IMAGE_RELATION_NAMES)
 
     return new_image
 
 
-def delete_image_func(
-    db: Session,
+def _failed_upload(file: UploadFile, error: Exception) -> dict:
+    """
+    Function to describe a file of a batch upload that wasn't stored
+
+    :param file: UploadFile object
+    :param error: exception storing the file raised
+    :return: BatchUploadItem fields
+    """
+    if isinstance(error, HTTPException):
+        status_code, detail = error.status_code, error.detail
+    else:
+        logger.warning(
+            "Storing %s failed", file.filename, exc_info=error
+        )
+        status_code, detail = 502, "Upload failed"
+    return {"filename": file.filename, "status": "failed",
+            "status_code": status_code, "detail": detail}
+
+
+async def load_images_from_pc_func(
+    db: AsyncSession,
+    user: User,
+    files: List[UploadFile],
+    descriptions: List[str],
+    tags: List[str]
+) -> dict:
+    """
+    Function to load several images from PC to the database. Files are
+    stored concurrently, the tags of the whole batch are resolved together
+    and the images are created in one transaction. A file that can't be
+    stored is reported and the others are created.
+
+    :param db: SQLAlchemy async session
+    :param user: User object
+    :param files: UploadFile objects
+    :param descriptions: description of every file
+    :param tags: comma separated tags of every file, or none at all
+    :raise HTTPException: if the batch is too big or the descriptions or
+        the tags don't match the files
+    :return: BatchUploadResult fields
+    """
+    if len(files) > settings.batch_upload_max_files:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.batch_upload_max_files} files "
+                   f"per batch"
+        )
+    if len(descriptions) != len(files) or len(tags) not in (0, len(files)):
+        raise HTTPException(
+            status_code=422,
+            detail="Every file needs a description and tags if any are set"
+        )
+    stored = await _store_files(
+        db, files, settings.batch_upload_concurrency
+    )
+
+    images = {}
+    for index, result in enumerate(stored):
+        if not isinstance(result, Exception):
+            url, digest = result
+            images[index] = Image(
+                url=url, content_hash=digest,
+                description=descriptions[index],
+                created_at=datetime.now(), user_id=user.id
+            )
+    if images:
+        try:
+            db.add_all(images.values())
+            await db.flush()
+            await attach_tags_many({
+                image.id: _split_tags(tags[index] if tags else None)
+                for index, image in images.items()
+            }, db)
+            await db.execute(user_counters_update(
+                User.id == user.id, images_count=len(images)
+            ))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            for url, _ in {result for result in stored
+                           if not isinstance(result, Exception)}:
+                await _discard_stored(db, url)
+            raise
+        for image in images.values():
+            await leaderboard.update(image.id, image.rate)
+    created = {
+        image.id: image for image in await _get_images(
+            db, select(Image).filter(
+                Image.id.in_([image.id for image in images.values()])
+            ).execution_options(populate_existing=True), "list"
+        )
+    } if images else {}
+
+    items = []
+    for index, (file, result) in enumerate(zip(files, stored)):
+        if index in images:
+            items.append({
+                "filename": file.filename, "status": "created",
+                "status_code": 200, "image": created[images[index].id]
+            })
+        else:
+            items.append(_failed_upload(file, result))
+    return {"created": len(images), "failed": len(files) - len(images),
+            "items": items}
+
+
+async def _uncount_image(db: AsyncSession, image: Image) -> None:
+    """
+    Function to take an image about to be deleted out of the profile
+    counters of its owner and of everyone who commented on it
+
+    :param db: SQLAlchemy async session
+    :param image: Image object
+    :return: None
+    """
+    likes = (
+        select(Image.likes_count).filter(Image.id == image.id)
+        .scalar_subquery()
+    )
+    await db.execute(user_counters_update(
+        User.id == image.user_id, images_count=-1, likes_received=-likes
+    ))
+    commented = (
+        select(func.count()).select_from(Comment)
+        .filter(Comment.image_id == image.id, Comment.user_id == User.id)
+        .scalar_subquery()
+    )
+    await db.execute(user_counters_update(
+        User.id.in_(
+            select(Comment.user_id).filter(Comment.image_id == image.id)
+        ),
+        comments_count=-commented
+    ))
+
+
+async def delete_image_func(
+    db: AsyncSession,
     image_id: int,
     user: User
 ) -> ImageDB:
     """
     Function to delete image from the database
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param image_id: id of the image
     :param user: User object
     :raise HTTPException: if image not found or user doesn't have permission to delete it
     :return: ImageDB object
     """
     if user.role == "admin":
-        db_image = db.query(Image).filter(Image.id == image_id).first()
+        db_image = await _get_image(db, Image.id == image_id)
     else:
-        db_image = db.query(Image).filter(
-            Image.id == image_id, Image.user_id == user.id
-        ).first()
+        db_image = await _get_image(
+            db, Image.id == image_id, Image.user_id == user.id
+        )
         if not db_image:
             # Якщо зображення не знайдено або не належить поточному користувачу, викинути виняток HTTP 404
             raise HTTPException(
@@ -142,13 +443,16 @@ def delete_image_func(
                 detail="Image not found or you don't have permission to delete it."
             )
     if db_image:
-        db.delete(db_image)
-        db.commit()
+        await _uncount_image(db, db_image)
+        await db.delete(db_image)
+        await db.commit()
+        await leaderboard.remove(image_id)
+        await _discard_stored(db, db_image.url)
     return db_image
 
 
-def update_image_func(
-    db: Session,
+async def update_image_func(
+    db: AsyncSession,
     image_id: int,
     image: ImageUpdate,
     user: User
@@ -156,7 +460,7 @@ def update_image_func(
     """
     Function to update image in the database
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param image_id: id of the image
     :param image: ImageUpdate object
     :param user: User object
@@ -164,11 +468,11 @@ def update_image_func(
     :return: ImageDB object
     """
     if user.role == "admin":
-        db_image = db.query(Image).filter(Image.id == image_id).first()
+        db_image = await _get_image(db, Image.id == image_id)
     else:
-        db_image = db.query(Image).filter(
-            Image.id == image_id, Image.user_id == user.id
-        ).first()
+        db_image = await _get_image(
+            db, Image.id == image_id, Image.user_id == user.id
+        )
         if not db_image:
             # Якщо зображення не знайдено або не належить поточному користувачу, викинути виняток HTTP 404
             raise HTTPException(
@@ -178,60 +482,226 @@ def update_image_func(
     if db_image:
         for key, val in image.model_dump().items():
             setattr(db_image, key, val)
-        db.commit()
-        db.refresh(db_image)
+        await db.commit()
     return db_image
 
 
-def get_image_url_func(
-    db: Session,
+async def get_image_url_func(
+    db: AsyncSession,
     url: str
 ) -> ImageDB:
     """
     Function to get image by url_view
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param url_view: url_view of the image
     :return: ImageDB object
     """
-    db_image = db.query(Image).filter(Image.url == url).first()
+    db_image = await _get_image(db, Image.url == url)
     return db_image
 
 
-def get_image_func(
-    db: Session,
+async def get_image_func(
+    db: AsyncSession,
     image_id: int
 ) -> ImageDB:
     """
     Function to get image by id
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param image_id: id of the image
     :return: ImageDB object
     """
-    db_image = db.query(Image).filter(Image.id == image_id).first()
+    db_image = await _get_image(db, Image.id == image_id)
     return db_image
 
 
-def rate_images_func(
-    db: Session,
-    order: str
-) -> list[ImageDB]:
+async def get_image_version_func(
+    db: AsyncSession,
+    image_id: int
+) -> int | None:
+    """
+    Function to get the version of an image with a primary key lookup
+
+    :param db: SQLAlchemy async session
+    :param image_id: id of the image
+    :return: image version or None
     """
-    Function to get images sorted by rate
+    return await db.scalar(select(Image.version).filter(Image.id == image_id))
 
-    :param db: SQLAlchemy session
+
+async def get_feed_func(
+    db: AsyncSession,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE
+) -> tuple[list[ImageSummary], str | None]:
+    """
+    Function to get a page of the newest images
+
+    The feed is keyset paginated on (created_at, id), so every page costs
+    the same no matter how deep the client has scrolled.
+
+    :param db: SQLAlchemy async session
+    :param cursor: cursor returned with the previous page
+    :param limit: number of images on the page
+    :return: list of ImageSummary objects and the cursor of the next page
+    """
+    stmt = select(Image).order_by(Image.created_at.desc(), Image.id.desc())
+    if cursor:
+        created_at, image_id = decode_cursor(cursor, datetime, int)
+        stmt = stmt.filter(
+            tuple_(Image.created_at, Image.id) < tuple_(created_at, image_id)
+        )
+    images = await _get_images(db, stmt.limit(limit + 1), "list")
+    if len(images) <= limit:
+        return images, None
+    last = images[limit - 1]
+    return images[:limit], encode_cursor(last.created_at.isoformat(), last.id)
+
+
+async def rate_images_func(
+    db: AsyncSession,
+    order: str,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE
+) -> tuple[list[ImageSummary], str | None]:
+    """
+    Function to get a page of images sorted by rate
+
+    The rating is keyset paginated on (rate, id), so every page costs the
+    same no matter how deep the client has scrolled.
+
+    :param db: SQLAlchemy async session
     :param order: order of sorting
-    :return: list of ImageDB objects
+    :param cursor: cursor returned with the previous page
+    :param limit: number of images on the page
+    :return: list of ImageSummary objects and the cursor of the next page
     """
+    key = tuple_(Image.rate, Image.id)
     if order == "asc":
-        return db.query(Image).order_by(Image.rate.asc()).all()
+        stmt = select(Image).order_by(Image.rate.asc(), Image.id.asc())
     else:
-        return db.query(Image).order_by(Image.rate.desc()).all()
+        stmt = select(Image).order_by(Image.rate.desc(), Image.id.desc())
+    if cursor:
+        rate, image_id = decode_cursor(cursor, float, int)
+        after = tuple_(rate, image_id)
+        stmt = stmt.filter(key > after if order == "asc" else key < after)
+    images = await _get_images(db, stmt.limit(limit + 1), "list")
+    if len(images) <= limit:
+        return images, None
+    last = images[limit - 1]
+    return images[:limit], encode_cursor(last.rate, last.id)
+
+
+async def top_rated_func(
+    db: AsyncSession,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE
+) -> tuple[list[ImageSummary], str | None]:
+    """
+    Function to get a page of the best rated images from the leaderboard
+
+    Pages are keyset paginated on (rate, id) like the rating query, and the
+    leaderboard finds where a page starts from the rank of the last image
+    of the previous one in O(log n) at any depth. The database answers
+    while the leaderboard cannot.
+
+    :param db: SQLAlchemy async session
+    :param cursor: cursor returned with the previous page
+    :param limit: number of images on the page
+    :return: list of ImageSummary objects and the cursor of the next page
+    """
+    after = decode_cursor(cursor, float, int) if cursor else None
+    ids = await leaderboard.top(after, limit + 1)
+    if ids is None:
+        return await rate_images_func(db, "desc", cursor, limit)
+    found = await _get_images(
+        db, select(Image).filter(Image.id.in_(ids[:limit])), "list"
+    )
+    by_id = {image.id: image for image in found}
+    images = [by_id[image_id] for image_id in ids[:limit] if image_id in by_id]
+    if len(ids) <= limit or not images:
+        return images, None
+    last = images[-1]
+    return images, encode_cursor(last.rate, last.id)
+
+
+async def get_image_rank_func(
+    db: AsyncSession,
+    image_id: int
+) -> dict:
+    """
+    Function to get the position of an image in the leaderboard
+
+    :param db: SQLAlchemy async session
+    :param image_id: id of the image
+    :raise HTTPException: if image not found
+    :return: dict with the image id, its rank and its rate
+    """
+    found = await leaderboard.rank(image_id)
+    if found is None:
+        rate = await db.scalar(
+            select(Image.rate).filter(Image.id == image_id)
+        )
+        if rate is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        better = await db.scalar(
+            select(func.count()).select_from(Image).filter(
+                tuple_(Image.rate, Image.id) > tuple_(rate, image_id)
+            )
+        )
+        found = better + 1, rate
+    rank, rate = found
+    return {"image_id": image_id, "rank": rank, "rate": rate}
+
+
+def _transformed_url(url: str, choice: int) -> str:
+    """
+    Function to build the url of a transformed image
+
+    :param url: url of the image
+    :param choice: choice of transformation
+    :raise HTTPException: if choice is wrong or the image isn't stored by us
+    :return: url of the transformed image
+    """
+    if choice not in TRANSFORMATIONS:
+        raise HTTPException(
+            status_code=400, detail="Wrong choice. Enter 1, 2 or 3.")
+    try:
+        return storage.transform_url(url, choice)
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="This image can't be transformed")
+
+
+async def check_transformation_func(
+    db: AsyncSession,
+    choice: int,
+    image_id: int,
+    user: User
+) -> None:
+    """
+    Function to check a transformation before queueing it, so a bad
+    request fails right away instead of in the job
+
+    :param db: SQLAlchemy async session
+    :param choice: choice of transformation
+    :param image_id: id of the image
+    :param user: User object
+    :raise HTTPException: if the image isn't found or can't be transformed
+    :return: None
+    """
+    url = await db.scalar(
+        select(Image.url)
+        .filter(Image.id == image_id, Image.user_id == user.id)
+    )
+    if url is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    _transformed_url(url, choice)
 
 
-def get_transformation_func(
-    db: Session,
+async def get_transformation_func(
+    db: AsyncSession,
     choice: int,
     image_id: int,
     user: User
@@ -239,140 +709,191 @@ def get_transformation_func(
     """
     Function to get transformation of the image
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param choice: choice of transformation
     :param image_id: id of the image
     :param user: User object
+    :raise HTTPException: if the image isn't found or can't be transformed
     :return: ImageDB object
     """
-    db_image = db.query(Image).filter(
-        Image.id == image_id, Image.user_id == user.id
-    ).first()
-    def transform(num: int) -> list[dict[str, str | int]]:
-        """
-        Function to choose transformation
-
-        :param num: number of transformation
-        :raise HTTPException: if choice is wrong
-        :return: list of transformations
-        """
-        if choice == 1:
-            return [
-                {
-                    'aspect_ratio': "1.0", 'gravity': "face",
-                    'width': "0.7", 'crop': "thumb"
-                },
-                {'radius': "max"},
-                {'color': "skyblue", 'effect': "outline"},
-                {'color': "lightgray", 'effect': "shadow", 'x': 5, 'y': 8}
-            ]
-        elif choice == 2:
-            return [
-                {'aspect_ratio': "1.0", 'height': 250, 'crop': "fill"},
-                {'border': "5px_solid_lightblue"}
-            ]
-        elif choice == 3:
-            return [
-                {'height': 400, 'width': 250, 'crop': "fill"},
-                {'angle': 20},
-                {'effect': "outline", 'color': "brown"},
-                {'quality': "auto"},
-                {'fetch_format': "auto"}
-            ]
-        else:
-            raise HTTPException(
-                status_code=400, detail="Wrong choice. Enter 1, 2 or 3.")
-
-    transformation = transform(choice)
-    pattern = r"/([^/]+)\.(png|jpg|jpeg|gif)$"
-    match = re.search(pattern, db_image.url)
-    id = match.group(1)
-    transformed_image_url = CloudinaryImage(id).build_url(
-        transformation=transformation
+    db_image = await _get_image(
+        db, Image.id == image_id, Image.user_id == user.id
     )
+    if db_image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    transformed_image_url = _transformed_url(db_image.url, choice)
 
-    qr = generate_qr_code(transformed_image_url)
+    qr = await get_qr_code_url(db, transformed_image_url, generate_qr_code)
     db_image.url_view = transformed_image_url
     db_image.qr_code_view = qr
-    db.commit()
-    db.refresh(db_image)
+    await db.commit()
     return db_image
 
 
-def generate_qr_code(image_url: str) -> str:
+@job_queue.handler("transform")
+async def transformation_job(
+    db: AsyncSession,
+    image_id: int,
+    choice: int,
+    user_id: int
+) -> dict:
+    """
+    Job applying a transformation queued by POST /images/{image_id}
+
+    :param db: SQLAlchemy async session
+    :param image_id: id of the image
+    :param choice: choice of transformation
+    :param user_id: id of the owner of the image
+    :raise HTTPException: if the user is gone or the transformation fails
+    :return: the transformed image and QR code urls
+    """
+    user = await db.get(User, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    db_image = await get_transformation_func(db, choice, image_id, user)
+    return {
+        "image_id": db_image.id,
+        "url_view": db_image.url_view,
+        "qr_code_view": db_image.qr_code_view,
+    }
+
+
+async def generate_qr_code(image_url: str, name: str | None = None) -> str:
     """
-    Function to generate QR code
+    Function to generate QR code, rendered in the job process pool
 
     :param image_url: url of the image
+    :param name: file name of the QR code, random if None
     :return: url of the QR code
     """
-    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L)
-    qr.add_data(image_url)
-    qr.make(fit=True)
-
-    img = qr.make_image(
-        image_factory=StyledPilImage, module_drawer=RoundedModuleDrawer()
-    )
-
-    buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    buffer.seek(0)
+    png = await run_in_process(render_qr_png, image_url)
+    return await _store(storage.upload, BytesIO(png), ".png", name)
 
-    qr_code_url = cloudinary.uploader.upload(
-        buffer, resource_type="image"
-    )["url"]
 
-    return qr_code_url
-
-
-def search_images_by_description_func(
-    db: Session,
-    description: str
-) -> list[ImageDB]:
-    """
-    Function to search images by description
-
-    :param db: SQLAlchemy session
-    :param description: description of the image
-    :return: list of ImageDB objects
+async def search_images_by_description_func(
+    db: AsyncSession,
+    description: str,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE
+) -> tuple[list[ImageDB], str | None]:
     """
-    return db.query(Image).filter(
-        Image.description.ilike(f"%{description}%")
-    ).all()
+    Function to full-text search images by description
 
+    Every word must match, the words are matched as prefixes and the best
+    matches come first. Pages are keyset paginated on (score, id).
 
-def search_images_by_tags_func(
-    db: Session,
-    tags: list[str]
-) -> list[ImageDB]:
+    :param db: SQLAlchemy async session
+    :param description: words to search for
+    :param cursor: cursor returned with the previous page
+    :param limit: number of images on the page
+    :return: list of ImageDB objects and the cursor of the next page
+    """
+    terms = search_terms(description)
+    if not terms:
+        return [], None
+    hits = search_hits(db.get_bind().dialect.name, terms)
+    stmt = (
+        select(Image, hits.c.score).join(hits, hits.c.id == Image.id)
+        .order_by(hits.c.score, Image.id)
+    )
+    if cursor:
+        score, image_id = decode_cursor(cursor, float, int)
+        stmt = stmt.filter(
+            tuple_(hits.c.score, Image.id) > tuple_(score, image_id)
+        )
+    result = await db.execute(
+        stmt.options(*load_options("detail")).limit(limit + 1)
+    )
+    rows = result.all()
+    images = [row.Image for row in rows[:limit]]
+    if len(rows) <= limit:
+        return images, None
+    last = rows[limit - 1]
+    return images, encode_cursor(last.score, last.Image.id)
+
+
+async def search_images_by_tags_func(
+    db: AsyncSession,
+    tags: list[str],
+    mode: str = "any",
+    order: str = "relevance",
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE
+) -> tuple[list[ImageDB], str | None]:
     """
     Function to search images by tags
 
-    :param db: SQLAlchemy session
-    :param tags: list of tags
-    :return: list of ImageDB objects
+    The matching is done by the database in a single grouped subquery over
+    image_m2m_tag: "any" returns images with at least one of the tags,
+    "all" only those carrying every tag. Relevance orders by the number of
+    matched tags, then by recency; pages are keyset paginated.
+
+    :param db: SQLAlchemy async session
+    :param tags: list of tag names
+    :param mode: "any" or "all"
+    :param order: "relevance" or "recent"
+    :param cursor: cursor returned with the previous page
+    :param limit: number of images on the page
+    :return: list of ImageDB objects and the cursor of the next page
     """
-    return list(set(db.query(Image).join(Image.tags).filter(
-        Tag.name.in_(tags)
-    ).all()))
-
-
-def search_images_by_user_func(
-    db: Session,
+    names = list(dict.fromkeys(tag for tag in tags if tag))
+    if not names:
+        return [], None
+    matched = func.count(distinct(image_m2m_tag.c.tag_id)).label("matched")
+    matches = (
+        select(image_m2m_tag.c.image_id, matched)
+        .join(Tag, Tag.id == image_m2m_tag.c.tag_id)
+        .filter(Tag.name.in_(names))
+        .group_by(image_m2m_tag.c.image_id)
+    )
+    if mode == "all":
+        matches = matches.having(matched == len(names))
+    matches = matches.subquery("matches")
+    key = [Image.created_at, Image.id]
+    types = [datetime, int]
+    if order == "relevance":
+        key.insert(0, matches.c.matched)
+        types.insert(0, int)
+    stmt = (
+        select(Image, matches.c.matched)
+        .join(matches, matches.c.image_id == Image.id)
+        .order_by(*(column.desc() for column in key))
+    )
+    if cursor:
+        values = decode_cursor(cursor, *types)
+        stmt = stmt.filter(tuple_(*key) < tuple_(*values))
+    result = await db.execute(
+        stmt.options(*load_options("detail")).limit(limit + 1)
+    )
+    rows = result.all()
+    images = [row.Image for row in rows[:limit]]
+    if len(rows) <= limit:
+        return images, None
+    last = rows[limit - 1]
+    values = [last.Image.created_at.isoformat(), last.Image.id]
+    if order == "relevance":
+        values.insert(0, last.matched)
+    return images, encode_cursor(*values)
+
+
+async def search_images_by_user_func(
+    db: AsyncSession,
     username: str
 ) -> list[ImageDB]:
     """
     Function to search images by user
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param username: username of the user
     :raise HTTPException: if user doesn't have permission to this type of search
     :return: list of ImageDB objects
     """
-    user = db.query(User).filter(User.username == username).first()
+    user = await db.scalar(select(User).filter(User.username == username))
     if user.role == 'user':
         raise HTTPException(
             status_code=400,
             detail="You don't have permission to this type of search"
         )
-    return db.query(Image).filter(Image.user_id == user.id).all()
+    return await _get_images(
+        db, select(Image).filter(Image.user_id == user.id)
+    )
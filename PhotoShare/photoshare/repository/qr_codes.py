@@ -0,0 +1,163 @@
+"""
+Content addressed cache of rendered QR codes.
+
+A QR code is stored once per encoded text and style, so applying the same
+transformation again is a lookup instead of a render and an upload. Remove
+the codes no image uses any more from the PhotoShare directory with::
+
+    python -m photoshare.repository.qr_codes [grace_seconds]
+"""
+import asyncio
+import hashlib
+import sys
+import threading
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, exists, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from photoshare.database.db import AsyncLocalSession, dialect_insert
+from photoshare.database.models import Image, QrCode
+from photoshare.services.qr import QR_STYLE
+from photoshare.services.storage import storage
+
+# Unused codes younger than this may belong to a transformation that
+# hasn't committed yet
+EVICTION_GRACE = 3600
+
+
+class QrCacheStats:
+    """
+    Class counting QR code cache lookups and evictions in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def record(self, hit: bool) -> None:
+        """
+        Method for recording a lookup
+
+        :param hit: bool: Whether the code was stored already
+        :return: None
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def record_evicted(self, count: int) -> None:
+        """
+        Method for recording evicted codes
+
+        :param count: int: Number of evicted codes
+        :return: None
+        """
+        with self._lock:
+            self.evicted += count
+
+    def stats(self) -> dict:
+        """
+        Method for reading the counters
+
+        :return: dict: hits, misses, hit rate and evicted codes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evicted": self.evicted,
+            }
+
+
+qr_cache_stats = QrCacheStats()
+
+
+def qr_digest(data: str) -> str:
+    """
+    Function to compute the content address of a QR code
+
+    :param data: str: Encoded text
+    :return: str: Hex SHA-256 of the style and the text
+    """
+    return hashlib.sha256(f"{QR_STYLE}\n{data}".encode()).hexdigest()
+
+
+async def get_qr_code_url(
+    db: AsyncSession,
+    data: str,
+    create: Callable[[str, str], Awaitable[str]]
+) -> str:
+    """
+    Function to get the url of the QR code encoding a text, storing it on
+    the first request. The caller commits.
+
+    :param db: SQLAlchemy async session
+    :param data: text to encode
+    :param create: coroutine function rendering and storing the code, gets
+        the text and its digest, which it should use as the file name
+    :return: url of the QR code
+    """
+    digest = qr_digest(data)
+    url = await db.scalar(
+        update(QrCode).where(QrCode.digest == digest)
+        .values(last_used_at=datetime.now())
+        .returning(QrCode.url)
+        .execution_options(synchronize_session=False)
+    )
+    qr_cache_stats.record(url is not None)
+    if url is not None:
+        return url
+    url = await create(data, digest)
+    # Concurrent misses store the same file under the same name
+    await db.execute(
+        dialect_insert(db, QrCode)
+        .values(digest=digest, url=url, created_at=datetime.now(),
+                last_used_at=datetime.now())
+        .on_conflict_do_nothing(index_elements=["digest"])
+    )
+    return url
+
+
+async def evict_orphan_qr_codes(
+    db: AsyncSession,
+    grace: int = EVICTION_GRACE
+) -> list[str]:
+    """
+    Function to drop the QR codes no image shows any more
+
+    :param db: SQLAlchemy async session
+    :param grace: seconds an unused code is kept after its last use
+    :return: urls of the dropped codes, for removing the stored files
+    """
+    orphan = (
+        QrCode.last_used_at < datetime.now() - timedelta(seconds=grace),
+        ~exists().where(Image.qr_code_view == QrCode.url),
+    )
+    urls = list(await db.scalars(
+        delete(QrCode).where(*orphan).returning(QrCode.url)
+        .execution_options(synchronize_session=False)
+    ))
+    await db.commit()
+    qr_cache_stats.record_evicted(len(urls))
+    return urls
+
+
+async def main():
+    grace = int(sys.argv[1]) if len(sys.argv) > 1 else EVICTION_GRACE
+    async with AsyncLocalSession() as db:
+        urls = await evict_orphan_qr_codes(db, grace)
+    for url in urls:
+        storage.delete(url)
+    print(f"evicted {len(urls)} unused qr codes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
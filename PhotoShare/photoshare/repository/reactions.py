@@ -0,0 +1,143 @@
+from fastapi import HTTPException, status
+from sqlalchemy import Float, Numeric, case, cast, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from photoshare.database.db import AsyncSession, dialect_insert
+from photoshare.database.models import Image, ImageReaction, User
+from photoshare.repository.users import user_counters_update
+from photoshare.services.leaderboard import leaderboard
+
+LIKE = 1
+DISLIKE = -1
+
+
+async def _store_reaction(
+    db: AsyncSession,
+    image_id: int,
+    user_id: int,
+    value: int
+) -> int:
+    """
+    Function to store a reaction and report what it replaced
+
+    Every branch is a single conditional statement, so two requests racing
+    on the same row cannot both count a change: the loser matches no row.
+
+    :param db: SQLAlchemy async session
+    :param image_id: id of the image
+    :param user_id: id of the reacting user
+    :param value: LIKE, DISLIKE or 0 to remove the reaction
+    :return: the previous value, or value itself if nothing changed
+    """
+    key = (
+        ImageReaction.image_id == image_id,
+        ImageReaction.user_id == user_id
+    )
+    if not value:
+        previous = await db.scalar(
+            delete(ImageReaction).where(*key)
+            .returning(ImageReaction.value)
+        )
+        return previous or 0
+    flip = (
+        update(ImageReaction).where(*key, ImageReaction.value != value)
+        .values(value=value).returning(ImageReaction.value)
+    )
+    if await db.scalar(flip) is not None:
+        return -value
+    inserted = await db.scalar(
+        dialect_insert(db, ImageReaction)
+        .values(image_id=image_id, user_id=user_id, value=value)
+        .on_conflict_do_nothing(index_elements=["image_id", "user_id"])
+        .returning(ImageReaction.value)
+    )
+    if inserted is not None:
+        return 0
+    # Another request inserted the row since the flip, it may hold the
+    # opposite reaction
+    return -value if await db.scalar(flip) is not None else value
+
+
+def _counters_update(image_id: int, previous: int, value: int):
+    """
+    Function to build the UPDATE moving the counters and the rate of an image
+
+    Counters are incremented relative to the stored values and the rate is
+    computed from the incremented ones in the same statement. The image
+    version moves with them, so cached copies of the image are revalidated.
+
+    :param image_id: id of the image
+    :param previous: the reaction value before the change
+    :param value: the reaction value after the change
+    :return: UPDATE statement returning the new counters, rate and owner
+    """
+    likes = Image.likes_count + int(value == LIKE) - int(previous == LIKE)
+    dislikes = (
+        Image.dislikes_count
+        + int(value == DISLIKE) - int(previous == DISLIKE)
+    )
+    total = likes + dislikes
+    rate = case(
+        (total == 0, 0.0),
+        else_=func.round(cast(cast(likes, Float) * 100 / total, Numeric), 1)
+    )
+    return (
+        update(Image).where(Image.id == image_id)
+        .values(
+            likes_count=likes, dislikes_count=dislikes, rate=rate,
+            version=Image.version + 1
+        )
+        .returning(
+            Image.likes_count, Image.dislikes_count, Image.rate, Image.user_id
+        )
+    )
+
+
+async def set_reaction_func(
+    db: AsyncSession,
+    image_id: int,
+    user: User,
+    value: int
+) -> dict:
+    """
+    Function to like, dislike or un-react to an image
+
+    :param db: SQLAlchemy async session
+    :param image_id: id of the image
+    :param user: the reacting user
+    :param value: LIKE, DISLIKE or 0 to remove the reaction
+    :raise HTTPException: if the image doesn't exist
+    :return: dict with the user's reaction and the image counters
+    """
+    try:
+        previous = await _store_reaction(db, image_id, user.id, value)
+        if previous == value:
+            stmt = select(
+                Image.likes_count, Image.dislikes_count, Image.rate
+            ).where(Image.id == image_id)
+        else:
+            stmt = _counters_update(image_id, previous, value)
+        row = (await db.execute(stmt)).first()
+    except IntegrityError:
+        # The reaction references an image that doesn't exist
+        row = None
+    if row is None:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Image not found"
+        )
+    liked = int(value == LIKE) - int(previous == LIKE)
+    if liked:
+        await db.execute(
+            user_counters_update(User.id == row.user_id, likes_received=liked)
+        )
+    await db.commit()
+    if previous != value:
+        await leaderboard.update(image_id, float(row.rate))
+    return {
+        "image_id": image_id,
+        "reaction": value,
+        "likes": row.likes_count,
+        "dislikes": row.dislikes_count,
+        "rate": float(row.rate),
+    }
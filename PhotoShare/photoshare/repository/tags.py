@@ -1,96 +1,258 @@
+from itertools import chain
 from typing import List
 
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, literal, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
-from photoshare.database.models import Tag
+from photoshare.database.db import dialect_insert, touch_versions
+from photoshare.database.models import Image, Tag, image_m2m_tag
 from photoshare.schemas import TagModel, TagResponse
+from photoshare.services.cache import tag_cache
 
 
 async def get_tags(
     skip: int,
     limit: int,
-    db: Session
+    db: AsyncSession
 ) -> List[Tag]:
     """
     Function to get tags from the database
 
     :param skip: offset
     :param limit: limit
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :return: list of tags
     """
-    return db.query(Tag).offset(skip).limit(limit).all()
+    tags = await db.scalars(select(Tag).offset(skip).limit(limit))
+    return tags.all()
 
 
 async def get_tag(
     tag_id: int,
-    db: Session
+    db: AsyncSession
 ) -> Tag:
     """
     Function to get tag by id from the database
 
     :param tag_id: tag id
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :return: Tag object
     """
-    return db.query(Tag).filter(Tag.id == tag_id).first()
+    return await db.scalar(select(Tag).filter(Tag.id == tag_id))
+
+
+async def get_tag_version(
+    tag_id: int,
+    db: AsyncSession
+) -> int | None:
+    """
+    Function to get the version of a tag with a primary key lookup
+
+    :param tag_id: tag id
+    :param db: SQLAlchemy async session
+    :return: tag version or None
+    """
+    return await db.scalar(select(Tag.version).filter(Tag.id == tag_id))
+
+
+async def _touch_tagged_images(tag_id: int, db: AsyncSession) -> None:
+    """
+    Function to move the version of the images showing a tag
+
+    :param tag_id: tag id
+    :param db: SQLAlchemy async session
+    :return: None
+    """
+    await touch_versions(
+        db, Image, Image.id.in_(
+            select(image_m2m_tag.c.image_id)
+            .filter(image_m2m_tag.c.tag_id == tag_id)
+        )
+    )
+
+
+async def _select_tag_ids(
+    names: List[str],
+    db: AsyncSession
+) -> dict[str, int]:
+    """
+    Function to read the ids of existing tags in one query
+
+    :param names: tag names
+    :param db: SQLAlchemy async session
+    :return: ids keyed by name
+    """
+    rows = await db.execute(
+        select(Tag.name, Tag.id).filter(Tag.name.in_(names))
+    )
+    return dict(rows.tuples().all())
+
+
+async def resolve_tag_ids(
+    names: List[str],
+    db: AsyncSession
+) -> dict[str, int]:
+    """
+    Function to get the ids of tags by name, creating the missing ones
+
+    Names come from the tag cache first. The rest are read in one query and
+    the ones still missing are inserted in one statement that skips names
+    a concurrent request created first. Nothing is committed.
+
+    :param names: unique tag names
+    :param db: SQLAlchemy async session
+    :return: ids keyed by name
+    """
+    ids = tag_cache.get_many(names)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        ids.update(await _select_tag_ids(missing, db))
+        missing = [name for name in missing if name not in ids]
+    if missing:
+        created = await db.execute(
+            dialect_insert(db, Tag)
+            .values([{"name": name} for name in missing])
+            .on_conflict_do_nothing(index_elements=["name"])
+            .returning(Tag.name, Tag.id)
+        )
+        ids.update(created.tuples().all())
+        missing = [name for name in missing if name not in ids]
+    if missing:
+        ids.update(await _select_tag_ids(missing, db))
+    tag_cache.put_many(ids)
+    return ids
+
+
+async def attach_tags(
+    image_id: int,
+    names: List[str],
+    db: AsyncSession
+) -> None:
+    """
+    Function to tag an image, creating the missing tags
+
+    :param image_id: image id
+    :param names: tag names, duplicates and empty names are skipped
+    :param db: SQLAlchemy async session
+    :return: None
+    """
+    await attach_tags_many({image_id: names}, db)
+
+
+async def attach_tags_many(
+    names_by_image: dict[int, List[str]],
+    db: AsyncSession
+) -> None:
+    """
+    Function to tag several images, resolving their tags together
+
+    Links are inserted in one statement that only accepts ids still
+    carrying their name, so a cached id whose tag was renamed, deleted or
+    rolled back since is resolved again instead of tagging the image wrong.
+    Nothing is committed.
+
+    :param names_by_image: tag names keyed by image id, duplicates and
+        empty names are skipped
+    :param db: SQLAlchemy async session
+    :return: None
+    """
+    pending = {
+        image_id: list(dict.fromkeys(name for name in names if name))
+        for image_id, names in names_by_image.items()
+    }
+    # The second pass reads every id from the database
+    for _ in range(2):
+        pending = {
+            image_id: names for image_id, names in pending.items() if names
+        }
+        if not pending:
+            return
+        ids = await resolve_tag_ids(
+            list(dict.fromkeys(chain.from_iterable(pending.values()))), db
+        )
+        links = [
+            select(literal(image_id), Tag.id).filter(
+                tuple_(Tag.name, Tag.id).in_(
+                    [(name, ids[name]) for name in names if name in ids]
+                )
+            )
+            for image_id, names in pending.items()
+        ]
+        attached = set((await db.execute(
+            insert(image_m2m_tag).from_select(
+                ["image_id", "tag_id"],
+                links[0] if len(links) == 1 else union_all(*links)
+            ).returning(image_m2m_tag.c.image_id, image_m2m_tag.c.tag_id)
+        )).tuples().all())
+        pending = {
+            image_id: [
+                name for name in names
+                if (image_id, ids.get(name)) not in attached
+            ]
+            for image_id, names in pending.items()
+        }
+        tag_cache.discard(*chain.from_iterable(pending.values()))
 
 
 async def create_tag(
     body: TagModel,
-    db: Session
+    db: AsyncSession
 ) -> Tag:
     """
     Function to create tag in the database
 
     :param body: TagModel object
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :return: Tag object
     """
-    if db.query(Tag).filter(Tag.name == body.name).first():
+    if await db.scalar(select(Tag).filter(Tag.name == body.name)):
         raise HTTPException(status_code=400, detail="Tag already created")
 #!!!!!!!!
     tag = Tag(name=body.name)
     db.add(tag)
-    db.commit()
-    db.refresh(tag)
+    await db.commit()
+    await db.refresh(tag)
     return tag
 
 
 async def update_tag(
     tag_id: int,
     body: TagModel,
-    db: Session
+    db: AsyncSession
 ) -> Tag | None:
     """
     Function to update tag in the database
 
     :param tag_id: tag id
     :param body: TagModel object
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :return: Tag object or None
     """
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await db.scalar(select(Tag).filter(Tag.id == tag_id))
     if tag:
         #!!!!!!!!
+        tag_cache.discard(tag.name)
         tag.name = body.name
-        db.commit()
+        await _touch_tagged_images(tag_id, db)
+        await db.commit()
     return tag
 
 
 async def remove_tag(
     tag_id: int,
-    db: Session
+    db: AsyncSession
 )  -> Tag | None:
     """
     Function to remove tag from the database
 
     :param tag_id: tag id
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :return: Tag object or None
     """
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await db.scalar(select(Tag).filter(Tag.id == tag_id))
     if tag:
-        db.delete(tag)
-        db.commit()
+        tag_cache.discard(tag.name)
+        await _touch_tagged_images(tag_id, db)
+        await db.delete(tag)
+        await db.commit()
     return tag
@@ -1,14 +1,15 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from photoshare.database.models import User, Image
 from photoshare.schemas import UserModel
-from sqlalchemy import func
+from sqlalchemy import func, select, update
 from photoshare.schemas import *
 from fastapi import HTTPException
+from photoshare.services.cache import user_cache
 
 
 async def get_user_by_email(
     email: str,
-    db: Session
+    db: AsyncSession
 ) -> User:
     """
     Retrieve a user by email from the database.
@@ -17,12 +18,12 @@ async def get_user_by_email(
     :param db: The database session.
     :return: The retrieved user.
     """
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(select(User).filter(User.email == email))
 
 
 async def create_user(
     body: UserModel,
-    db: Session
+    db: AsyncSession
 ) -> User:
     """
     Create a new user in the database.
@@ -31,19 +32,19 @@ async def create_user(
     :param db: The database session.
     :return: The created user.
     """
-    user_count = db.query(User).count()
+    user_count = await db.scalar(select(func.count(User.id)))
     new_user = User(**body.dict())
     new_user.role = 'admin' if user_count == 0 else 'user'
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
 async def update_token(
     user: User,
     token: str | None,
-    db: Session
+    db: AsyncSession
 ) -> None:
     """
     Update the refresh token for a user.
@@ -54,93 +55,116 @@ async def update_token(
     :return: None
     """
     user.refresh_token = token
-    db.commit()
+    await db.commit()
 
 
 async def update_user_role(
-    db: Session,
+    db: AsyncSession,
     user_id: int,
     role: str
 ) -> User:
     """
     Function to update user role in the database
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param user_id: id of the user
     :param role: new role
     :return: User object
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).filter(User.id == user_id))
     user.role = role
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await user_cache.invalidate(user.email)
+    await db.refresh(user)
     return user
 
 
-def set_user_active_status(
-    db: Session,
+async def set_user_active_status(
+    db: AsyncSession,
     user_id: int,
     is_active: bool
 ) -> User:
     """
     Function to set user active status in the database
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param user_id: id of the user
     :param is_active: new active status
     :return: User object
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).filter(User.id == user_id))
     if not user:
         return None
     user.is_active = is_active
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await user_cache.invalidate(user.email)
+    await db.refresh(user)
     return user
 
 
-def get_user_by_username(
-    db: Session,
+async def get_user_by_username(
+    db: AsyncSession,
     username: str
-) -> tuple[User, int] | None:
+) -> User | None:
     """
     Function to get user by username from the database
 
-    :param db: SQLAlchemy session
+    The profile statistics are counters kept on the user row, so this is a
+    single indexed read however much the user has posted.
+
+    :param db: SQLAlchemy async session
     :param username: username
-    :return: User object and number of images uploaded by the user or None
+    :return: User object or None
     """
-    user = db.query(User).filter(User.username == username).first()
-    if user:
-        images_count = db.query(func.count(Image.id)).filter(
-            Image.user_id == user.id
-        ).scalar()
-        return user, images_count
-    return None
+    return await db.scalar(select(User).filter(User.username == username))
+
+
+def user_counters_update(*criteria, **deltas):
+    """
+    Function to build the UPDATE moving the profile counters of users
+
+    Counters move relative to the stored values inside the caller's
+    transaction, and the version moves with them so cached profiles are
+    revalidated.
+
+    :param criteria: filter criteria of the users
+    :param deltas: amount added to each counter, an int or SQL expression
+    :return: UPDATE statement
+    """
+    values = {
+        name: getattr(User, name) + delta for name, delta in deltas.items()
+    }
+    return (
+        update(User).where(*criteria)
+        .values(version=User.version + 1, **values)
+        .execution_options(synchronize_session=False)
+    )
 
 
 async def update_user_info(
-    db: Session,
+    db: AsyncSession,
     user_update: UserUpdate,
     user: User
 ) -> User:
     """
     Function to update user info in the database
 
-    :param db: SQLAlchemy session
+    :param db: SQLAlchemy async session
     :param user_update: UserUpdate object
     :param user: User object
     :raise HTTPException: if user not found
     :return: User object
     """
-    user = db.query(User).filter(User.id == user.id).first()
+    user = await db.scalar(select(User).filter(User.id == user.id))
     if not user:
         raise HTTPException(status_code=404, detail="Profile not found.")
     if user:
+        old_email = user.email
         user.username = user_update.username
         user.email = user_update.email
         user.password = user_update.password
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await user_cache.invalidate(old_email, user.email)
+        await db.refresh(user)
         return user
 
@@ -6,7 +6,7 @@ from fastapi import (
 from fastapi.security import (
     OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from photoshare.database.db import get_db
 from photoshare.schemas import UserModel, UserResponse, TokenModel, UserDb
 from photoshare.repository import users as repository_users
@@ -25,7 +25,7 @@ async def signup(
     body: UserModel,
     background_tasks: BackgroundTasks,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Endpoint to sign up a new user.
@@ -49,7 +49,7 @@ async def signup(
 @router.post("/login", response_model=TokenModel)
 async def login(
     body: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Endpoint to authenticate and log in a user.
@@ -90,7 +90,7 @@ async def login(
 @router.get('/refresh_token', response_model=TokenModel)
 async def refresh_token(
     credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Endpoint to refresh an access token.
@@ -1,21 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from photoshare.database.db import get_db
+from photoshare.database.db import get_db, get_read_db, pin_primary
 from photoshare.database.models import Comment, User
 from photoshare.schemas import CommentCreate, CommentResponse as CommentSchema
 from datetime import datetime
 from photoshare.repository.comment import *
 from photoshare.services.auth import auth_service
+from photoshare.services.coalesce import coalesced_json
 
 router = APIRouter(prefix='/images', tags=["comments"])
 
 
-@router.post("/{image_id}/add_comment/", response_model=CommentSchema)
-def create_comment(
+@router.post(
+    "/{image_id}/add_comment/", response_model=CommentSchema,
+    dependencies=[Depends(pin_primary)]
+)
+async def create_comment(
     image_id: int,
     comment: CommentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
 ):
     """
@@ -27,29 +31,37 @@ def create_comment(
     :param current_user: The user creating the comment
     :return: The created comment
     """
-    return create_comment_func(image_id, comment, db, current_user)
+    return await create_comment_func(image_id, comment, db, current_user)
 
 
 @router.get("/{image_id}/comments/", response_model=List[CommentSchema])
-def read_comments(
+async def read_comments(
     photo_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get all comments on an image
 
+    Identical requests in flight share one query and one serialization.
+
     :param photo_id: The id of the image to get comments for
     :param db: Database session
     :return: List of comments
     """
-    return read_comments_func(photo_id, db)
+    body = await coalesced_json(
+        read_comments_func, List[CommentSchema], photo_id, db
+    )
+    return Response(body, media_type="application/json")
 
 
-@router.put("/{image_id}/comments/{comment_id}/", response_model=CommentSchema)
-def edit_comment(
+@router.put(
+    "/{image_id}/comments/{comment_id}/", response_model=CommentSchema,
+    dependencies=[Depends(pin_primary)]
+)
+async def edit_comment(
     comment_id: int,
     comment_update: CommentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
 ):
     """
@@ -61,13 +73,16 @@ def edit_comment(
     :param current_user: The user editing the comment
     :return: The edited comment
     """
-    return edit_comment_func(comment_id, comment_update, db, current_user)
+    return await edit_comment_func(comment_id, comment_update, db, current_user)
 
 
-@router.delete("/{image_id}/comments/{comment_id}/")
-def delete_comment(
+@router.delete(
+    "/{image_id}/comments/{comment_id}/",
+    dependencies=[Depends(pin_primary)]
+)
+async def delete_comment(
     comment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(
         auth_service.get_current_user_roles(["admin", "moderator"])
     )
@@ -80,4 +95,4 @@ def delete_comment(
     :param current_user: The user deleting the comment
     :return: The deleted comment
     """
-    return delete_comment_func(comment_id, db, current_user)
+    return await delete_comment_func(comment_id, db, current_user)
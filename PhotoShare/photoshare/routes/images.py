@@ -1,22 +1,34 @@
-from fastapi import FastAPI, Depends,  APIRouter
+from typing import Literal
+
+from fastapi import (
+    FastAPI, Depends,  APIRouter, BackgroundTasks, Form, Query, Response
+)
 from photoshare.schemas import *
-from photoshare.database.db import Session, get_db
+from photoshare.database.db import (
+    AsyncSession, get_db, get_read_db, pin_primary
+)
 from photoshare.repository.images import *
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
 from fastapi.templating import Jinja2Templates
 from photoshare.database.models import User
 from photoshare.services.auth import auth_service
+from photoshare.services.coalesce import coalesced_json
+from photoshare.services.etag import (
+    conditional_response, etag_headers, make_etag
+)
+from photoshare.services.jobs import job_queue
+from photoshare.services.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix='/images', tags=["images"])
 templates = Jinja2Templates(directory="photoshare/services/templates")
 
 
-@router.post("/add")
-def load_image(
+@router.post("/add", dependencies=[Depends(pin_primary)])
+async def load_image(
     tags: List[str],
     image: ImageModel,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
 ) -> ImageDB:
     """
@@ -33,13 +45,16 @@ def load_image(
         raise HTTPException(
             status_code=400, detail="Maximum 5 tags allowed per image"
         )
-    return load_image_func(db, image, tags, current_user)
+    return await load_image_func(db, image, tags, current_user)
 
 
-@router.post("/add_from_pc", response_model=ImageDB)
-def load_image_from_pc(
+@router.post(
+    "/add_from_pc", response_model=ImageDB,
+    dependencies=[Depends(pin_primary)]
+)
+async def load_image_from_pc(
     description: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     file: UploadFile = File(...),
     current_user: User = Depends(auth_service.get_current_user),
     tags: Optional[str] = None
@@ -54,48 +69,164 @@ def load_image_from_pc(
     :param tags: The tags to be associated with the image
     :return: The created image
     """
-    return load_image_from_pc_func(db, description, current_user, file, tags)
+    return await load_image_from_pc_func(db, description, current_user, file, tags)
+
+
+@router.post(
+    "/add_batch", response_model=BatchUploadResult,
+    dependencies=[Depends(pin_primary)]
+)
+async def load_images_from_pc(
+    files: List[UploadFile] = File(...),
+    descriptions: List[str] = Form(...),
+    tags: List[str] = Form([]),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    Load several images to the database from files on the local machine.
+    Every file gets its own status, a failed file doesn't stop the others.
+
+    :param files: The image files
+    :param descriptions: The description of every file, in the same order
+    :param tags: The comma separated tags of every file, in the same order
+    :param db: Database session
+    :param current_user: The user uploading the images
+    :return: The status of every file and the created images
+    """
+    return await load_images_from_pc_func(
+        db, current_user, files, descriptions, tags
+    )
 
 @router.get("/url/{url}")
-def get_image_url(
+async def get_image_url(
     url: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> ImageDB:
     """
     Get an image by its URL
 
+    Identical requests in flight share one query and one serialization.
+
     :param url_view: The URL of the image
     :param db: Database session
+    :raise HTTPException: If the image doesn't exist
     :return: The image
     """
-    return get_image_url_func(db, url)
+    body = await coalesced_json(get_image_url_func, ImageDB, db, url)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(body, media_type="application/json")
+
+
+@router.get("/feed", response_model=ImagePage)
+async def get_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get a page of the newest images
+
+    :param cursor: The cursor returned with the previous page
+    :param limit: The number of images on the page
+    :param db: Database session
+    :return: The images and the cursor of the next page
+    """
+    images, next_cursor = await get_feed_func(db, cursor, limit)
+    return {"items": images, "next_cursor": next_cursor}
 
 
 @router.get('/rate')
-def rate_images(
+async def rate_images(
     request: Request,
     order: str = 'asc',
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
-    Rate images
+    Rate images, the best rated ones come from the leaderboard
 
     :param request: The request
     :param order: The order to display the images in
+    :param cursor: The cursor returned with the previous page
+    :param limit: The number of images on the page
     :param db: Database session
     :return: The rated images
     """
-    rated_images= rate_images_func(db, order)
+    if order == "desc":
+        rated_images, next_cursor = await top_rated_func(db, cursor, limit)
+    else:
+        rated_images, next_cursor = await rate_images_func(
+            db, order, cursor, limit
+        )
     return templates.TemplateResponse(
         'rate.html',
-        {"request": request, "rated_images": rated_images, "order": order}
+        {
+            "request": request, "rated_images": rated_images,
+            "order": order, "next_cursor": next_cursor
+        }
     )
 
 
-@router.delete("/{image_id}")
-def delete_image(
+@router.get("/rated", response_model=ImagePage)
+async def get_rated_images(
+    order: str = 'asc',
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get a page of images sorted by rate
+
+    :param order: The order to sort the images in
+    :param cursor: The cursor returned with the previous page
+    :param limit: The number of images on the page
+    :param db: Database session
+    :return: The images and the cursor of the next page
+    """
+    images, next_cursor = await rate_images_func(db, order, cursor, limit)
+    return {"items": images, "next_cursor": next_cursor}
+
+
+@router.get("/top", response_model=ImagePage)
+async def get_top_rated_images(
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get a page of the best rated images from the leaderboard
+
+    :param cursor: The cursor returned with the previous page
+    :param limit: The number of images on the page
+    :param db: Database session
+    :return: The images and the cursor of the next page
+    """
+    images, next_cursor = await top_rated_func(db, cursor, limit)
+    return {"items": images, "next_cursor": next_cursor}
+
+
+@router.get("/{image_id}/rank", response_model=ImageRank)
+async def get_image_rank(
     image_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get the position of an image in the leaderboard
+
+    :param image_id: The id of the image
+    :param db: Database session
+    :return: The rank and the rate of the image
+    """
+    return await get_image_rank_func(db, image_id)
+
+
+@router.delete("/{image_id}", dependencies=[Depends(pin_primary)])
+async def delete_image(
+    image_id: int,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
 ) -> ImageDB:
     """
@@ -106,14 +237,14 @@ def delete_image(
     :param current_user: The user deleting the image
     :return: The deleted image
     """
-    return delete_image_func(db, image_id, current_user)
+    return await delete_image_func(db, image_id, current_user)
 
 
-@router.put("/{image_id}")
-def update_image(
+@router.put("/{image_id}", dependencies=[Depends(pin_primary)])
+async def update_image(
     image_id: int,
     image: ImageUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
 ) -> ImageDB:
     """
@@ -125,78 +256,149 @@ def update_image(
     :param current_user: The user updating the image
     :return: The updated image
     """
-    return update_image_func(db, image_id, image, current_user)
+    return await update_image_func(db, image_id, image, current_user)
 
 
 @router.get("/{image_id}")
-def get_image(
+async def get_image(
     image_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
 ) -> ImageDB:
     """
     Get an image by its ID
 
+    The ETag is the image version, so a client revalidating its copy gets
+    a 304 after a single primary key lookup. Identical requests in flight
+    for the same version share one load and one serialization.
+
     :param image_id: The id of the image
+    :param request: The incoming request
+    :param response: The outgoing response
     :param db: Database session
+    :raise HTTPException: If the image doesn't exist
     :return: The image
     """
-    return get_image_func(db, image_id)
+    version = await get_image_version_func(db, image_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    etag = make_etag("image", image_id, version)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    body = await coalesced_json(
+        get_image_func, ImageDB, db, image_id, key=(version,)
+    )
+    if body is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(
+        body, media_type="application/json", headers=etag_headers(etag)
+    )
 
 
-@router.post("/{image_id}")
-def transform_image(
+@router.post(
+    "/{image_id}", status_code=202, response_model=JobStatus,
+    dependencies=[Depends(pin_primary)]
+)
+async def transform_image(
     image_id: int,
     choice: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
 ):
     """
     Transform an image
 
+    Rendering the QR code of the transformed image takes a while, so the
+    transformation runs as a background job. Poll the job at the Location
+    of the response, its result holds the new urls once it is done.
+
     :param image_id: The id of the image to transform
     :param choice: The transformation to apply
+    :param response: The outgoing response
+    :param background_tasks: Tasks run after the response is sent
     :param db: Database session
     :param current_user: The user transforming the image
-    :return: The transformed image
+    :return: The queued job
     """
-    return get_transformation_func(db, choice, image_id, current_user)
+    await check_transformation_func(db, choice, image_id, current_user)
+    job = await job_queue.enqueue(
+        "transform",
+        {"image_id": image_id, "choice": choice, "user_id": current_user.id},
+        current_user.id
+    )
+    if job_queue.in_process:
+        background_tasks.add_task(job_queue.run, job["id"])
+    response.headers["Location"] = f"/photoshare/jobs/{job['id']}"
+    return job
 
 
-@ router.get("/search/{description}")
-def search_images_by_description(
+@router.get("/search/{description}")
+async def search_images_by_description(
     description: str,
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
 ) -> list[ImageDB]:
     """
-    Search images by description
+    Full-text search images by description, best matches first. The cursor
+    of the next page comes in the X-Next-Cursor header.
 
-    :param info: The description to search for
+    :param description: The words to search for
+    :param response: The outgoing response
+    :param cursor: The cursor returned with the previous page
+    :param limit: The number of images on the page
     :param db: Database session
     :return: The images found
     """
-    return search_images_by_description_func(db, description)
+    images, next_cursor = await search_images_by_description_func(
+        db, description, cursor, limit
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return images
 
 
 @router.get('/search/tags/{tags}')
-def search_images_by_tags(
+async def search_images_by_tags(
     tags: str,
-    db: Session = Depends(get_db)
+    response: Response,
+    mode: Literal["any", "all"] = "any",
+    order: Literal["relevance", "recent"] = "relevance",
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
 ) -> list[ImageDB]:
     """
-    Search images by tag
-
-    :param tag: The tag to search for
+    Search images by tags. The cursor of the next page comes in the
+    X-Next-Cursor header.
+
+    :param tags: Comma separated tags to search for
+    :param response: The outgoing response
+    :param mode: "any" to match at least one tag, "all" to match every tag
+    :param order: "relevance" for most matched tags first or "recent"
+    :param cursor: The cursor returned with the previous page
+    :param limit: The number of images on the page
     :param db: Database session
     :return: The images found
     """
     tags = [tag.strip() for tag in tags.split(",")]
-    return search_images_by_tags_func(db, tags)
+    images, next_cursor = await search_images_by_tags_func(
+        db, tags, mode, order, cursor, limit
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return images
 
 
 @router.get('/search/user/{username}')
-def search_images_by_user(
+async def search_images_by_user(
     username: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> list[ImageDB]:
     """
     Search images by user
@@ -205,4 +407,4 @@ def search_images_by_user(
     :param db: Database session
     :return: The images found
     """
-    return search_images_by_user_func(db, username)
+    return await search_images_by_user_func(db, username)
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from photoshare.database.models import User
+from photoshare.schemas import JobStatus
+from photoshare.services.auth import auth_service
+from photoshare.services.jobs import job_queue
+
+router = APIRouter(prefix='/jobs', tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def read_job(
+    job_id: str,
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    Get the status of a background job, with its result once it is done
+
+    :param job_id: The id of the job
+    :param current_user: The current user
+    :raise HTTPException: If the job doesn't exist, expired or belongs to
+        another user
+    :return: The job
+    """
+    job = await job_queue.get(job_id)
+    if job is None or (
+        job["owner_id"] != current_user.id and current_user.role != "admin"
+    ):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,62 @@
+import logging
+import os
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from photoshare.services.derived import derived_cache
+from photoshare.services.render import PRESET_FORMATS
+from photoshare.services.storage import media_mount_path, storage
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix=media_mount_path(), tags=["media"])
+
+
+class CachedFileResponse(FileResponse):
+    """
+    File response releasing its rendering in the transformed image cache
+    once it is sent, or once the client has gone away.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            derived_cache.release(self.path)
+
+
+@router.get("/t/{preset}/{name}")
+async def read_transformed_image(preset: int, name: str):
+    """
+    Get a transformed image of the local storage, rendered on the first
+    request and then served from the cache
+
+    :param preset: The transformation preset
+    :param name: The file name of the original image
+    :raise HTTPException: If the preset or the image doesn't exist, or the
+        image can't be rendered
+    :return: The transformed image
+    """
+    source = storage.file_path(name)
+    if preset not in PRESET_FORMATS or not source or not os.path.isfile(
+        source
+    ):
+        raise HTTPException(status_code=404, detail="Image not found")
+    try:
+        path = await derived_cache.get(source, preset)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    except OSError:
+        # Pillow raises UnidentifiedImageError, an OSError, for files that
+        # aren't images and OSError for corrupt ones. No lease is held.
+        logger.warning("Rendering %s failed", name, exc_info=True)
+        raise HTTPException(
+            status_code=415, detail="Image can't be transformed"
+        )
+    image_format, _ = PRESET_FORMATS[preset]
+    return CachedFileResponse(
+        path, media_type=f"image/{image_format.lower()}",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
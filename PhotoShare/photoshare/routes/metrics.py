@@ -0,0 +1,108 @@
+from fastapi import APIRouter, Depends
+
+from photoshare.database.db import get_pool_status
+from photoshare.database.models import User
+from photoshare.repository.qr_codes import qr_cache_stats
+from photoshare.schemas import (
+    CacheStats, CoalescingStats, DerivedCacheStats, PoolStatus,
+    QrCacheStats, UploadStatus
+)
+from photoshare.services.auth import auth_service
+from photoshare.services.cache import token_cache
+from photoshare.services.coalesce import coalescing_stats
+from photoshare.services.derived import derived_cache
+from photoshare.services.uploads import upload_executor
+
+router = APIRouter(prefix='/metrics', tags=["metrics"])
+
+
+@router.get("/db_pool", response_model=PoolStatus)
+async def read_pool_status(
+    replica: bool = False,
+    current_admin: User = Depends(
+        auth_service.get_current_user_roles(["admin"])
+    )
+):
+    """
+    Get the state of the database connection pool
+
+    :param replica: Report the read replica pool instead of the primary
+    :param current_admin: The current admin user
+    :return: Pool sizing, connection counts and checkout wait times
+    """
+    return get_pool_status(replica)
+
+
+@router.get("/auth_cache", response_model=CacheStats)
+async def read_auth_cache_stats(
+    current_admin: User = Depends(
+        auth_service.get_current_user_roles(["admin"])
+    )
+):
+    """
+    Get the hit and miss counters of the verified token cache
+
+    :param current_admin: The current admin user
+    :return: Cache counters and size
+    """
+    return token_cache.stats()
+
+
+@router.get("/coalescing", response_model=dict[str, CoalescingStats])
+async def read_coalescing_stats(
+    current_admin: User = Depends(
+        auth_service.get_current_user_roles(["admin"])
+    )
+):
+    """
+    Get the counters of the read functions shared by concurrent requests
+
+    :param current_admin: The current admin user
+    :return: Counters keyed by repository function name
+    """
+    return coalescing_stats()
+
+
+@router.get("/uploads", response_model=UploadStatus)
+async def read_upload_status(
+    current_admin: User = Depends(
+        auth_service.get_current_user_roles(["admin"])
+    )
+):
+    """
+    Get the state of the media upload pool
+
+    :param current_admin: The current admin user
+    :return: Queue depth, running uploads, outcomes and upload latency
+    """
+    return upload_executor.status()
+
+
+@router.get("/qr_cache", response_model=QrCacheStats)
+async def read_qr_cache_stats(
+    current_admin: User = Depends(
+        auth_service.get_current_user_roles(["admin"])
+    )
+):
+    """
+    Get the hit and miss counters of the QR code cache
+
+    :param current_admin: The current admin user
+    :return: Cache counters
+    """
+    return qr_cache_stats.stats()
+
+
+@router.get("/derived_cache", response_model=DerivedCacheStats)
+async def read_derived_cache_stats(
+    current_admin: User = Depends(
+        auth_service.get_current_user_roles(["admin"])
+    )
+):
+    """
+    Get the counters and the size of the transformed image cache
+
+    :param current_admin: The current admin user
+    :return: Cache counters
+    """
+    return derived_cache.stats()
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from photoshare.database.db import get_db, pin_primary
+from photoshare.database.models import User
+from photoshare.repository.reactions import DISLIKE, LIKE, set_reaction_func
+from photoshare.schemas import ReactionResponse
+from photoshare.services.auth import auth_service
+
+router = APIRouter(
+    prefix='/images', tags=["reactions"],
+    dependencies=[Depends(pin_primary)]
+)
+
+
+@router.put("/{image_id}/like", response_model=ReactionResponse)
+async def like_image(
+    image_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    Like an image, replacing a dislike by the same user
+
+    :param image_id: The id of the image to like
+    :param db: Database session
+    :param current_user: The user liking the image
+    :return: The user's reaction and the image counters
+    """
+    return await set_reaction_func(db, image_id, current_user, LIKE)
+
+
+@router.put("/{image_id}/dislike", response_model=ReactionResponse)
+async def dislike_image(
+    image_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    Dislike an image, replacing a like by the same user
+
+    :param image_id: The id of the image to dislike
+    :param db: Database session
+    :param current_user: The user disliking the image
+    :return: The user's reaction and the image counters
+    """
+    return await set_reaction_func(db, image_id, current_user, DISLIKE)
+
+
+@router.delete("/{image_id}/reaction", response_model=ReactionResponse)
+async def unset_reaction(
+    image_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    Remove the user's like or dislike from an image
+
+    :param image_id: The id of the image
+    :param db: Database session
+    :param current_user: The user removing the reaction
+    :return: The user's reaction and the image counters
+    """
+    return await set_reaction_func(db, image_id, current_user, 0)
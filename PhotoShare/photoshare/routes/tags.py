@@ -1,12 +1,16 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter, HTTPException, Depends, Request, Response, status
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from photoshare.database.db import get_db
+from photoshare.database.db import get_db, get_read_db, pin_primary
 from photoshare.schemas import TagModel, TagResponse
 from photoshare.repository import tags as repository_tags
 from photoshare.services.auth import auth_service
+from photoshare.services.coalesce import coalesced_json
+from photoshare.services.etag import conditional_response, make_etag
 from photoshare.database.models import User
 
 router = APIRouter(prefix='/tags', tags=["tags"])
@@ -16,42 +20,63 @@ router = APIRouter(prefix='/tags', tags=["tags"])
 async def read_tags(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get all tags
 
+    Identical requests in flight share one query and one serialization.
+
     :param skip: The number of tags to skip
     :param limit: The number of tags to return
     :param db: Database session
     :return: List of tags
     """
-    tags = await repository_tags.get_tags(skip, limit, db)
-    return tags
+    body = await coalesced_json(
+        repository_tags.get_tags, List[TagResponse], skip, limit, db
+    )
+    return Response(body, media_type="application/json")
 
 
 @router.get("/{tag_id}", response_model=TagResponse)
 async def read_tag(
     tag_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get a tag by ID
 
     :param tag_id: The ID of the tag to retrieve
+    :param request: The incoming request
+    :param response: The outgoing response
     :param db: Database session
     :return: The tag
     """
+    version = await repository_tags.get_tag_version(tag_id, db)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found"
+        )
+    not_modified = conditional_response(
+        request, response, make_etag("tag", tag_id, version)
+    )
+    if not_modified:
+        return not_modified
     tag = await repository_tags.get_tag(tag_id, db)
     if tag is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
     return tag
 
 
-@router.post("/", response_model=TagResponse)
+@router.post(
+    "/", response_model=TagResponse,
+    dependencies=[Depends(pin_primary)]
+)
 async def create_tag(
     body: TagModel,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new tag
@@ -63,11 +88,14 @@ async def create_tag(
     return await repository_tags.create_tag(body, db)
 
 
-@router.put("/{tag_id}", response_model=TagResponse)
+@router.put(
+    "/{tag_id}", response_model=TagResponse,
+    dependencies=[Depends(pin_primary)]
+)
 async def update_tag(
     body: TagModel,
     tag_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update a tag
@@ -86,10 +114,13 @@ async def update_tag(
     return tag
 
 
-@router.delete("/{tag_id}", response_model=TagResponse)
+@router.delete(
+    "/{tag_id}", response_model=TagResponse,
+    dependencies=[Depends(pin_primary)]
+)
 async def remove_tag(
     tag_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Remove a tag
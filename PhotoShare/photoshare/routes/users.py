@@ -1,37 +1,55 @@
-from fastapi import FastAPI, Depends,  APIRouter, HTTPException, status
+from fastapi import (
+    FastAPI, Depends,  APIRouter, HTTPException, Request, Response, status
+)
 from photoshare.schemas import *
-from photoshare.database.db import Session, get_db
+from photoshare.database.db import (
+    AsyncSession, get_db, get_read_db, pin_primary
+)
 from photoshare.services.auth import auth_service
+from photoshare.services.etag import (
+    PRIVATE_CACHE, conditional_response, make_etag
+)
 from photoshare.repository.users import *
 
 router = APIRouter(prefix='/user', tags=["user"])
 
 @router.get("/{username}", response_model=UserProfile)
-def get_user_profile(
+async def get_user_profile(
     username: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get a user profile by username
 
     :param username: The username of the user to retrieve
+    :param request: The incoming request
+    :param response: The outgoing response
     :param db: Database session
+    :raise HTTPException: If the user doesn't exist
     :return: The user profile
     """
-    user, images_count = get_user_by_username(db, username)
-    user_data = {
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "created_at": user.created_at,
-        "images_count": images_count
-    }
-    return user_data
+    user = await get_user_by_username(db, username)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    not_modified = conditional_response(
+        request, response, make_etag("user", user.id, user.version),
+        PRIVATE_CACHE
+    )
+    if not_modified:
+        return not_modified
+    return user
 
-@router.put("/{username}/settings", response_model=UserResponse)
+@router.put(
+    "/{username}/settings", response_model=UserResponse,
+    dependencies=[Depends(pin_primary)]
+)
 async def update_user(
     body: UserModel,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
 ):
     """
@@ -55,11 +73,14 @@ async def update_user(
     return {"user": new_user, "detail": "User successfully created"}
 
 
-@router.put("/admin/{user_id}/role", response_model=UserResponse)
+@router.put(
+    "/admin/{user_id}/role", response_model=UserResponse,
+    dependencies=[Depends(pin_primary)]
+)
 async def set_user_role(
     user_id: int,
     role: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin: User = Depends(
         auth_service.get_current_user_roles(["admin"])
     )
@@ -82,10 +103,13 @@ async def set_user_role(
     return {"user": user, "detail": "User successfully update"}
 
 
-@router.put("/admin/{user_id}/ban", response_model=UserResponse)
+@router.put(
+    "/admin/{user_id}/ban", response_model=UserResponse,
+    dependencies=[Depends(pin_primary)]
+)
 async def ban_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin: User = Depends(
         auth_service.get_current_user_roles(["admin"])
     )
@@ -99,16 +123,19 @@ async def ban_user(
     :raise HTTPException: If the user is not found
     :return: The updated user
     """
-    user = set_user_active_status(db, user_id, is_active=False)
+    user = await set_user_active_status(db, user_id, is_active=False)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
-@router.put("/admin/{user_id}/unban", response_model=UserResponse)
+@router.put(
+    "/admin/{user_id}/unban", response_model=UserResponse,
+    dependencies=[Depends(pin_primary)]
+)
 async def unban_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_admin: User = Depends(
         auth_service.get_current_user_roles(["admin"])
     )
@@ -122,7 +149,7 @@ async def unban_user(
     :raise HTTPException: If the user is not found
     :return: The updated user
     """
-    user = set_user_active_status(db, user_id, is_active=True)
+    user = await set_user_active_status(db, user_id, is_active=True)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 
 class TagModel(BaseModel):
@@ -55,9 +55,9 @@ class ImageModel(ImageBase):
         max_tags = 5
 
 
-class ImageDB(ImageBase):
+class ImageSummary(ImageBase):
     """
-    Pydantic model representing image data retrieved from the database.
+    Pydantic model representing an image in a list of images.
 
     :param id: The unique identifier of the image.
     :type id: int
@@ -83,10 +83,108 @@ class ImageDB(ImageBase):
     url_view: str | None
     qr_code_view: str | None
     tags: List[TagResponse]
-    comments: List['CommentSchema']
     user_id: int
 
 
+class ImageDB(ImageSummary):
+    """
+    Pydantic model representing image data retrieved from the database.
+
+    :param comments: The comments of the image.
+    :type comments: List[CommentSchema]
+    """
+    comments: List['CommentSchema']
+
+
+class BatchUploadItem(BaseModel):
+    """
+    Pydantic model representing the outcome of one file of a batch upload.
+
+    :param filename: The name of the uploaded file.
+    :type filename: Optional[str]
+    :param status: "created" or "failed".
+    :type status: str
+    :param status_code: The HTTP status the file alone would have got.
+    :type status_code: int
+    :param detail: Why the file failed.
+    :type detail: Optional[str]
+    :param image: The created image.
+    :type image: Optional[ImageSummary]
+    """
+    filename: Optional[str] = None
+    status: Literal["created", "failed"]
+    status_code: int
+    detail: Optional[str] = None
+    image: Optional[ImageSummary] = None
+
+
+class BatchUploadResult(BaseModel):
+    """
+    Pydantic model representing the outcome of a batch upload.
+
+    :param created: The number of images created.
+    :type created: int
+    :param failed: The number of files that failed.
+    :type failed: int
+    :param items: The outcome of every file, in upload order.
+    :type items: List[BatchUploadItem]
+    """
+    created: int
+    failed: int
+    items: List[BatchUploadItem]
+
+
+class ImagePage(BaseModel):
+    """
+    Pydantic model representing a keyset paginated page of images.
+
+    :param items: The images on the page.
+    :type items: List[ImageSummary]
+    :param next_cursor: The cursor of the next page, None on the last page.
+    :type next_cursor: Optional[str]
+    """
+    items: List[ImageSummary]
+    next_cursor: Optional[str] = None
+
+
+class ReactionResponse(BaseModel):
+    """
+    Pydantic model representing an image after a user reacted to it.
+
+    :param image_id: The unique identifier of the image.
+    :type image_id: int
+    :param reaction: 1 for a like, -1 for a dislike, 0 for no reaction.
+    :type reaction: int
+    :param likes: The number of likes of the image.
+    :type likes: int
+    :param dislikes: The number of dislikes of the image.
+    :type dislikes: int
+    :param rate: The rating of the image.
+    :type rate: float
+    """
+    image_id: int
+    reaction: int
+    likes: int
+    dislikes: int
+    rate: float
+
+
+class ImageRank(BaseModel):
+    """
+    Pydantic model representing the position of an image in the leaderboard.
+
+    :param image_id: The unique identifier of the image.
+    :type image_id: int
+    :param rank: The position of the image, 1 for the best rated one.
+    :type rank: int
+    :param rate: The rating of the image.
+    :type rate: float
+    """
+    image_id: int
+    rank: int
+    rate: float
+
+
 class ImageUpdate(BaseModel):
     """
     Pydantic model representing image data used for image update.
@@ -183,12 +281,21 @@ class UserProfile(BaseModel):
     :type created_at: datetime
     :param images_count: The number of images uploaded by the user.
     :type images_count: int
+    :param comments_count: The number of comments written by the user.
+    :type comments_count: int
+    :param likes_received: The number of likes on the user's images.
+    :type likes_received: int
     """
     id: int
     username: str
     email: str
     created_at: datetime
     images_count: int
+    comments_count: int
+    likes_received: int
+
+    class Config:
+        from_attributes = True
 
 
 class UserUpdate(BaseModel):
@@ -267,3 +374,211 @@ class ImageCreateFromPC(BaseModel):
     """
     description: str
     created_at: datetime
+
+
+class PoolStatus(BaseModel):
+    """
+    Pydantic model representing the state of the database connection pool.
+
+    :param pool: The class name of the pool.
+    :type pool: str
+    :param size: The configured number of pooled connections.
+    :type size: Optional[int]
+    :param max_overflow: The number of connections allowed above the size.
+    :type max_overflow: Optional[int]
+    :param timeout: Seconds a checkout waits before giving up.
+    :type timeout: Optional[float]
+    :param checked_out: The connections currently in use.
+    :type checked_out: Optional[int]
+    :param idle: The connections waiting in the pool.
+    :type idle: Optional[int]
+    :param overflow: The connections currently open above the size.
+    :type overflow: Optional[int]
+    :param checkouts: The number of successful checkouts.
+    :type checkouts: Optional[int]
+    :param timeouts: The number of checkouts that timed out.
+    :type timeouts: Optional[int]
+    :param wait_avg_ms: The average checkout wait in milliseconds.
+    :type wait_avg_ms: Optional[float]
+    :param wait_max_ms: The longest checkout wait in milliseconds.
+    :type wait_max_ms: Optional[float]
+    """
+    pool: str
+    size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    timeout: Optional[float] = None
+    checked_out: Optional[int] = None
+    idle: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts: Optional[int] = None
+    timeouts: Optional[int] = None
+    wait_avg_ms: Optional[float] = None
+    wait_max_ms: Optional[float] = None
+
+
+class CacheStats(BaseModel):
+    """
+    Pydantic model representing the counters of an in-process cache.
+
+    :param hits: The number of lookups answered by the cache.
+    :type hits: int
+    :param misses: The number of lookups that missed.
+    :type misses: int
+    :param hit_rate: The share of lookups answered by the cache.
+    :type hit_rate: float
+    :param size: The number of cached entries.
+    :type size: int
+    :param maxsize: The maximum number of cached entries.
+    :type maxsize: int
+    """
+    hits: int
+    misses: int
+    hit_rate: float
+    size: int
+    maxsize: int
+
+
+class CoalescingStats(BaseModel):
+    """
+    Pydantic model representing the counters of a coalesced read function.
+
+    :param calls: The number of calls that ran.
+    :type calls: int
+    :param coalesced: The number of calls collapsed into a running one.
+    :type coalesced: int
+    :param coalesced_rate: The share of calls collapsed into a running one.
+    :type coalesced_rate: float
+    :param in_flight: The number of calls running.
+    :type in_flight: int
+    """
+    calls: int
+    coalesced: int
+    coalesced_rate: float
+    in_flight: int
+
+
+class UploadStatus(BaseModel):
+    """
+    Pydantic model representing the state of the upload pool.
+
+    :param workers: The number of upload threads.
+    :type workers: int
+    :param queue_size: The number of uploads allowed to wait for a thread.
+    :type queue_size: int
+    :param timeout: Seconds a request waits for its upload.
+    :type timeout: float
+    :param running: The uploads currently running.
+    :type running: int
+    :param queued: The uploads currently waiting for a thread.
+    :type queued: int
+    :param completed: The number of successful uploads.
+    :type completed: int
+    :param failed: The number of uploads that raised.
+    :type failed: int
+    :param timeouts: The number of uploads that timed out.
+    :type timeouts: int
+    :param rejected: The number of uploads refused with a full queue.
+    :type rejected: int
+    :param deduplicated: The number of uploads skipped as already stored.
+    :type deduplicated: int
+    :param latency_avg_ms: The average upload latency in milliseconds.
+    :type latency_avg_ms: float
+    :param latency_max_ms: The longest upload latency in milliseconds.
+    :type latency_max_ms: float
+    """
+    workers: int
+    queue_size: int
+    timeout: float
+    running: int
+    queued: int
+    completed: int
+    failed: int
+    timeouts: int
+    rejected: int
+    deduplicated: int
+    latency_avg_ms: float
+    latency_max_ms: float
+
+
+class JobStatus(BaseModel):
+    """
+    Pydantic model representing the status of a background job.
+
+    :param id: The id of the job.
+    :type id: str
+    :param kind: The kind of job, e.g. "transform".
+    :type kind: str
+    :param status: One of "queued", "running", "done" and "failed".
+    :type status: str
+    :param result: The result of a finished job.
+    :type result: Optional[dict]
+    :param error: The reason a job failed.
+    :type error: Optional[str]
+    :param created_at: When the job was queued.
+    :type created_at: datetime
+    :param started_at: When the last run of the job started.
+    :type started_at: Optional[datetime]
+    :param finished_at: When the job finished.
+    :type finished_at: Optional[datetime]
+    :param attempts: The number of runs of the job.
+    :type attempts: int
+    """
+    id: str
+    kind: str
+    status: str
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    attempts: int = 0
+
+
+class QrCacheStats(BaseModel):
+    """
+    Pydantic model representing the counters of the QR code cache.
+
+    :param hits: The number of QR codes found stored already.
+    :type hits: int
+    :param misses: The number of QR codes rendered and stored.
+    :type misses: int
+    :param hit_rate: The share of QR codes found stored already.
+    :type hit_rate: float
+    :param evicted: The number of unused QR codes removed.
+    :type evicted: int
+    """
+    hits: int
+    misses: int
+    hit_rate: float
+    evicted: int
+
+
+class DerivedCacheStats(BaseModel):
+    """
+    Pydantic model representing the counters of the transformed image cache.
+
+    :param hits: The number of renderings served from the cache.
+    :type hits: int
+    :param misses: The number of renderings made.
+    :type misses: int
+    :param hit_rate: The share of renderings served from the cache.
+    :type hit_rate: float
+    :param evicted: The number of renderings evicted.
+    :type evicted: int
+    :param entries: The number of cached renderings.
+    :type entries: int
+    :param leased: The number of renderings being sent, kept from eviction.
+    :type leased: int
+    :param size_bytes: The size of the cached renderings.
+    :type size_bytes: int
+    :param max_bytes: The size the cached renderings are kept under.
+    :type max_bytes: int
+    """
+    hits: int
+    misses: int
+    hit_rate: float
+    evicted: int
+    entries: int
+    leased: int
+    size_bytes: int
+    max_bytes: int
@@ -5,12 +5,13 @@ from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from photoshare.database.models import User
 
 from photoshare.database.db import get_db
 from photoshare.repository import users as repository_users
 from photoshare.conf.config import settings
+from photoshare.services.cache import token_cache, user_cache
 
 
 class Auth:
@@ -111,17 +112,43 @@ class Auth:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail='Could not validate credentials')
 
+    def decode_access_token(self, token: str) -> str | None:
+        """
+        Verifies an access token and returns the email it was issued for.
+
+        Verified claims are kept in the token cache until the token expires,
+        so a token reused by the client is only decoded once.
+
+        :param token: The access token.
+        :return: The email from the token, or None if the token is invalid.
+        """
+        payload = token_cache.get(token)
+        if payload is None:
+            try:
+                payload = jwt.decode(
+                    token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
+                )
+            except JWTError:
+                return None
+            token_cache.put(token, payload)
+        if payload.get("scope") != "access_token":
+            return None
+        return payload.get("sub")
+
     async def get_current_user(
         self,
         token: str = Depends(oauth2_scheme),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
     ) -> User:
         """
         Retrieves the current user based on the provided access token.
 
+        Users are served from the user cache when possible. A cached user is
+        a detached snapshot: reference it by id, don't add it to a session.
+
         :param token: The access token.
         :param db: The database session.
-        :raise HTTPException: If the token cannot be validated or the user does not exist.
+        :raise HTTPException: If the token cannot be validated, the user does not exist or is inactive.
         :return: The current user.
         """
         credentials_exception = HTTPException(
@@ -129,24 +156,21 @@ class Auth:
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-
-        try:
-            # Decode JWT
-            payload = jwt.decode(
-                token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
-            )
-            if payload['scope'] == 'access_token':
-                email = payload["sub"]
-                if email is None:
-                    raise credentials_exception
-            else:
-                raise credentials_exception
-        except JWTError as e:
+        email = self.decode_access_token(token)
+        if email is None:
             raise credentials_exception
 
-        user = await repository_users.get_user_by_email(email, db)
+        user = await user_cache.get(email)
         if user is None:
-            raise credentials_exception
+            user = await repository_users.get_user_by_email(email, db)
+            if user is None:
+                raise credentials_exception
+            await user_cache.set(user)
+        if not user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User is inactive"
+            )
         return user
 
     def get_current_user_roles(self, required_roles: list) -> callable:
@@ -158,7 +182,7 @@ class Auth:
         """
         async def roles_verifier(
                 current_user: User = Depends(self.get_current_user),
-                db: Session = Depends(get_db)
+                db: AsyncSession = Depends(get_db)
         ) -> User:
             """
             Verifies if the current user has the required roles.
@@ -0,0 +1,301 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from photoshare.conf.config import settings
+from photoshare.database.models import User
+
+logger = logging.getLogger(__name__)
+
+# Columns kept in a user snapshot. Secrets such as the password hash and
+# the refresh token are never cached.
+SNAPSHOT_FIELDS = ("id", "email", "username", "role", "is_active")
+
+
+class MemoryCache:
+    """
+    In-process stand-in for the subset of the Redis API used by the caches,
+    for tests and single-process local setups.
+    """
+
+    def __init__(self):
+        self._data = {}
+
+    async def get(self, key: str) -> str | None:
+        """
+        Method for reading a key
+
+        :param key: str: Cache key
+        :return: str | None: Stored value, None if missing or expired
+        """
+        value, expires = self._data.get(key, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(
+        self, key: str, value: str, ex: int | None = None, nx: bool = False
+    ) -> bool | None:
+        """
+        Method for storing a key
+
+        :param key: str: Cache key
+        :param value: str: Value to store
+        :param ex: int | None: Time to live in seconds
+        :param nx: bool: Only store the key if it doesn't exist
+        :return: bool | None: True if stored, None if nx kept the old value
+        """
+        if nx and await self.get(key) is not None:
+            return None
+        expires = time.monotonic() + ex if ex else None
+        self._data[key] = (value, expires)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        """
+        Method for removing keys
+
+        :param keys: str: Cache keys
+        :return: int: Number of removed keys
+        """
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+
+class UserCache:
+    """
+    Cache of authenticated user snapshots keyed by email.
+
+    Redis being unavailable never fails a request: reads fall back to the
+    database and the failure is logged.
+
+    :param backend: Redis client or MemoryCache
+    :param ttl: int: Seconds a snapshot stays valid
+    """
+    prefix = "photoshare:user:"
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def get(self, email: str) -> User | None:
+        """
+        Method for reading a cached user
+
+        :param email: str: User email
+        :return: User | None: Detached User built from the snapshot
+        """
+        try:
+            raw = await self.backend.get(self.prefix + email)
+        except RedisError:
+            logger.warning("User cache read failed", exc_info=True)
+            return None
+        if raw is None:
+            return None
+        return User(**json.loads(raw))
+
+    async def set(self, user: User) -> None:
+        """
+        Method for caching a user snapshot
+
+        :param user: User: User loaded from the database
+        :return: None
+        """
+        snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+        try:
+            await self.backend.set(
+                self.prefix + user.email, json.dumps(snapshot), ex=self.ttl
+            )
+        except RedisError:
+            logger.warning("User cache write failed", exc_info=True)
+
+    async def invalidate(self, *emails: str) -> None:
+        """
+        Method for dropping cached users after they change
+
+        :param emails: str: Emails of the changed users
+        :return: None
+        """
+        try:
+            await self.backend.delete(
+                *(self.prefix + email for email in emails)
+            )
+        except RedisError:
+            logger.warning("User cache invalidation failed", exc_info=True)
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified JWT claims.
+
+    Entries are keyed by the SHA-256 of the token, so the cache never holds
+    usable credentials, and are dropped once the token's ``exp`` passes.
+    A cache of size 0 stores nothing.
+
+    :param maxsize: int: Maximum number of cached tokens
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        """
+        Method for reading the claims of a token verified before
+
+        :param token: str: Encoded JWT
+        :return: dict | None: Claims, None if unknown or expired
+        """
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None and claims["exp"] <= time.time():
+                del self._entries[key]
+                claims = None
+            if claims is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        """
+        Method for caching the claims of a verified token
+
+        :param token: str: Encoded JWT
+        :param claims: dict: Decoded claims with a numeric ``exp``
+        :return: None
+        """
+        if self.maxsize <= 0 or "exp" not in claims:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Method for emptying the cache and resetting the counters
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Method for reading the cache counters
+
+        :return: dict: hits, misses, hit rate, size and maximum size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+class TagCache:
+    """
+    Bounded LRU cache of tag ids keyed by tag name.
+
+    The cache is local to the process, so ids read from it are checked
+    against the database when they are used. A cache of size 0 stores
+    nothing.
+
+    :param maxsize: int: Maximum number of cached tags
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, names) -> dict[str, int]:
+        """
+        Method for reading the ids of the cached tags among the names
+
+        :param names: Iterable[str]: Tag names
+        :return: dict[str, int]: Ids of the cached names
+        """
+        found = {}
+        with self._lock:
+            for name in names:
+                tag_id = self._entries.get(name)
+                if tag_id is not None:
+                    self._entries.move_to_end(name)
+                    found[name] = tag_id
+        return found
+
+    def put_many(self, ids: dict[str, int]) -> None:
+        """
+        Method for caching tag ids
+
+        :param ids: dict[str, int]: Tag ids keyed by name
+        :return: None
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries.update(ids)
+            for name in ids:
+                self._entries.move_to_end(name)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, *names: str) -> None:
+        """
+        Method for dropping renamed or deleted tags
+
+        :param names: str: Tag names
+        :return: None
+        """
+        with self._lock:
+            for name in names:
+                self._entries.pop(name, None)
+
+    def clear(self) -> None:
+        """
+        Method for emptying the cache
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+redis_client = redis.Redis(
+    host=settings.redis_host,
+    port=settings.redis_port,
+    password=settings.redis_password or None,
+    socket_timeout=settings.redis_timeout,
+    socket_connect_timeout=settings.redis_timeout,
+    decode_responses=True,
+)
+
+user_cache = UserCache(redis_client, settings.user_cache_ttl)
+
+token_cache = TokenCache(settings.token_cache_size)
+
+tag_cache = TagCache(settings.tag_cache_size)
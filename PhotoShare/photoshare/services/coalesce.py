@@ -0,0 +1,150 @@
+import asyncio
+import threading
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Hashable
+
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one in-flight call.
+
+    The first caller runs the call as a task and the callers arriving while
+    it runs await the same task. A caller giving up, e.g. on a client
+    disconnect, doesn't cancel the call for the others. Failures are shared
+    like results and nothing is kept once the call is over.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    async def run(
+        self,
+        key: Hashable,
+        call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Method for running a call unless an identical one is in flight
+
+        :param key: Hashable: Identity of the call, per event loop
+        :param call: Callable: Coroutine function running the call
+        :return: Any: Result of the call
+        """
+        key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = asyncio.ensure_future(call())
+                self._flights[key] = flight
+                flight.add_done_callback(
+                    lambda _: self._forget(key, flight)
+                )
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(flight)
+
+    def _forget(self, key: Hashable, flight: asyncio.Future) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def clear(self) -> None:
+        """
+        Method for resetting the counters
+
+        :return: None
+        """
+        with self._lock:
+            self.calls = self.coalesced = 0
+
+    def stats(self) -> dict:
+        """
+        Method for reading the counters
+
+        :return: dict: calls run, calls collapsed into them, the share of
+            collapsed calls and the calls in flight
+        """
+        with self._lock:
+            requests = self.calls + self.coalesced
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "coalesced_rate": (
+                    round(self.coalesced / requests, 4) if requests else 0.0
+                ),
+                "in_flight": len(self._flights),
+            }
+
+
+# One per coalesced function, keyed by the function name
+flights: dict[str, SingleFlight] = {}
+
+
+@lru_cache
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+@lru_cache
+def _sessionmaker(bind) -> async_sessionmaker:
+    # Same options as the request sessions
+    return async_sessionmaker(bind, autoflush=False, expire_on_commit=False)
+
+
+async def coalesced_json(
+    func: Callable[..., Awaitable[Any]],
+    schema,
+    *args,
+    key: tuple = ()
+) -> bytes | None:
+    """
+    Function to run a read repository function and serialize its result,
+    sharing both with the identical calls in flight on this worker
+
+    A session argument stands for its engine in the call identity, so
+    reads from the primary and from the replica are never shared. The call
+    runs on a session of its own from that engine, which no caller closes
+    or cancels while others wait for it.
+
+    :param func: Callable: Read repository function
+    :param schema: Response schema of the result, e.g. ``List[TagResponse]``
+    :param args: Arguments of the function, one of them the session
+    :param key: tuple: Extra identity of the call, e.g. the row version
+    :return: bytes | None: JSON of the result, None if the result is None
+    """
+    async def call():
+        async with _sessionmaker(bind)() as session:
+            result = await func(*(
+                session if isinstance(arg, AsyncSession) else arg
+                for arg in args
+            ))
+            if result is None:
+                return None
+            adapter = _adapter(schema)
+            return adapter.dump_json(
+                adapter.validate_python(result, from_attributes=True)
+            )
+
+    bind = next(
+        arg.bind for arg in args if isinstance(arg, AsyncSession)
+    )
+    flight = flights.setdefault(func.__name__, SingleFlight())
+    identity = tuple(
+        bind if isinstance(arg, AsyncSession) else arg for arg in args
+    ) + key
+    return await flight.run(identity, call)
+
+
+def coalescing_stats() -> dict[str, dict]:
+    """
+    Function to read the counters of every coalesced function
+
+    :return: dict[str, dict]: Counters keyed by function name
+    """
+    return {name: flight.stats() for name, flight in flights.items()}
@@ -0,0 +1,192 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from starlette.concurrency import run_in_threadpool
+
+from photoshare.conf.config import settings
+from photoshare.services.coalesce import SingleFlight
+from photoshare.services.jobs import run_in_process
+from photoshare.services.render import (
+    PRESET_FORMATS, RENDER_VERSION, render_preset
+)
+from photoshare.services.storage import content_hash
+
+
+@lru_cache(maxsize=4096)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    with open(path, "rb") as file:
+        return content_hash(file)
+
+
+def file_digest(path: str) -> str:
+    """
+    Function to hash a file, remembering the hashes of unchanged files
+
+    :param path: str: Path of the file
+    :return: str: Hex SHA-256 of the content
+    """
+    stat = os.stat(path)
+    return _file_digest(path, stat.st_mtime_ns, stat.st_size)
+
+
+class DerivedCache:
+    """
+    On-disk cache of preset renderings keyed by the hash of the original
+    and the preset, bounded in bytes with least recently used eviction.
+
+    Renderings run in the job process pool and concurrent requests for the
+    same missing rendering share one. The recency order is kept in memory
+    and mirrored in the file modification times, which order the index
+    rebuilt after a restart. A rendering returned by ``get`` is leased
+    until ``release``, and eviction skips leased renderings, so a file is
+    never removed while a response is sending it.
+
+    :param root: str: Directory holding the renderings
+    :param max_bytes: int: Total size the renderings are kept under
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._index = None
+        self._bytes = 0
+        self._leases = {}
+        self._flights = SingleFlight()
+
+    def _load_index(self) -> OrderedDict:
+        if self._index is None:
+            os.makedirs(self.root, exist_ok=True)
+            entries = []
+            with os.scandir(self.root) as found:
+                for entry in found:
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        entries.append(
+                            (stat.st_mtime_ns, entry.name, stat.st_size)
+                        )
+            self._index = OrderedDict(
+                (name, size) for _, name, size in sorted(entries)
+            )
+            self._bytes = sum(self._index.values())
+        return self._index
+
+    def _lease(self, name: str) -> bool:
+        with self._lock:
+            index = self._load_index()
+            if name not in index:
+                return False
+            try:
+                os.utime(os.path.join(self.root, name))
+            except FileNotFoundError:
+                self._bytes -= index.pop(name)
+                return False
+            index.move_to_end(name)
+            self._leases[name] = self._leases.get(name, 0) + 1
+            return True
+
+    def _evict(self) -> None:
+        # Called with the lock held. The newest rendering always stays, so
+        # a request can lease the file it just rendered.
+        index = self._index
+        newest = next(reversed(index), None)
+        excess = self._bytes - self.max_bytes
+        victims = []
+        for name, size in index.items():
+            if excess <= 0:
+                break
+            if name != newest and name not in self._leases:
+                victims.append(name)
+                excess -= size
+        for name in victims:
+            self._bytes -= index.pop(name)
+            self.evicted += 1
+            try:
+                os.unlink(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+    def _add(self, name: str, size: int) -> None:
+        with self._lock:
+            index = self._load_index()
+            self._bytes += size - index.pop(name, 0)
+            index[name] = size
+            self._evict()
+
+    async def _render(self, source: str, name: str, preset: int) -> None:
+        target = os.path.join(self.root, name)
+        size = await run_in_process(render_preset, source, target, preset)
+        self._add(name, size)
+
+    async def get(self, source: str, preset: int) -> str:
+        """
+        Method for getting the rendering of a preset, rendering it if
+        it isn't cached. The rendering is leased until it is released.
+
+        :param source: str: Path of the original image
+        :param preset: int: Key of the preset in PRESET_FORMATS
+        :return: str: Path of the rendering
+        """
+        digest = await run_in_threadpool(file_digest, source)
+        _, suffix = PRESET_FORMATS[preset]
+        name = f"{digest}-{preset}-v{RENDER_VERSION}{suffix}"
+        if await run_in_threadpool(self._lease, name):
+            with self._lock:
+                self.hits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            # Renders again if other renderings evicted it meanwhile
+            while True:
+                await self._flights.run(
+                    name, lambda: self._render(source, name, preset)
+                )
+                if await run_in_threadpool(self._lease, name):
+                    break
+        return os.path.join(self.root, name)
+
+    def release(self, path: str) -> None:
+        """
+        Method for releasing a rendering returned by get, which can be
+        evicted again once no response is sending it
+
+        :param path: str: Path of the rendering
+        :return: None
+        """
+        name = os.path.basename(path)
+        with self._lock:
+            leases = self._leases.pop(name, 0) - 1
+            if leases > 0:
+                self._leases[name] = leases
+            elif self._bytes > self.max_bytes:
+                self._evict()
+
+    def stats(self) -> dict:
+        """
+        Method for reading the counters
+
+        :return: dict: lookups, evictions and the cached renderings
+        """
+        with self._lock:
+            self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evicted": self.evicted,
+                "entries": len(self._index),
+                "leased": len(self._leases),
+                "size_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+derived_cache = DerivedCache(
+    settings.derived_root, settings.derived_cache_bytes
+)
@@ -0,0 +1,77 @@
+from fastapi import Request, Response, status
+
+# Clients may keep a copy but must revalidate it on every use, which costs
+# a single version lookup and an empty 304 while nothing has changed.
+PUBLIC_CACHE = "public, no-cache"
+# Responses carrying personal data such as the email stay out of shared
+# caches.
+PRIVATE_CACHE = "private, no-cache"
+
+
+def make_etag(kind: str, key: int, version: int) -> str:
+    """
+    Builds the strong ETag of a versioned row.
+
+    :param kind: The kind of resource, e.g. "image".
+    :param key: The primary key of the row.
+    :param version: The version of the row.
+    :return: The quoted ETag.
+    """
+    return f'"{kind}-{key}-v{version}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Checks the If-None-Match header of a request against an ETag.
+
+    If-None-Match uses the weak comparison, so a W/ prefix added by a proxy
+    does not prevent a match.
+
+    :param request: The incoming request.
+    :param etag: The current ETag of the resource.
+    :return: True if the client already has the current representation.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in header.split(",")
+    )
+
+
+def etag_headers(etag: str, cache_control: str = PUBLIC_CACHE) -> dict:
+    """
+    Builds the validation headers of a versioned response.
+
+    :param etag: The current ETag of the resource.
+    :param cache_control: The Cache-Control header value.
+    :return: The ETag and Cache-Control headers.
+    """
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    cache_control: str = PUBLIC_CACHE
+) -> Response | None:
+    """
+    Answers a conditional GET before the resource is loaded.
+
+    :param request: The incoming request.
+    :param response: The response the route will return otherwise.
+    :param etag: The current ETag of the resource.
+    :param cache_control: The Cache-Control header value.
+    :return: An empty 304 response if the client's copy is current,
+        otherwise None after setting the headers on the response.
+    """
+    headers = etag_headers(etag, cache_control)
+    if etag_matches(request, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+    response.headers.update(headers)
+    return None
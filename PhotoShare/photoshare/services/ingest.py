@@ -0,0 +1,118 @@
+"""
+Streaming checks of uploaded images.
+
+The request body of an upload route is capped while it arrives, so an
+oversized upload is refused before it is spooled. Every uploaded file is
+then read once in chunks to check its size, sniff its type from the first
+bytes and hash it, before anything goes to the media storage.
+"""
+import hashlib
+from typing import BinaryIO
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CHUNK_SIZE = 64 * 1024
+
+# Multipart boundaries, part headers and form fields around the files
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Leading bytes of the accepted image types and their file extensions
+SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+TOO_LARGE = "Upload is too large"
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    """
+    Function to recognize an image from its first bytes
+
+    :param head: bytes: At least the first 12 bytes of the file
+    :return: str | None: File extension of the image type, None if it isn't
+        an accepted image
+    """
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    for signature, suffix in SIGNATURES:
+        if head.startswith(signature):
+            return suffix
+    return None
+
+
+def inspect_upload(file: BinaryIO, max_bytes: int) -> tuple[str, str]:
+    """
+    Function to check and hash an uploaded image in one pass and rewind it
+    for the upload. Reading stops at the first chunk over the limit.
+
+    :param file: BinaryIO: Seekable file positioned at the start
+    :param max_bytes: int: Largest accepted size
+    :raise HTTPException: If the file is too large or isn't an image
+    :return: tuple[str, str]: Hex SHA-256 of the content and the file
+        extension of the image type
+    """
+    head = file.read(CHUNK_SIZE)
+    suffix = sniff_image_type(head)
+    if suffix is None:
+        raise HTTPException(status_code=415, detail="Unsupported image type")
+    digest = hashlib.sha256()
+    size = 0
+    chunk = head
+    while chunk:
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=TOO_LARGE)
+        digest.update(chunk)
+        chunk = file.read(CHUNK_SIZE)
+    file.seek(0)
+    return digest.hexdigest(), suffix
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping the request body of the upload routes.
+
+    A declared Content-Length over the limit is refused before the body is
+    read. A chunked or understated body is cut off with a 413 as soon as
+    it passes the limit, so the multipart parser never spools the rest.
+
+    :param app: ASGIApp: The wrapped application
+    :param limits: dict[str, int]: Largest request body in bytes, keyed by
+        the path of the upload route
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limit = (
+            self.limits.get(scope["path"]) if scope["type"] == "http"
+            else None
+        )
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": TOO_LARGE}, status_code=413)
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=TOO_LARGE)
+            return message
+
+        await self.app(scope, limited_receive, send)
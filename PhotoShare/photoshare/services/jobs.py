@@ -0,0 +1,402 @@
+"""
+Background jobs for slow work such as image transformations.
+
+A job is enqueued with a kind and a JSON payload and its status is kept
+under a key that expires after ``JOB_TTL`` seconds. CPU bound steps run in
+a process pool of ``JOB_PROCESSES`` processes.
+
+With ``JOB_BACKEND=memory`` jobs run in the API process right after the
+response is sent. With ``JOB_BACKEND=redis`` they wait in a Redis list for
+workers started from the PhotoShare directory with::
+
+    python -m photoshare.services.jobs
+
+A worker moves the job it takes to a processing list and drops it from
+there once the job is over. No job runs longer than ``JOB_TIMEOUT``
+seconds, so the jobs left in the list past that belonged to a worker that
+died: they are queued again, or failed after ``JOB_MAX_ATTEMPTS`` runs.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+
+from fastapi import HTTPException
+
+from photoshare.conf.config import settings
+from photoshare.database.db import AsyncLocalSession
+from photoshare.services.cache import MemoryCache, redis_client
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Seconds past the timeout before a running job counts as abandoned, so a
+# worker failing it on time never races the recovery
+RECOVERY_GRACE = 60
+
+_process_pool = None
+
+
+def process_pool() -> ProcessPoolExecutor:
+    """
+    Function to get the process pool of CPU bound job steps, created on
+    first use. Processes are spawned, so they never inherit the threads
+    and connections of the parent.
+
+    :return: ProcessPoolExecutor: The pool
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.job_processes,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+async def run_in_process(func: Callable, *args) -> Any:
+    """
+    Function to run a CPU bound function in the process pool
+
+    :param func: Callable: Picklable module level function
+    :param args: Picklable arguments
+    :return: Any: Result of the function
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(process_pool(), func, *args)
+
+
+def shutdown_process_pool() -> None:
+    """
+    Function to stop the process pool, e.g. on application shutdown
+
+    :return: None
+    """
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+
+class MemoryQueue(MemoryCache):
+    """
+    In-process stand-in for the subset of the Redis API used by the job
+    queue, for tests and single-process local setups.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lists = {}
+
+    async def lpush(self, key: str, *values: str) -> int:
+        """
+        Method for pushing values to the head of a list
+
+        :param key: str: List key
+        :param values: str: Values to push
+        :return: int: Length of the list
+        """
+        items = self._lists.setdefault(key, [])
+        items[:0] = reversed(values)
+        return len(items)
+
+    async def rpop(self, key: str) -> str | None:
+        """
+        Method for popping the value at the tail of a list
+
+        :param key: str: List key
+        :return: str | None: Value, None if the list is empty
+        """
+        items = self._lists.get(key)
+        return items.pop() if items else None
+
+    async def rpoplpush(self, src: str, dst: str) -> str | None:
+        """
+        Method for moving the value at the tail of a list to the head of
+        another one
+
+        :param src: str: Key of the list to pop from
+        :param dst: str: Key of the list to push to
+        :return: str | None: Value, None if the source list is empty
+        """
+        value = await self.rpop(src)
+        if value is not None:
+            await self.lpush(dst, value)
+        return value
+
+    async def lrem(self, key: str, count: int, value: str) -> int:
+        """
+        Method for removing occurrences of a value from a list, head first
+
+        :param key: str: List key
+        :param count: int: Number of occurrences to remove, 0 for all
+        :param value: str: Value to remove
+        :return: int: Number of removed values
+        """
+        items = self._lists.get(key, [])
+        removed = 0
+        while value in items and (count == 0 or removed < count):
+            items.remove(value)
+            removed += 1
+        return removed
+
+    async def lrange(self, key: str, start: int, end: int) -> list[str]:
+        """
+        Method for reading a range of a list
+
+        :param key: str: List key
+        :param start: int: First index
+        :param end: int: Last index, inclusive, -1 for the tail
+        :return: list[str]: Values
+        """
+        items = self._lists.get(key, [])
+        return items[start:None if end == -1 else end + 1]
+
+
+class JobQueue:
+    """
+    Queue of background jobs with persisted status.
+
+    Handlers are coroutine functions registered per kind with
+    ``@job_queue.handler(kind)``. They get a database session and the
+    payload as keyword arguments and return a JSON serializable result.
+
+    :param backend: Redis client or MemoryQueue
+    :param in_process: bool: Whether jobs run in the process that enqueued
+        them instead of waiting for a worker
+    :param ttl: int: Seconds a job status is kept
+    :param timeout: int: Seconds a job may run before it fails
+    :param max_attempts: int: Runs of a job before it fails for good when
+        its workers die
+    """
+    prefix = "photoshare:job:"
+    queue_key = "photoshare:jobs"
+    processing_key = "photoshare:jobs:processing"
+
+    def __init__(
+        self, backend, in_process: bool, ttl: int, timeout: int = 600,
+        max_attempts: int = 3
+    ):
+        self.backend = backend
+        self.in_process = in_process
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        # Jobs seen taken but not started by the previous recovery
+        self._unstarted = set()
+        self.session_factory = AsyncLocalSession
+        self.handlers = {}
+
+    def handler(self, kind: str):
+        """
+        Decorator registering the handler of a kind of job
+
+        :param kind: str: Kind of job
+        :return: Decorator
+        """
+        def register(func: Callable[..., Awaitable[Any]]):
+            self.handlers[kind] = func
+            return func
+        return register
+
+    async def _save(self, job: dict) -> None:
+        await self.backend.set(
+            self.prefix + job["id"], json.dumps(job), ex=self.ttl
+        )
+
+    async def get(self, job_id: str) -> dict | None:
+        """
+        Method for reading the status of a job
+
+        :param job_id: str: Job id
+        :return: dict | None: The job, None if unknown or expired
+        """
+        raw = await self.backend.get(self.prefix + job_id)
+        return json.loads(raw) if raw else None
+
+    async def enqueue(self, kind: str, payload: dict, owner_id: int) -> dict:
+        """
+        Method for queueing a job
+
+        Jobs run in process are started by the caller, e.g. as a background
+        task of the response, the others are pushed to the workers.
+
+        :param kind: str: Kind of job, must have a handler
+        :param payload: dict: JSON serializable arguments of the handler
+        :param owner_id: int: Id of the user allowed to read the job
+        :return: dict: The queued job
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler for {kind} jobs")
+        job = {
+            "id": uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "owner_id": owner_id,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "attempts": 0,
+        }
+        await self._save(job)
+        if not self.in_process:
+            await self.backend.lpush(self.queue_key, job["id"])
+        return job
+
+    async def run(self, job_id: str) -> dict | None:
+        """
+        Method for running a queued job and storing its outcome
+
+        Every attempt of a job is claimed with SET NX, so workers taking
+        the same job at once never both run it.
+
+        :param job_id: str: Job id
+        :return: dict | None: The finished job, None if it expired
+        """
+        job = await self.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return job
+        attempt = job.get("attempts", 0) + 1
+        claimed = await self.backend.set(
+            f"{self.prefix}{job_id}:claim:{attempt}", 1, ex=self.ttl, nx=True
+        )
+        if not claimed:
+            return job
+        job["status"] = RUNNING
+        job["started_at"] = datetime.now().isoformat()
+        job["attempts"] = attempt
+        await self._save(job)
+        try:
+            async with self.session_factory() as db:
+                job["result"] = await asyncio.wait_for(
+                    self.handlers[job["kind"]](db, **job["payload"]),
+                    self.timeout
+                )
+            job["status"] = DONE
+        except HTTPException as error:
+            job["status"], job["error"] = FAILED, str(error.detail)
+        except asyncio.TimeoutError:
+            job["status"], job["error"] = FAILED, "Job timed out"
+        except Exception:
+            logger.exception("Job %s failed", job_id)
+            job["status"], job["error"] = FAILED, "Job failed"
+        job["finished_at"] = datetime.now().isoformat()
+        await self._save(job)
+        return job
+
+    async def recover(self) -> int:
+        """
+        Method for queueing again the jobs of workers that died
+
+        A job left running past the timeout is queued again, or failed once
+        it has used up its attempts. A job taken from the queue but still
+        not started at the next recovery is queued again. Only the worker
+        removing a job from the processing list queues it again, so
+        concurrent recoveries don't queue it twice.
+
+        :return: int: Number of jobs queued again
+        """
+        requeued = 0
+        unstarted = set()
+        now = datetime.now()
+        for job_id in await self.backend.lrange(self.processing_key, 0, -1):
+            job = await self.get(job_id)
+            if job is not None and job["status"] == QUEUED:
+                if job_id not in self._unstarted:
+                    unstarted.add(job_id)
+                    continue
+            elif job is not None and job["status"] == RUNNING:
+                started = datetime.fromisoformat(
+                    job.get("started_at") or job["created_at"]
+                )
+                if (now - started).total_seconds() < (
+                    self.timeout + RECOVERY_GRACE
+                ):
+                    continue
+            if await self.backend.lrem(self.processing_key, 1, job_id) != 1:
+                # Another worker recovered it
+                continue
+            if job is not None and job["status"] == RUNNING:
+                if job.get("attempts", 0) >= self.max_attempts:
+                    job["status"], job["error"] = FAILED, "Job timed out"
+                    job["finished_at"] = now.isoformat()
+                else:
+                    job["status"] = QUEUED
+                await self._save(job)
+            if job is not None and job["status"] == QUEUED:
+                logger.warning("Requeueing abandoned job %s", job_id)
+                await self.backend.lpush(self.queue_key, job_id)
+                requeued += 1
+        self._unstarted = unstarted
+        return requeued
+
+    async def _process(self, job_id: str) -> None:
+        try:
+            await self.run(job_id)
+        finally:
+            await self.backend.lrem(self.processing_key, 1, job_id)
+
+    async def work(self, concurrency: int, poll_interval: float = 0.5):
+        """
+        Method for running queued jobs until cancelled, and queueing again
+        the abandoned ones every half timeout
+
+        :param concurrency: int: Number of jobs running at a time
+        :param poll_interval: float: Seconds to wait when the queue is empty
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(concurrency)
+        running = set()
+        next_recovery = loop.time()
+        while True:
+            if loop.time() >= next_recovery:
+                await self.recover()
+                next_recovery = loop.time() + self.timeout / 2
+            await slots.acquire()
+            job_id = await self.backend.rpoplpush(
+                self.queue_key, self.processing_key
+            )
+            if job_id is None:
+                slots.release()
+                await asyncio.sleep(poll_interval)
+                continue
+            task = asyncio.create_task(self._process(job_id))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+
+job_queue = JobQueue(
+    redis_client if settings.job_backend == "redis" else MemoryQueue(),
+    in_process=settings.job_backend != "redis",
+    ttl=settings.job_ttl,
+    timeout=settings.job_timeout,
+    max_attempts=settings.job_max_attempts
+)
+
+
+async def main():
+    # Registers the job handlers
+    import photoshare.repository.images  # noqa: F401
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info(
+        "job worker started with %d slots", settings.job_concurrency
+    )
+    try:
+        await job_queue.work(settings.job_concurrency)
+    finally:
+        shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
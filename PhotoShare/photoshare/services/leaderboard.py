@@ -0,0 +1,481 @@
+"""
+Leaderboard of images ranked by rate, kept in a Redis sorted set.
+
+Rebuild it from the database after drift, e.g. after restoring a backup
+or flushing Redis, from the PhotoShare directory::
+
+    python -m photoshare.services.leaderboard
+"""
+import asyncio
+import logging
+
+from redis.exceptions import RedisError
+from sortedcontainers import SortedList
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from photoshare.conf.config import settings
+from photoshare.database.db import AsyncLocalSession
+from photoshare.database.models import Image
+from photoshare.services.cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH = 1000
+
+# Seconds before writes stop journaling for a rebuild that never finished
+REBUILD_TIMEOUT = 3600
+
+
+def _member(image_id: int) -> str:
+    # Zero padded, so members with the same rate sort by id
+    return f"{image_id:012d}"
+
+
+class MemoryPipeline:
+    """
+    Stand-in for a non-transactional Redis pipeline of MemorySortedSets.
+    Commands are queued and run one after the other on execute.
+
+    :param backend: MemorySortedSets: The backend running the commands
+    """
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._commands.append((getattr(self._backend, name), args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        """
+        Method for running the queued commands
+
+        :return: list: Result of every command
+        """
+        commands, self._commands = self._commands, []
+        return [await command(*args, **kw) for command, args, kw in commands]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands = []
+
+
+class MemorySortedSets:
+    """
+    In-process stand-in for the subset of the Redis API used by the
+    leaderboard, for tests and single-process local setups. Members are kept
+    in a SortedList, so updates, ranks and ranges cost O(log n).
+    """
+
+    def __init__(self):
+        self._sets = {}
+        self._values = {}
+
+    def _set(self, key: str) -> tuple[SortedList, dict]:
+        return self._sets.setdefault(key, (SortedList(), {}))
+
+    async def zadd(self, key: str, mapping: dict[str, float]) -> int:
+        """
+        Method for adding members or moving them to a new score
+
+        :param key: str: Sorted set key
+        :param mapping: dict[str, float]: Scores keyed by member
+        :return: int: Number of new members
+        """
+        entries, scores = self._set(key)
+        added = 0
+        for member, score in mapping.items():
+            old = scores.get(member)
+            if old is None:
+                added += 1
+            else:
+                entries.remove((old, member))
+            scores[member] = float(score)
+            entries.add((float(score), member))
+        return added
+
+    async def zrem(self, key: str, *members: str) -> int:
+        """
+        Method for removing members
+
+        :param key: str: Sorted set key
+        :param members: str: Members to remove
+        :return: int: Number of removed members
+        """
+        entries, scores = self._set(key)
+        removed = 0
+        for member in members:
+            score = scores.pop(member, None)
+            if score is not None:
+                entries.remove((score, member))
+                removed += 1
+        if not scores:
+            del self._sets[key]
+        return removed
+
+    async def zrevrange(self, key: str, start: int, end: int) -> list[str]:
+        """
+        Method for reading members by rank, highest score first
+
+        :param key: str: Sorted set key
+        :param start: int: First rank, negative counts from the end
+        :param end: int: Last rank, inclusive, negative counts from the end
+        :return: list[str]: Members
+        """
+        entries, _ = self._sets.get(key, ((), None))
+        size = len(entries)
+        start = max(start + size if start < 0 else start, 0)
+        end = min(end + size if end < 0 else end, size - 1)
+        if start > end:
+            return []
+        return [
+            member for _, member in
+            reversed(entries[size - 1 - end:size - start])
+        ]
+
+    async def zrevrank(self, key: str, member: str) -> int | None:
+        """
+        Method for reading the rank of a member, highest score first
+
+        :param key: str: Sorted set key
+        :param member: str: Member
+        :return: int | None: 0-based rank, None if missing
+        """
+        entries, scores = self._sets.get(key, ((), {}))
+        score = scores.get(member)
+        if score is None:
+            return None
+        return len(entries) - 1 - entries.index((score, member))
+
+    async def zscore(self, key: str, member: str) -> float | None:
+        """
+        Method for reading the score of a member
+
+        :param key: str: Sorted set key
+        :param member: str: Member
+        :return: float | None: Score, None if missing
+        """
+        _, scores = self._sets.get(key, ((), {}))
+        return scores.get(member)
+
+    async def set(self, key: str, value, ex: int | None = None) -> None:
+        """
+        Method for storing a plain key
+
+        :param key: str: Key
+        :param value: Value to store
+        :param ex: int | None: Ignored, keys never expire
+        :return: None
+        """
+        self._values[key] = value
+
+    async def hset(self, key: str, field: str, value) -> int:
+        """
+        Method for storing a field of a hash
+
+        :param key: str: Hash key
+        :param field: str: Field
+        :param value: Value to store
+        :return: int: 1 if the field is new
+        """
+        fields = self._values.setdefault(key, {})
+        added = field not in fields
+        fields[field] = str(value)
+        return int(added)
+
+    async def hgetall(self, key: str) -> dict:
+        """
+        Method for reading every field of a hash
+
+        :param key: str: Hash key
+        :return: dict: Values keyed by field
+        """
+        return dict(self._values.get(key, {}))
+
+    async def exists(self, *keys: str) -> int:
+        """
+        Method for counting the existing keys
+
+        :param keys: str: Keys
+        :return: int: Number of existing keys
+        """
+        return sum(
+            key in self._sets or key in self._values for key in keys
+        )
+
+    async def delete(self, *keys: str) -> int:
+        """
+        Method for removing keys
+
+        :param keys: str: Keys
+        :return: int: Number of removed keys
+        """
+        return sum(
+            (self._sets.pop(key, None) or self._values.pop(key, None))
+            is not None
+            for key in keys
+        )
+
+    async def rename(self, src: str, dst: str) -> None:
+        """
+        Method for replacing a sorted set with another one
+
+        :param src: str: Key of the new sorted set
+        :param dst: str: Key to replace
+        :return: None
+        """
+        self._sets[dst] = self._sets.pop(src)
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        """
+        Method for batching commands like a Redis pipeline
+
+        :param transaction: bool: Ignored, commands never interleave
+        :return: MemoryPipeline: The pipeline
+        """
+        return MemoryPipeline(self)
+
+
+class Leaderboard:
+    """
+    Images ranked by rate, highest first, ties broken by the newest image
+    like the rating query.
+
+    The sorted set is moved by every rate change and answers top-N and rank
+    lookups in O(log n). Reads return None until the leaderboard has been
+    built or while the backend is unavailable, and callers fall back to the
+    database then. Writes never fail a request, and while a rebuild runs
+    they are also journaled so the rebuild can replay them.
+
+    :param backend: Redis client or MemorySortedSets
+    :param key: str: Key of the sorted set
+    """
+
+    def __init__(self, backend, key: str = "photoshare:leaderboard"):
+        self.backend = backend
+        self.key = key
+        self.built_key = key + ":built"
+        self.rebuilding_key = key + ":rebuilding"
+        self.journal_key = key + ":journal"
+
+    @staticmethod
+    def _queue(pipe, key: str, member, rate: float | None) -> None:
+        if rate is None:
+            pipe.zrem(key, member)
+        else:
+            pipe.zadd(key, {member: float(rate)})
+
+    async def _write(self, image_id: int, rate: float | None) -> None:
+        """
+        Method for storing the rate of an image, None to drop it
+
+        During a rebuild the change is also journaled, then written again
+        so that a replay of an older journal entry can't win over it.
+
+        :param image_id: int: Image id
+        :param rate: float | None: Image rate, None for a deleted image
+        :return: None
+        """
+        member = _member(image_id)
+        try:
+            async with self.backend.pipeline(transaction=False) as pipe:
+                pipe.exists(self.rebuilding_key)
+                self._queue(pipe, self.key, member, rate)
+                rebuilding, _ = await pipe.execute()
+            if rebuilding:
+                async with self.backend.pipeline(transaction=False) as pipe:
+                    pipe.hset(
+                        self.journal_key, member, "" if rate is None else rate
+                    )
+                    self._queue(pipe, self.key, member, rate)
+                    await pipe.execute()
+        except RedisError:
+            logger.warning("Leaderboard update failed", exc_info=True)
+
+    async def update(self, image_id: int, rate: float) -> None:
+        """
+        Method for storing the current rate of an image
+
+        :param image_id: int: Image id
+        :param rate: float: Image rate
+        :return: None
+        """
+        await self._write(image_id, rate)
+
+    async def remove(self, image_id: int) -> None:
+        """
+        Method for dropping a deleted image
+
+        :param image_id: int: Image id
+        :return: None
+        """
+        await self._write(image_id, None)
+
+    async def top(
+        self, after: tuple[float, int] | None, count: int
+    ) -> list[int] | None:
+        """
+        Method for reading a page of the leaderboard
+
+        A page resumes right after the last image of the previous one, found
+        by its rank. If that image has moved or left the leaderboard since,
+        ranks can't tell where the page starts and the database answers.
+
+        :param after: tuple[float, int] | None: Rate and id of the last image
+            of the previous page, None for the first page
+        :param count: int: Number of images
+        :return: list[int] | None: Image ids, None if the leaderboard
+            cannot answer
+        """
+        member = None if after is None else _member(after[1])
+        try:
+            async with self.backend.pipeline(transaction=False) as pipe:
+                pipe.exists(self.built_key)
+                if member is None:
+                    pipe.zrevrange(self.key, 0, count - 1)
+                else:
+                    pipe.zrevrank(self.key, member)
+                    pipe.zscore(self.key, member)
+                built, *replies = await pipe.execute()
+            if not built:
+                return None
+            if member is None:
+                return [int(found) for found in replies[0]]
+            rank, rate = replies
+            if rank is None or float(rate) != after[0]:
+                return None
+            # Starts at the image itself, to tell if it moved in between
+            members = await self.backend.zrevrange(
+                self.key, rank, rank + count
+            )
+        except RedisError:
+            logger.warning("Leaderboard read failed", exc_info=True)
+            return None
+        ids = [int(found) for found in members]
+        if ids[:1] != [after[1]]:
+            return None
+        return ids[1:]
+
+    async def rank(self, image_id: int) -> tuple[int, float] | None:
+        """
+        Method for reading the position of an image
+
+        :param image_id: int: Image id
+        :return: tuple[int, float] | None: 1-based rank and rate, None if
+            the leaderboard cannot answer or doesn't know the image
+        """
+        member = _member(image_id)
+        try:
+            async with self.backend.pipeline(transaction=False) as pipe:
+                pipe.exists(self.built_key)
+                pipe.zrevrank(self.key, member)
+                pipe.zscore(self.key, member)
+                built, rank, rate = await pipe.execute()
+        except RedisError:
+            logger.warning("Leaderboard read failed", exc_info=True)
+            return None
+        if not built or rank is None:
+            return None
+        return rank + 1, float(rate)
+
+    async def is_built(self) -> bool:
+        """
+        Method for checking whether the leaderboard has been built
+
+        :return: bool: True if it has been built and is reachable
+        """
+        try:
+            return bool(await self.backend.exists(self.built_key))
+        except RedisError:
+            logger.warning("Leaderboard read failed", exc_info=True)
+            return False
+
+    async def _replay(self, key: str) -> None:
+        """
+        Method for applying the changes journaled during a rebuild
+
+        :param key: str: Key of the sorted set to apply them to
+        :return: None
+        """
+        changes = await self.backend.hgetall(self.journal_key)
+        if not changes:
+            return
+        async with self.backend.pipeline(transaction=False) as pipe:
+            for member, rate in changes.items():
+                self._queue(pipe, key, member, rate or None)
+            await pipe.execute()
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """
+        Method for replacing the leaderboard with the rates in the database
+
+        The new sorted set is filled under a staging key and swapped in with
+        a single RENAME, so readers never see a half built leaderboard. Rate
+        changes written meanwhile only reach the old sorted set, so they are
+        journaled from the start of the rebuild and replayed into the
+        staging set before the swap, and into the new one after it.
+
+        :param db: AsyncSession: Database session
+        :return: int: Number of ranked images
+        """
+        staging = self.key + ":staging"
+        await self.backend.set(self.rebuilding_key, 1, ex=REBUILD_TIMEOUT)
+        try:
+            await self.backend.delete(staging, self.journal_key)
+            count = 0
+            batch = {}
+            rows = await db.stream(select(Image.id, Image.rate))
+            async for image_id, rate in rows:
+                batch[_member(image_id)] = rate
+                if len(batch) == REBUILD_BATCH:
+                    count += await self.backend.zadd(staging, batch)
+                    batch = {}
+            if batch:
+                count += await self.backend.zadd(staging, batch)
+            await self._replay(staging)
+            if await self.backend.exists(staging):
+                await self.backend.rename(staging, self.key)
+            else:
+                await self.backend.delete(self.key)
+            await self._replay(self.key)
+            await self.backend.set(self.built_key, 1)
+        finally:
+            await self.backend.delete(self.rebuilding_key, self.journal_key)
+        return count
+
+
+leaderboard = Leaderboard(
+    redis_client if settings.leaderboard_backend == "redis"
+    else MemorySortedSets()
+)
+
+
+async def ensure_built(db: AsyncSession) -> None:
+    """
+    Function to build the leaderboard if it has never been built, e.g. on
+    start up with an empty Redis or the in-memory backend
+
+    :param db: AsyncSession: Database session
+    :return: None
+    """
+    if not await leaderboard.is_built():
+        try:
+            await leaderboard.rebuild(db)
+        except RedisError:
+            logger.warning("Leaderboard rebuild failed", exc_info=True)
+
+
+async def main():
+    async with AsyncLocalSession() as db:
+        count = await leaderboard.rebuild(db)
+    print(f"leaderboard rebuilt with {count} images")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
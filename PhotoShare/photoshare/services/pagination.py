@@ -0,0 +1,67 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+# Response header carrying the cursor of the next page of endpoints that
+# return a bare list
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """
+    Encodes the sort key of the last row of a page into an opaque cursor.
+
+    :param values: The sort key values, JSON serializable.
+    :return: The URL-safe cursor string.
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _cursor_value(value, kind: type):
+    """
+    Converts a decoded cursor value to the type of its sort key column.
+
+    :param value: The JSON value from the cursor.
+    :param kind: The expected type, datetimes are ISO 8601 strings.
+    :raise ValueError: If the value doesn't fit the type.
+    :return: The converted value.
+    """
+    if isinstance(value, bool):
+        raise ValueError("booleans are not sort keys")
+    if kind is datetime:
+        if not isinstance(value, str):
+            raise ValueError("datetimes are encoded as strings")
+        return datetime.fromisoformat(value)
+    if kind is float and isinstance(value, int):
+        return float(value)
+    if not isinstance(value, kind):
+        raise ValueError(f"expected {kind.__name__}")
+    return value
+
+
+def decode_cursor(cursor: str, *types: type) -> list:
+    """
+    Decodes a cursor produced by encode_cursor back into its sort key.
+
+    :param cursor: The cursor received from the client.
+    :param types: The type of every sort key value, datetimes are decoded
+        from ISO 8601 strings.
+    :raise HTTPException: If the cursor is malformed.
+    :return: The list of sort key values.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong number of values")
+        return [
+            _cursor_value(value, kind) for value, kind in zip(values, types)
+        ]
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
@@ -0,0 +1,30 @@
+from io import BytesIO
+
+import qrcode
+from qrcode.image.styledpil import StyledPilImage
+from qrcode.image.styles.moduledrawers import RoundedModuleDrawer
+
+# Identifies the look of the rendered codes in their content address.
+# Change it whenever render_qr_png draws differently.
+QR_STYLE = "png-rounded-ecl-v1"
+
+
+def render_qr_png(data: str) -> bytes:
+    """
+    Function to render a styled QR code. It is CPU bound and imports
+    nothing from the application, so it runs in the job process pool.
+
+    :param data: str: Text to encode, usually a URL
+    :return: bytes: PNG image
+    """
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L)
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(
+        image_factory=StyledPilImage, module_drawer=RoundedModuleDrawer()
+    )
+
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
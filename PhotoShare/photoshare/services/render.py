@@ -0,0 +1,128 @@
+"""
+Pillow renderings of the transformation presets in
+``photoshare.services.storage.TRANSFORMATIONS``, for media stored on the
+local disk.
+
+Rendering is CPU bound and this module imports nothing from the
+application, so it runs in the job process pool.
+"""
+import os
+import tempfile
+
+from PIL import Image, ImageDraw, ImageFilter, ImageOps
+
+# Change it whenever a preset renders differently, it is part of the name
+# of every cached rendering
+RENDER_VERSION = 1
+
+# Output format and file extension of every preset
+PRESET_FORMATS = {1: ("PNG", ".png"), 2: ("JPEG", ".jpg"), 3: ("PNG", ".png")}
+
+THUMB_MAX = 400
+OUTLINE = 5
+
+
+def _load(source: str, longest: int) -> Image.Image:
+    img = Image.open(source)
+    # JPEG decodes at a reduced scale, much cheaper for big photos
+    img.draft("RGB", (longest * 2, longest * 2))
+    return ImageOps.exif_transpose(img).convert("RGBA")
+
+
+def _outline(img: Image.Image, color: str, width: int) -> Image.Image:
+    """
+    Draws a solid outline around the visible pixels of an image.
+    """
+    alpha = ImageOps.expand(img.getchannel("A"), width, 0)
+    outline = Image.new("RGBA", alpha.size, color)
+    outline.putalpha(alpha.filter(ImageFilter.MaxFilter(2 * width + 1)))
+    outline.alpha_composite(ImageOps.expand(img, width, (0, 0, 0, 0)))
+    return outline
+
+
+def _shadow(
+    img: Image.Image,
+    color: str,
+    offset: tuple[int, int],
+    blur: int = 4
+) -> Image.Image:
+    """
+    Drops a blurred shadow of the visible pixels of an image.
+    """
+    x, y = offset
+    size = (img.width + x + 2 * blur, img.height + y + 2 * blur)
+    shadow = Image.new("RGBA", size, (0, 0, 0, 0))
+    solid = Image.new("RGBA", img.size, color)
+    solid.putalpha(img.getchannel("A"))
+    shadow.alpha_composite(solid, (blur + x, blur + y))
+    shadow = shadow.filter(ImageFilter.GaussianBlur(blur))
+    shadow.alpha_composite(img, (blur, blur))
+    return shadow
+
+
+def _circle(size: tuple[int, int]) -> Image.Image:
+    # Drawn at 4x and scaled down for smooth edges
+    big = Image.new("L", (size[0] * 4, size[1] * 4), 0)
+    ImageDraw.Draw(big).ellipse((0, 0) + big.size, fill=255)
+    return big.resize(size, Image.LANCZOS)
+
+
+def face_thumb(img: Image.Image) -> Image.Image:
+    """
+    Preset 1: round square thumbnail of 70% of the width with a skyblue
+    outline and a lightgray shadow. Pillow has no face detection, so the
+    crop is centered a little above the middle, where portraits put faces.
+    """
+    side = int(min(img.width * 0.7, img.height))
+    thumb = ImageOps.fit(
+        img, (side, side), Image.LANCZOS, centering=(0.5, 0.4)
+    )
+    thumb.thumbnail((THUMB_MAX, THUMB_MAX), Image.LANCZOS)
+    thumb.putalpha(_circle(thumb.size))
+    return _shadow(_outline(thumb, "skyblue", OUTLINE), "lightgray", (5, 8))
+
+
+def bordered_square(img: Image.Image) -> Image.Image:
+    """
+    Preset 2: 250 pixel square fill with a 5 pixel lightblue border.
+    """
+    square = ImageOps.fit(img, (250, 250), Image.LANCZOS)
+    return ImageOps.expand(square.convert("RGB"), 5, "lightblue")
+
+
+def rotated_fill(img: Image.Image) -> Image.Image:
+    """
+    Preset 3: 250x400 fill rotated 20 degrees clockwise with a brown
+    outline.
+    """
+    fill = ImageOps.fit(img, (250, 400), Image.LANCZOS)
+    rotated = fill.rotate(-20, Image.BICUBIC, expand=True)
+    return _outline(rotated, "brown", OUTLINE)
+
+
+PRESETS = {1: face_thumb, 2: bordered_square, 3: rotated_fill}
+
+
+def render_preset(source: str, target: str, preset: int) -> int:
+    """
+    Function to render a preset of an image file to another file. The
+    target appears complete or not at all.
+
+    :param source: str: Path of the original image
+    :param target: str: Path of the rendering
+    :param preset: int: Key of the preset in PRESETS
+    :return: int: Size of the rendering in bytes
+    """
+    img = PRESETS[preset](_load(source, THUMB_MAX * 2))
+    image_format, _ = PRESET_FORMATS[preset]
+    fd, staging = tempfile.mkstemp(
+        dir=os.path.dirname(target), prefix=".render-"
+    )
+    try:
+        with os.fdopen(fd, "wb") as out:
+            img.save(out, format=image_format, optimize=True)
+        os.replace(staging, target)
+    except BaseException:
+        os.unlink(staging)
+        raise
+    return os.path.getsize(target)
@@ -0,0 +1,265 @@
+"""
+Media storage backends.
+
+Image files live either on Cloudinary or on the local disk, chosen by
+``STORAGE_BACKEND``. The local backend writes under ``MEDIA_ROOT`` and the
+application serves the files at ``MEDIA_URL``, so the API runs and can be
+benchmarked without the network.
+
+Uploads and deletes block, callers run them on the upload pool.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from typing import BinaryIO
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+import cloudinary
+import cloudinary.uploader
+from cloudinary import CloudinaryImage
+
+from photoshare.conf.config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+# Transformation presets offered by POST /images/{image_id}, in Cloudinary
+# transformation syntax
+TRANSFORMATIONS = {
+    # Round face thumbnail with an outline and a shadow
+    1: [
+        {
+            'aspect_ratio': "1.0", 'gravity': "face",
+            'width': "0.7", 'crop': "thumb"
+        },
+        {'radius': "max"},
+        {'color': "skyblue", 'effect': "outline"},
+        {'color': "lightgray", 'effect': "shadow", 'x': 5, 'y': 8}
+    ],
+    # Square fill with a border
+    2: [
+        {'aspect_ratio': "1.0", 'height': 250, 'crop': "fill"},
+        {'border': "5px_solid_lightblue"}
+    ],
+    # Rotated fill with an outline
+    3: [
+        {'height': 400, 'width': 250, 'crop': "fill"},
+        {'angle': 20},
+        {'effect': "outline", 'color': "brown"},
+        {'quality': "auto"},
+        {'fetch_format': "auto"}
+    ],
+}
+
+
+class MediaStorage(ABC):
+    """
+    Interface of the media storage backends. Files are addressed by the URL
+    they are served at, which is what the database keeps.
+    """
+
+    @abstractmethod
+    def upload(
+        self,
+        file: BinaryIO,
+        suffix: str = "",
+        name: str | None = None
+    ) -> str:
+        """
+        Method for storing a file
+
+        :param file: BinaryIO: File to store, read from its current position
+        :param suffix: str: File extension such as ".jpg", if known
+        :param name: str | None: Name of the file, e.g. a content hash, so
+            uploading the same content twice stores it once. A random name
+            is used if None
+        :return: str: URL of the stored file
+        """
+
+    @abstractmethod
+    def owns(self, url: str | None) -> bool:
+        """
+        Method for checking whether a URL points into this storage
+
+        :param url: str | None: URL of a file
+        :return: bool: True if the file was stored here
+        """
+
+    @abstractmethod
+    def delete(self, url: str) -> None:
+        """
+        Method for removing a stored file, missing files are ignored
+
+        :param url: str: URL of the stored file
+        :return: None
+        """
+
+    @abstractmethod
+    def transform_url(self, url: str, preset: int) -> str:
+        """
+        Method for building the URL of a transformed stored image
+
+        :param url: str: URL of the stored image
+        :param preset: int: Key of the preset in TRANSFORMATIONS
+        :raise ValueError: If the image isn't stored here
+        :return: str: URL of the transformed image
+        """
+
+
+class CloudinaryStorage(MediaStorage):
+    """
+    Storage on Cloudinary, transformations are rendered by Cloudinary.
+
+    :param timeout: float: Seconds an upload may take
+    """
+    # Every type accepted by sniff_image_type
+    url_pattern = re.compile(r"/([^/]+)\.(png|jpg|jpeg|gif|webp)$")
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        cloudinary.config(
+            cloud_name=settings.cloudinary_name,
+            api_key=settings.cloudinary_api_key,
+            api_secret=settings.cloudinary_api_secret
+        )
+
+    def _public_id(self, url: str | None) -> str | None:
+        if not url or "cloudinary.com/" not in url:
+            return None
+        match = self.url_pattern.search(url)
+        return match.group(1) if match else None
+
+    def upload(
+        self,
+        file: BinaryIO,
+        suffix: str = "",
+        name: str | None = None
+    ) -> str:
+        return cloudinary.uploader.upload(
+            file, public_id=name, overwrite=True, resource_type="image",
+            timeout=self.timeout
+        )["url"]
+
+    def owns(self, url: str | None) -> bool:
+        return self._public_id(url) is not None
+
+    def delete(self, url: str) -> None:
+        public_id = self._public_id(url)
+        if public_id:
+            cloudinary.uploader.destroy(public_id, timeout=self.timeout)
+
+    def transform_url(self, url: str, preset: int) -> str:
+        public_id = self._public_id(url)
+        if public_id is None:
+            raise ValueError("Image is not stored on Cloudinary")
+        return CloudinaryImage(public_id).build_url(
+            transformation=TRANSFORMATIONS[preset]
+        )
+
+
+class LocalStorage(MediaStorage):
+    """
+    Storage on the local disk. Files are streamed to disk in chunks under
+    the given or a random name and served by the application.
+
+    Transformed images are served under ``{base_url}/t/{preset}/{name}``,
+    rendered with Pillow on the first request.
+
+    :param root: str: Directory holding the files
+    :param base_url: str: URL the directory is served at
+    """
+    suffix_pattern = re.compile(r"\.[A-Za-z0-9]{1,5}")
+    name_pattern = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, url: str | None) -> str | None:
+        prefix = self.base_url + "/"
+        if not url or not url.startswith(prefix):
+            return None
+        return self.file_path(url[len(prefix):])
+
+    def file_path(self, name: str) -> str | None:
+        """
+        Method for locating a stored file by name
+
+        :param name: str: File name
+        :return: str | None: Path of the file, None if the name is invalid
+        """
+        if not name or "/" in name or name.startswith("."):
+            return None
+        return os.path.join(self.root, name)
+
+    def upload(
+        self,
+        file: BinaryIO,
+        suffix: str = "",
+        name: str | None = None
+    ) -> str:
+        if not self.suffix_pattern.fullmatch(suffix):
+            suffix = ""
+        if name is None or not self.name_pattern.fullmatch(name):
+            name = uuid4().hex
+        name += suffix.lower()
+        fd, staging = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(file, out, CHUNK_SIZE)
+            os.replace(staging, os.path.join(self.root, name))
+        except BaseException:
+            os.unlink(staging)
+            raise
+        return f"{self.base_url}/{name}"
+
+    def owns(self, url: str | None) -> bool:
+        return self._path(url) is not None
+
+    def delete(self, url: str) -> None:
+        path = self._path(url)
+        if path:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def transform_url(self, url: str, preset: int) -> str:
+        if self._path(url) is None:
+            raise ValueError("Image is not stored locally")
+        name = url.rsplit("/", 1)[1]
+        return f"{self.base_url}/t/{preset}/{name}"
+
+
+def content_hash(file: BinaryIO) -> str:
+    """
+    Function to hash a file in chunks and rewind it for the upload
+
+    :param file: BinaryIO: Seekable file positioned at the start
+    :return: str: Hex SHA-256 of the content
+    """
+    digest = hashlib.sha256()
+    while chunk := file.read(CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def media_mount_path() -> str:
+    """
+    Function to get the path the local media directory is mounted at
+
+    :return: str: Path part of MEDIA_URL
+    """
+    return urlsplit(settings.media_url).path.rstrip("/") or "/media"
+
+
+storage: MediaStorage = (
+    LocalStorage(settings.media_root, settings.media_url)
+    if settings.storage_backend == "local"
+    else CloudinaryStorage(settings.upload_timeout)
+)
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from photoshare.conf.config import settings
+
+
+class UploadRejected(Exception):
+    """
+    Raised when the upload queue is full.
+    """
+
+
+class UploadStats:
+    """
+    Class accumulating upload outcome and latency statistics.
+
+    :param completed: int: Number of uploads that succeeded
+    :param failed: int: Number of uploads that raised
+    :param timeouts: int: Number of uploads the caller stopped waiting for
+    :param rejected: int: Number of uploads refused with a full queue
+    :param deduplicated: int: Number of uploads skipped because the same
+        file is stored already
+    :param latency_total: float: Seconds spent on finished uploads,
+        queueing included
+    :param latency_max: float: Longest single finished upload in seconds
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.deduplicated = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, elapsed: float, outcome: str) -> None:
+        """
+        Method for recording a single upload
+
+        :param elapsed: float: Seconds from submission to the outcome
+        :param outcome: str: "completed", "failed", "timeouts", "rejected"
+            or "deduplicated"
+        :return: None
+        """
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            if outcome in ("completed", "failed"):
+                self.latency_total += elapsed
+                self.latency_max = max(self.latency_max, elapsed)
+
+    def snapshot(self) -> dict:
+        """
+        Method for reading the statistics as a dictionary
+
+        :return: dict: outcome counters and latencies in milliseconds
+        """
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "completed": self.completed,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "deduplicated": self.deduplicated,
+                "latency_avg_ms": round(
+                    self.latency_total / finished * 1000, 3
+                ) if finished else 0.0,
+                "latency_max_ms": round(self.latency_max * 1000, 3),
+            }
+
+
+class UploadExecutor:
+    """
+    Dedicated, bounded thread pool for blocking uploads to the media
+    storage, kept apart from the AnyIO threadpool serving the routes.
+
+    At most ``workers`` uploads run at a time and at most ``queue_size``
+    more wait for a worker, further uploads are rejected right away. A
+    caller stops waiting after ``timeout`` seconds, while the upload keeps
+    its slot until the worker is actually free, so a stuck upstream cannot
+    pile up threads.
+
+    :param workers: int: Number of upload threads
+    :param queue_size: int: Number of uploads waiting for a thread
+    :param timeout: float: Seconds a caller waits for an upload
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.stats = UploadStats()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="upload"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                full = True
+            else:
+                full = False
+                self._pending += 1
+        if full:
+            self.stats.record(0.0, "rejected")
+            raise UploadRejected("Upload queue is full")
+
+    def _release(self, _: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _call(self, func: Callable, args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Method for running a blocking upload on the upload pool
+
+        :param func: Callable: Blocking upload function
+        :param args: Positional arguments of the function
+        :param kwargs: Keyword arguments of the function
+        :raise UploadRejected: If the queue is full
+        :raise TimeoutError: If the upload outlasts the timeout
+        :return: Any: Result of the function
+        """
+        self._acquire()
+        started = time.perf_counter()
+        future = self._executor.submit(self._call, func, args, kwargs)
+        future.add_done_callback(self._release)
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future), self.timeout
+            )
+        except asyncio.TimeoutError:
+            self.stats.record(time.perf_counter() - started, "timeouts")
+            raise
+        except Exception:
+            self.stats.record(time.perf_counter() - started, "failed")
+            raise
+        self.stats.record(time.perf_counter() - started, "completed")
+        return result
+
+    def status(self) -> dict:
+        """
+        Method for describing the current state of the pool
+
+        :return: dict: sizing, running and queued uploads and statistics
+        """
+        with self._lock:
+            status = {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "timeout": self.timeout,
+                "running": self._running,
+                "queued": self._pending - self._running,
+            }
+        status.update(self.stats.snapshot())
+        return status
+
+
+upload_executor = UploadExecutor(
+    settings.upload_workers,
+    settings.upload_queue_size,
+    settings.upload_timeout
+)
@@ -1,14 +1,33 @@
+import os
+import shutil
+import tempfile
+
+# The suite stores media on the local disk, set before the settings load
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["MEDIA_ROOT"] = tempfile.mkdtemp(prefix="photoshare-media-")
+os.environ["DERIVED_ROOT"] = os.path.join(os.environ["MEDIA_ROOT"], ".derived")
+
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import (
+    AsyncSession, async_sessionmaker, create_async_engine
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 
 from main import app
 from photoshare.database.models import Base
 from photoshare.database.models import User
-from photoshare.database.db import get_db
+from photoshare.database.db import (
+    enable_foreign_keys, get_db, get_read_db, to_async_url
+)
 from photoshare.repository.users import create_user, get_user_by_email
 from photoshare.services.auth import auth_service
+from photoshare.services.cache import MemoryCache, tag_cache, user_cache
+from photoshare.services.jobs import MemoryQueue, job_queue
+from photoshare.services.leaderboard import MemorySortedSets, leaderboard
 from unittest.mock import MagicMock
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -16,34 +35,101 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Every test and every request gets its own connection, so sessions never
+# leak between the event loops of pytest-asyncio and the TestClient.
+async_engine = create_async_engine(
+    to_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool
+)
+enable_foreign_keys(engine)
+enable_foreign_keys(async_engine.sync_engine)
+TestingSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
 
 
 @pytest.fixture(scope="module")
-def session():
+def database():
     # Create the database
 
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    yield engine
 
-    db = TestingSessionLocal()
-    try:
+
+@pytest_asyncio.fixture
+async def session(database):
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def media_root():
+    yield os.environ["MEDIA_ROOT"]
+    shutil.rmtree(os.environ["MEDIA_ROOT"], ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def memory_user_cache(monkeypatch):
+    # Users are recreated with the same emails between test modules, so
+    # every test starts with an empty cache instead of a Redis server.
+    monkeypatch.setattr(user_cache, "backend", MemoryCache())
+    return user_cache
+
+
+@pytest.fixture(autouse=True)
+def memory_leaderboard(monkeypatch):
+    # Never built, so rankings come from the database unless a test
+    # builds the leaderboard.
+    monkeypatch.setattr(leaderboard, "backend", MemorySortedSets())
+    return leaderboard
+
+
+@pytest.fixture(autouse=True)
+def in_process_jobs(monkeypatch):
+    # Jobs run as background tasks of the response, on the test database
+    monkeypatch.setattr(job_queue, "backend", MemoryQueue())
+    monkeypatch.setattr(job_queue, "in_process", True)
+    monkeypatch.setattr(job_queue, "session_factory", TestingSessionLocal)
+    return job_queue
+
+
+@pytest.fixture(autouse=True)
+def empty_tag_cache():
+    # Tag ids change whenever a test module recreates the database.
+    tag_cache.clear()
+    yield tag_cache
+    tag_cache.clear()
+
+
+@pytest.fixture
+def query_counter():
+    # Collects the SQL statements run through the test engine.
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute",
+        before_cursor_execute
+    )
+    yield statements
+    event.remove(
+        async_engine.sync_engine, "before_cursor_execute",
+        before_cursor_execute
+    )
 
 
 @pytest.fixture(scope="module")
-def client(session):
+def client(database):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with TestingSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     yield TestClient(app)
 
@@ -57,13 +143,14 @@ def test_user_data():
 def admin_user_data():
     return {"username": "adminadmin", "email": "admin@example.com", "password": "adminpass"}
 
-@pytest.fixture(scope="module")
-def admin_user(session: Session, admin_user_data):
+@pytest_asyncio.fixture
+async def admin_user(session: AsyncSession, admin_user_data):
     # Create admin user
     user_data = admin_user_data.copy()
     user_data["password"] = auth_service.get_password_hash(user_data["password"])
-    db_user = create_user(session, user_data)
-    session.commit()
+    db_user = User(**user_data, role="admin")
+    session.add(db_user)
+    await session.commit()
     return db_user
 
 
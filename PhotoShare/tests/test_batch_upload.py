@@ -0,0 +1,97 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from photoshare.conf.config import settings
+from photoshare.services.storage import storage
+from photoshare.services.uploads import upload_executor
+
+JPEG = b"\xff\xd8\xff"
+
+
+@pytest.fixture
+def headers(client):
+    user = {"username": "batcher", "email": "batcher@example.com",
+            "password": "batchpass"}
+    client.post("/api/auth/signup", json=user)
+    login = client.post("/api/auth/login", data={
+        "username": user["email"], "password": user["password"]
+    })
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+
+def test_batch_creates_every_image(client, headers):
+    same, other = JPEG + os.urandom(2048), JPEG + os.urandom(2048)
+    deduplicated = upload_executor.stats.deduplicated
+
+    response = client.post(
+        "/photoshare/images/add_batch", headers=headers,
+        data={"descriptions": ["first", "second", "third"],
+              "tags": ["album, sea", "album", ""]},
+        files=[("files", ("a.jpg", same, "image/jpeg")),
+               ("files", ("b.jpg", other, "image/jpeg")),
+               ("files", ("c.jpg", same, "image/jpeg"))]
+    )
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["created"], body["failed"]) == (3, 0)
+    items = body["items"]
+    assert [item["filename"] for item in items] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert {item["status"] for item in items} == {"created"}
+    images = [item["image"] for item in items]
+    assert [image["description"] for image in images] == [
+        "first", "second", "third"
+    ]
+    assert [sorted(tag["name"] for tag in image["tags"])
+            for image in images] == [["album", "sea"], ["album"], []]
+    assert images[0]["url"] == images[2]["url"] != images[1]["url"]
+    assert client.get(images[1]["url"]).content == other
+    assert upload_executor.stats.deduplicated == deduplicated + 1
+
+    for image in images:
+        client.delete(f"/photoshare/images/{image['id']}", headers=headers)
+
+
+def test_failed_file_doesnt_stop_the_batch(client, headers):
+    upload = storage.upload
+
+    def flaky(file, suffix="", name=None):
+        if file.read(7) == JPEG + b"fail":
+            raise ConnectionError("storage is down")
+        file.seek(0)
+        return upload(file, suffix, name)
+
+    with patch.object(storage, "upload", side_effect=flaky):
+        response = client.post(
+            "/photoshare/images/add_batch", headers=headers,
+            data={"descriptions": ["broken", "fine"]},
+            files=[("files", ("a.jpg", JPEG + b"fail")),
+                   ("files", ("b.jpg", JPEG + os.urandom(64)))]
+        )
+
+    assert response.status_code == 200, response.text
+    broken, fine = response.json()["items"]
+    assert broken == {"filename": "a.jpg", "status": "failed",
+                      "status_code": 502, "detail": "Upload failed",
+                      "image": None}
+    assert fine["status"] == "created"
+    assert fine["image"]["description"] == "fine"
+    client.delete(f"/photoshare/images/{fine['image']['id']}",
+                  headers=headers)
+
+
+@pytest.mark.parametrize("data, count", [
+    ({"descriptions": ["only one"]}, 2),
+    ({"descriptions": ["a", "b"], "tags": ["one"]}, 2),
+    ({"descriptions": ["x"] * (settings.batch_upload_max_files + 1)},
+     settings.batch_upload_max_files + 1),
+])
+def test_mismatched_batches_are_rejected(client, headers, data, count):
+    response = client.post(
+        "/photoshare/images/add_batch", headers=headers, data=data,
+        files=[("files", (f"{i}.jpg", b"data")) for i in range(count)]
+    )
+
+    assert response.status_code == 422, response.text
@@ -0,0 +1,176 @@
+import asyncio
+from typing import List
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from photoshare.database.models import Tag
+from photoshare.repository.tags import get_tags
+from photoshare.schemas import TagResponse
+from photoshare.services.coalesce import SingleFlight, coalesced_json, flights
+from tests.conftest import async_engine
+
+
+@pytest_asyncio.fixture
+async def tags(session):
+    tags = [Tag(name=f"coalesced{i}") for i in range(3)]
+    session.add_all(tags)
+    await session.commit()
+    yield tags
+    await session.execute(delete(Tag))
+    await session.commit()
+
+
+def gated():
+    gate = asyncio.Event()
+    runs = []
+
+    async def call():
+        runs.append(1)
+        await gate.wait()
+        return len(runs)
+
+    return gate, runs, call
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    gate, runs, call = gated()
+
+    waiters = [
+        asyncio.ensure_future(flight.run("key", call)) for _ in range(5)
+    ]
+    await asyncio.sleep(0)
+    assert flight.stats()["in_flight"] == 1
+    gate.set()
+
+    assert await asyncio.gather(*waiters) == [1] * 5
+    assert len(runs) == 1
+    assert flight.stats() == {
+        "calls": 1, "coalesced": 4, "coalesced_rate": 0.8, "in_flight": 0
+    }
+
+
+@pytest.mark.asyncio
+async def test_finished_and_different_calls_run_again():
+    flight = SingleFlight()
+    gate, runs, call = gated()
+    gate.set()
+
+    await asyncio.gather(flight.run("a", call), flight.run("b", call))
+    await flight.run("a", call)
+
+    assert len(runs) == 3
+    assert flight.stats()["coalesced"] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0)
+        raise ValueError("broken")
+
+    results = await asyncio.gather(
+        *(flight.run("key", call) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_leaves_the_call_running():
+    flight = SingleFlight()
+    gate, runs, call = gated()
+    leader = asyncio.ensure_future(flight.run("key", call))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.run("key", call))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    gate.set()
+
+    assert await follower == 1
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_identical_reads_share_one_query(session, tags, query_counter):
+    flights.clear()
+    query_counter.clear()
+
+    bodies = await asyncio.gather(*(
+        coalesced_json(get_tags, List[TagResponse], 0, 100, session)
+        for _ in range(4)
+    ))
+
+    assert len(set(bodies)) == 1
+    assert b"coalesced2" in bodies[0]
+    assert len(query_counter) == 1, query_counter
+    assert flights["get_tags"].stats()["coalesced"] == 3
+
+
+@pytest.mark.asyncio
+async def test_reads_run_on_their_own_session(session, tags):
+    flights.clear()
+    gate = asyncio.Event()
+    sessions = []
+
+    async def gated_tags(skip, limit, db):
+        sessions.append(db)
+        await gate.wait()
+        return await get_tags(skip, limit, db)
+
+    leader = asyncio.ensure_future(
+        coalesced_json(gated_tags, List[TagResponse], 0, 100, session)
+    )
+    await asyncio.sleep(0)
+    async with AsyncSession(async_engine) as other:
+        follower = asyncio.ensure_future(
+            coalesced_json(gated_tags, List[TagResponse], 0, 100, other)
+        )
+        await asyncio.sleep(0)
+        # The leader's client goes away and its session is closed
+        leader.cancel()
+        await session.close()
+        gate.set()
+
+        assert b"coalesced2" in await follower
+    assert sessions and session not in sessions and other not in sessions
+    assert flights["gated_tags"].stats()["calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reads_of_other_engines_are_not_shared(session, tags):
+    flights.clear()
+    replica = create_async_engine(async_engine.url, poolclass=NullPool)
+
+    async with AsyncSession(replica) as other:
+        await asyncio.gather(
+            coalesced_json(get_tags, List[TagResponse], 0, 100, session),
+            coalesced_json(get_tags, List[TagResponse], 0, 100, other),
+        )
+    await replica.dispose()
+
+    assert flights["get_tags"].stats()["calls"] == 2
+
+
+def test_coalescing_stats_route(client, tags, admin_user_data):
+    client.post("/api/auth/signup", json=admin_user_data)
+    login = client.post("/api/auth/login", data={
+        "username": admin_user_data["email"],
+        "password": admin_user_data["password"]
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert client.get("/photoshare/tags/").status_code == 200
+
+    response = client.get("/api/metrics/coalescing", headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["get_tags"]["calls"] >= 1
@@ -1,6 +1,6 @@
 import pytest
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from unittest.mock import MagicMock
 from datetime import datetime
 from photoshare.database.models import Comment, User
@@ -15,7 +15,8 @@ from photoshare.routes.comment import (
 
 @pytest.fixture
 def mock_db_session():
-    session = MagicMock(spec=Session)
+    session = MagicMock(spec=AsyncSession)
+    session.scalars.return_value = MagicMock()
     return session
 
 
@@ -31,8 +32,9 @@ def mock_user():
     return user
 
 
-def test_create_comment_func(mock_db_session, mock_comment_create, mock_user):
-    result = create_comment_func(
+@pytest.mark.asyncio
+async def test_create_comment_func(mock_db_session, mock_comment_create, mock_user):
+    result = await create_comment_func(
         image_id=1,
         comment=mock_comment_create,
         db=mock_db_session,
@@ -52,7 +54,8 @@ def test_create_comment_func(mock_db_session, mock_comment_create, mock_user):
     assert result == added_comment
 
 
-def test_read_comments_func(mock_db_session):
+@pytest.mark.asyncio
+async def test_read_comments_func(mock_db_session):
     comments = [
         Comment(id=1, text="Nice photo!", created_at=None,
                 updated_at=None, image_id=1, user_id=1),
@@ -60,68 +63,72 @@ def test_read_comments_func(mock_db_session):
                 updated_at=None, image_id=1, user_id=1)
     ]
 
-    mock_db_session.query().filter().all.return_value = comments
+    mock_db_session.scalars.return_value.all.return_value = comments
 
-    result = read_comments_func(image_id=1, db=mock_db_session)
+    result = await read_comments_func(image_id=1, db=mock_db_session)
 
     assert len(result) == 2
     assert result[0].text == "Nice photo!"
     assert result[1].text == "Amazing shot!"
 
 
-def test_edit_comment_func(mock_db_session, mock_user):
+@pytest.mark.asyncio
+async def test_edit_comment_func(mock_db_session, mock_user):
     comment_id = 1
     comment_update = CommentCreate(text="Updated text")
     existing_comment = Comment(
         id=comment_id, user_id=mock_user.id, text="Old text")
-    mock_db_session.query().filter().first.return_value = existing_comment
+    mock_db_session.scalar.return_value = existing_comment
 
-    edited_comment = edit_comment_func(
+    edited_comment = await edit_comment_func(
         comment_id, comment_update, mock_db_session, mock_user)
 
     assert edited_comment.text == comment_update.text
     assert isinstance(edited_comment.updated_at, datetime)
     assert mock_db_session.commit.called
-    assert mock_db_session.refresh.called_once_with(existing_comment)
+    mock_db_session.refresh.assert_called_once_with(existing_comment)
 
 
-def test_delete_comment_func_admin(mock_db_session, mock_user):
+@pytest.mark.asyncio
+async def test_delete_comment_func_admin(mock_db_session, mock_user):
     comment_id = 1
     existing_comment = Comment(id=comment_id)
-    mock_db_session.query().filter().first.return_value = existing_comment
+    mock_db_session.scalar.return_value = existing_comment
 
     mock_user.role = "admin"
 
-    result = delete_comment_func(comment_id, mock_db_session, mock_user)
+    result = await delete_comment_func(comment_id, mock_db_session, mock_user)
 
     assert result == {"detail": "Comment deleted successfully"}
     assert mock_db_session.delete.called
     assert mock_db_session.commit.called
 
 
-def test_delete_comment_func_moderator(mock_db_session, mock_user):
+@pytest.mark.asyncio
+async def test_delete_comment_func_moderator(mock_db_session, mock_user):
     comment_id = 1
     existing_comment = Comment(id=comment_id)
-    mock_db_session.query().filter().first.return_value = existing_comment
+    mock_db_session.scalar.return_value = existing_comment
 
     mock_user.role = "moderator"
 
-    result = delete_comment_func(comment_id, mock_db_session, mock_user)
+    result = await delete_comment_func(comment_id, mock_db_session, mock_user)
 
     assert result == {"detail": "Comment deleted successfully"}
     assert mock_db_session.delete.called
     assert mock_db_session.commit.called
 
 
-def test_delete_comment_func_user(mock_db_session, mock_user):
+@pytest.mark.asyncio
+async def test_delete_comment_func_user(mock_db_session, mock_user):
     comment_id = 1
     existing_comment = Comment(id=comment_id)
-    mock_db_session.query().filter().first.return_value = existing_comment
+    mock_db_session.scalar.return_value = existing_comment
 
     mock_user.role = "user"
 
     try:
-        delete_comment_func(comment_id, mock_db_session, mock_user)
+        await delete_comment_func(comment_id, mock_db_session, mock_user)
     except HTTPException as e:
         assert e.status_code == 403
         assert str(e.detail) == "You don't have permission to delete it."
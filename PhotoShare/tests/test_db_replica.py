@@ -0,0 +1,72 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from fastapi import Response
+
+from photoshare.database import db as database
+from photoshare.database.db import (
+    PRIMARY_COOKIE, pin_primary, read_sessionmaker
+)
+
+
+def make_request(cookies=None):
+    request = MagicMock()
+    request.cookies = cookies or {}
+    return request
+
+
+def test_pin_primary_sets_cookie():
+    response = Response()
+
+    pin_primary(response)
+
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith(f"{PRIMARY_COOKIE}=")
+    assert "Max-Age=5" in cookie
+
+
+def test_read_sessionmaker_uses_replica():
+    replica = MagicMock()
+    with patch.object(database, "AsyncReplicaSession", replica):
+        assert read_sessionmaker(make_request()) is replica
+
+
+def test_read_sessionmaker_pinned_to_primary():
+    until = str(int(time.time()) + 5)
+    with patch.object(database, "AsyncReplicaSession", MagicMock()):
+        factory = read_sessionmaker(make_request({PRIMARY_COOKIE: until}))
+
+    assert factory is database.AsyncLocalSession
+
+
+def test_read_sessionmaker_expired_pin():
+    replica = MagicMock()
+    until = str(int(time.time()) - 1)
+    with patch.object(database, "AsyncReplicaSession", replica):
+        factory = read_sessionmaker(make_request({PRIMARY_COOKIE: until}))
+
+    assert factory is replica
+
+
+def test_read_sessionmaker_ignores_bad_cookie():
+    replica = MagicMock()
+    with patch.object(database, "AsyncReplicaSession", replica):
+        factory = read_sessionmaker(make_request({PRIMARY_COOKIE: "soon"}))
+
+    assert factory is replica
+
+
+def test_write_route_pins_primary(client, test_user_data):
+    client.post("/api/auth/signup", json=test_user_data)
+    login = client.post("/api/auth/login", data={
+        "username": test_user_data["email"],
+        "password": test_user_data["password"]
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    response = client.post(
+        "/photoshare/tags/", json={"name": "replica"}, headers=headers
+    )
+
+    assert response.status_code == 200, response.text
+    assert PRIMARY_COOKIE in response.cookies
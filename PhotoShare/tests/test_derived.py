@@ -0,0 +1,117 @@
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from photoshare.services.derived import DerivedCache, derived_cache
+from photoshare.services.render import render_preset
+from photoshare.services.storage import storage
+
+
+def photo(path, size=(640, 480)):
+    Image.new("RGB", size, "orange").save(path, format="JPEG")
+    return str(path)
+
+
+@pytest.mark.parametrize("preset, image_format, size", [
+    (1, "PNG", (423, 426)), (2, "JPEG", (260, 260)), (3, "PNG", (382, 472))
+])
+def test_presets_render(tmp_path, preset, image_format, size):
+    source = photo(tmp_path / "photo.jpg")
+    target = str(tmp_path / "rendered")
+
+    written = render_preset(source, target, preset)
+
+    assert written == os.path.getsize(target)
+    with Image.open(target) as rendered:
+        assert (rendered.format, rendered.size) == (image_format, size)
+    assert sorted(os.listdir(tmp_path)) == ["photo.jpg", "rendered"]
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    renders = []
+
+    async def fake_run(func, source, target, preset):
+        renders.append((source, preset))
+        with open(target, "wb") as out:
+            out.write(b"x" * 100)
+        return 100
+
+    monkeypatch.setattr("photoshare.services.derived.run_in_process",
+                        fake_run)
+    return renders
+
+
+async def serve(cache, source, preset):
+    path = await cache.get(source, preset)
+    cache.release(path)
+    return path
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_and_evicts_least_recent(tmp_path, renders):
+    first = photo(tmp_path / "first.jpg")
+    second = photo(tmp_path / "second.jpg", (320, 240))
+    cache = DerivedCache(str(tmp_path / "derived"), 250)
+
+    path = await serve(cache, first, 1)
+    assert await serve(cache, first, 1) == path
+    await serve(cache, first, 2)
+    await serve(cache, first, 1)
+    await serve(cache, second, 1)
+
+    assert renders == [(first, 1), (first, 2), (second, 1)]
+    assert os.path.exists(path)
+    assert cache.stats() == {
+        "hits": 2, "misses": 3, "hit_rate": 0.4, "evicted": 1,
+        "entries": 2, "leased": 0, "size_bytes": 200, "max_bytes": 250
+    }
+    reloaded = DerivedCache(cache.root, 250)
+    assert reloaded.stats()["entries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_renderings_being_sent_are_not_evicted(tmp_path, renders):
+    sources = [photo(tmp_path / f"{i}.jpg", (100 + i, 100)) for i in range(3)]
+    cache = DerivedCache(str(tmp_path / "derived"), 150)
+
+    sending = await cache.get(sources[0], 1)
+    await serve(cache, sources[1], 1)
+    await serve(cache, sources[2], 1)
+
+    assert os.path.exists(sending)
+    assert cache.stats()["size_bytes"] == 200
+    cache.release(sending)
+    assert not os.path.exists(sending)
+    assert cache.stats()["size_bytes"] == 100
+
+
+def test_local_storage_serves_transformations(client):
+    buffer = BytesIO()
+    Image.new("RGB", (500, 300), "teal").save(buffer, format="JPEG")
+    buffer.seek(0)
+    url = storage.upload(buffer, ".jpg")
+
+    response = client.get(storage.transform_url(url, 2))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    with Image.open(BytesIO(response.content)) as rendered:
+        assert rendered.size == (260, 260)
+    assert derived_cache.stats()["leased"] == 0
+    name = url.rsplit("/", 1)[1]
+    assert client.get(f"/media/t/9/{name}").status_code == 404
+    assert client.get("/media/t/2/missing.jpg").status_code == 404
+    storage.delete(url)
+
+
+def test_non_image_files_are_not_transformed(client):
+    url = storage.upload(BytesIO(b"<html>not an image</html>"), ".jpg")
+
+    response = client.get(storage.transform_url(url, 1))
+
+    assert response.status_code == 415
+    assert derived_cache.stats()["leased"] == 0
+    storage.delete(url)
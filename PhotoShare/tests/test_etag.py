@@ -0,0 +1,173 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+
+from photoshare.database.models import (
+    Comment, Image, ImageReaction, Tag, User
+)
+from photoshare.repository.comment import create_comment_func
+from photoshare.repository.images import load_image_func, update_image_func
+from photoshare.repository.reactions import LIKE, set_reaction_func
+from photoshare.repository.tags import update_tag
+from photoshare.schemas import (
+    CommentCreate, ImageBase, ImageUpdate, TagModel
+)
+from photoshare.services.etag import make_etag
+
+
+@pytest_asyncio.fixture
+async def image(session):
+    user = User(username="etaguser", email="etaguser@example.com",
+                password="password", role="admin", images_count=1)
+    tag = Tag(name="etagtag")
+    session.add_all([user, tag])
+    await session.flush()
+    image = Image(url="http://example.com/etag.jpg", description="etag",
+                  user_id=user.id)
+    image.tags = [tag]
+    session.add(image)
+    await session.commit()
+    yield image
+    await session.execute(delete(Comment))
+    await session.execute(delete(ImageReaction))
+    await session.execute(delete(Image))
+    await session.delete(tag)
+    await session.delete(user)
+    await session.commit()
+
+
+def revalidate(client, url):
+    etag = client.get(url).headers["ETag"]
+    return etag, client.get(url, headers={"If-None-Match": etag})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "path", ["images/{id}", "tags/{tag}", "user/etaguser"]
+)
+async def test_unchanged_resource_is_not_modified(client, image, path):
+    url = "/photoshare/" + path.format(id=image.id, tag=image.tags[0].id)
+
+    etag, response = revalidate(client, url)
+
+    assert etag.startswith('"') and etag.endswith('"')
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert "no-cache" in response.headers["Cache-Control"]
+
+
+@pytest.mark.asyncio
+async def test_not_modified_skips_loading_the_image(
+    client, image, query_counter
+):
+    url = f"/photoshare/images/{image.id}"
+    etag = client.get(url).headers["ETag"]
+    query_counter.clear()
+
+    with patch("photoshare.routes.images.get_image_func") as load:
+        response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    load.assert_not_called()
+    assert len(query_counter) == 1, query_counter
+
+
+@pytest.mark.asyncio
+async def test_weak_and_listed_etags_match(client, image):
+    url = f"/photoshare/images/{image.id}"
+    etag = client.get(url).headers["ETag"]
+
+    for header in (f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get(url, headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+
+
+@pytest.mark.asyncio
+async def test_profile_is_private(client, image):
+    response = client.get("/photoshare/user/etaguser")
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"].startswith("private")
+
+
+@pytest.mark.asyncio
+async def test_missing_resources_are_not_found(client, database):
+    for url in ("images/0", "tags/0", "user/nobody-here"):
+        response = client.get("/photoshare/" + url)
+        assert response.status_code == 404, url
+
+
+async def change_description(session, image, user):
+    await update_image_func(
+        session, image.id, ImageUpdate(description="changed"), user
+    )
+
+
+async def like(session, image, user):
+    await set_reaction_func(session, image.id, user, LIKE)
+
+
+async def comment(session, image, user):
+    await create_comment_func(
+        image.id, CommentCreate(text="new comment"), session, user
+    )
+
+
+async def rename_tag(session, image, user):
+    await update_tag(image.tags[0].id, TagModel(name="etagrenamed"), session)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "change", [change_description, like, comment, rename_tag]
+)
+async def test_image_changes_move_the_etag(client, session, image, change):
+    url = f"/photoshare/images/{image.id}"
+    etag = client.get(url).headers["ETag"]
+
+    await change(session, image, await session.get(User, image.user_id))
+    response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_new_image_moves_the_profile_etag(client, session, image):
+    url = "/photoshare/user/etaguser"
+    etag = client.get(url).headers["ETag"]
+    user = await session.get(User, image.user_id)
+
+    await load_image_func(
+        session,
+        ImageBase(url="http://example.com/2.jpg", description="2",
+                  created_at=datetime.now()),
+        [], user
+    )
+    response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["images_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_orm_update_never_reuses_a_version(session, image):
+    user = await session.get(User, image.user_id)
+    # A reaction moves the version behind the back of the loaded image
+    await like(session, image, user)
+
+    await change_description(session, image, user)
+
+    version = await session.scalar(
+        Image.__table__.select().with_only_columns(Image.version)
+        .where(Image.id == image.id)
+    )
+    assert version == 3
+
+
+def test_make_etag():
+    assert make_etag("image", 7, 3) == '"image-7-v3"'
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import delete
+
+from photoshare.database.models import Image, User
+from photoshare.repository.images import get_feed_func, rate_images_func
+from photoshare.services.pagination import decode_cursor, encode_cursor
+
+RATES = [50.0, 10.0, 50.0, 90.0, 10.0, 70.0, 0.0]
+
+
+@pytest_asyncio.fixture
+async def images(session):
+    user = User(
+        username="pageuser", email="page@example.com", password="password"
+    )
+    session.add(user)
+    await session.flush()
+    start = datetime(2024, 1, 1)
+    images = [
+        Image(
+            url=f"http://example.com/{i}.jpg", description=f"image {i}",
+            rate=rate, created_at=start + timedelta(hours=i // 2),
+            user_id=user.id
+        )
+        for i, rate in enumerate(RATES)
+    ]
+    session.add_all(images)
+    await session.commit()
+    yield images
+    await session.execute(delete(Image).where(Image.user_id == user.id))
+    await session.delete(user)
+    await session.commit()
+
+
+async def collect(fetch, limit):
+    pages, cursor = [], None
+    while True:
+        items, cursor = await fetch(cursor, limit)
+        pages.append(items)
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-01-01T00:00:00", 42)
+
+    assert decode_cursor(cursor, datetime, int) == [datetime(2024, 1, 1), 42]
+    assert decode_cursor(encode_cursor(3, 7), float, int) == [3.0, 7]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    encode_cursor(1),
+    encode_cursor("x", "y"),
+    encode_cursor(1, 2),
+    encode_cursor("2024-01-01T00:00:00", "42"),
+    encode_cursor("2024-01-01T00:00:00", True),
+    encode_cursor("2024-01-01T00:00:00", 4.2),
+])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, datetime, int)
+
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_feed_pages_newest_first(session, images):
+    pages = await collect(
+        lambda cursor, limit: get_feed_func(session, cursor, limit), 3
+    )
+
+    ids = [image.id for page in pages for image in page]
+    expected = sorted(
+        images, key=lambda image: (image.created_at, image.id), reverse=True
+    )
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert ids == [image.id for image in expected]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("order", ["asc", "desc"])
+async def test_rate_pages_follow_rate_and_id(session, images, order):
+    pages = await collect(
+        lambda cursor, limit: rate_images_func(session, order, cursor, limit),
+        2
+    )
+
+    ids = [image.id for page in pages for image in page]
+    expected = sorted(
+        images, key=lambda image: (image.rate, image.id),
+        reverse=order == "desc"
+    )
+    assert ids == [image.id for image in expected]
+
+
+@pytest.mark.asyncio
+async def test_feed_route(client, images):
+    response = client.get("/photoshare/images/feed", params={"limit": 1})
+
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data["items"]) == 1
+    assert data["next_cursor"]
+
+    response = client.get(
+        "/photoshare/images/feed",
+        params={"limit": 1, "cursor": data["next_cursor"]}
+    )
+    assert response.json()["items"][0]["id"] != data["items"][0]["id"]
+
+
+@pytest.mark.parametrize("path, cursor", [
+    ("/photoshare/images/rated", "garbage"),
+    ("/photoshare/images/rated", encode_cursor("x", "y")),
+    ("/photoshare/images/rated", encode_cursor(None, 1)),
+    ("/photoshare/images/feed", encode_cursor("x", "y")),
+    ("/photoshare/images/feed", encode_cursor(1, 2)),
+])
+def test_routes_reject_bad_cursor(client, path, cursor):
+    response = client.get(path, params={"cursor": cursor})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_pages_render(client, images):
+    assert client.get("/", params={"limit": 2}).status_code == 200
+    response = client.get(
+        "/photoshare/images/rate", params={"order": "desc", "limit": 2}
+    )
+    assert response.status_code == 200
+    assert "cursor=" in response.text
@@ -0,0 +1,86 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+
+from photoshare.database.models import Comment, Image, Tag, User
+
+
+async def seed(session, count):
+    users = [
+        User(username=f"n1user{i}", email=f"n1user{i}@example.com",
+             password="password")
+        for i in range(3)
+    ]
+    tags = [Tag(name=f"n1tag{i}") for i in range(3)]
+    session.add_all(users + tags)
+    await session.flush()
+    for i in range(count):
+        image = Image(
+            url=f"http://example.com/n1/{i}.jpg", description=f"n1 image {i}",
+            likes_count=i % 3, dislikes_count=1, user_id=users[0].id
+        )
+        image.tags = tags[:i % 3 + 1]
+        session.add(image)
+        await session.flush()
+        session.add_all(
+            Comment(text=f"comment {j}", image_id=image.id,
+                    user_id=users[j].id)
+            for j in range(2)
+        )
+    await session.commit()
+    return users, tags
+
+
+@pytest_asyncio.fixture(params=[2, 8], ids=["few", "many"])
+async def images(request, session):
+    users, tags = await seed(session, request.param)
+    first = await session.scalar(
+        Image.__table__.select().with_only_columns(Image.id)
+        .order_by(Image.id)
+    )
+    yield first
+    await session.execute(delete(Comment))
+    await session.execute(delete(Image))
+    for item in users + tags:
+        await session.delete(item)
+    await session.commit()
+
+
+# One query for the images plus one batched SELECT ... IN per relationship
+# of the loading profile, however many images the page holds. Searches
+# load the detail profile.
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url, expected", [
+    ("/photoshare/images/feed", 2),
+    ("/photoshare/images/rated?order=desc", 2),
+    ("/", 2),
+    ("/photoshare/images/rate", 2),
+    ("/photoshare/images/search/n1 image", 3),
+    ("/photoshare/images/search/tags/n1tag0,n1tag2", 3),
+])
+async def test_list_endpoints_query_count(
+    client, images, query_counter, url, expected
+):
+    response = client.get(url)
+
+    assert response.status_code == 200, response.text
+    assert len(query_counter) == expected, query_counter
+
+
+@pytest.mark.asyncio
+async def test_get_image_query_count(client, images, query_counter):
+    response = client.get(f"/photoshare/images/{images}")
+
+    assert response.status_code == 200, response.text
+    assert len(response.json()["comments"]) == 2
+    # The version lookup for the ETag, then the image and its relationships
+    assert len(query_counter) == 4, query_counter
+
+
+@pytest.mark.asyncio
+async def test_feed_omits_comments(client, images):
+    item = client.get("/photoshare/images/feed").json()["items"][0]
+
+    assert "comments" not in item
+    assert item["likes"] == 1 and item["dislikes"] == 1
+    assert {"likes", "dislikes", "tags"} <= item.keys()
@@ -1,6 +1,8 @@
+import hashlib
 import pytest
-from unittest.mock import MagicMock, patch
-from sqlalchemy.orm import Session
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
 from photoshare.repository.images import *
 from photoshare.database.models import Image, User, Tag, Comment
 from photoshare.schemas import *
@@ -11,7 +13,8 @@ from datetime import datetime, timezone
 
 @pytest.fixture
 def mock_db_session():
-    session = MagicMock(spec=Session)
+    session = MagicMock(spec=AsyncSession)
+    session.scalars.return_value = MagicMock()
     return session
 
 
@@ -44,7 +47,8 @@ def mock_image_update():
 @pytest.fixture
 def mock_upload_file():
     file = MagicMock(spec=UploadFile)
-    file.file = BytesIO(b"fake image data")
+    file.file = BytesIO(b"\xff\xd8\xfffake image data")
+    file.filename = "image.jpg"
     return file
 
 
@@ -53,69 +57,120 @@ def mock_tags():
     return ["tag1", "tag2"]
 
 
-def test_load_image_func(mock_db_session, mock_image_base, mock_tags, mock_user):
-    mock_tag = Tag(id=1, name="tag1")
-    mock_db_session.query().filter().first.side_effect = [mock_tag, None]
+@pytest.mark.asyncio
+@patch("photoshare.repository.images.leaderboard", new_callable=AsyncMock)
+@patch("photoshare.repository.images.attach_tags")
+async def test_load_image_func(mock_attach, mock_leaderboard, mock_db_session, mock_image_base, mock_tags, mock_user):
     mock_db_session.commit.side_effect = None
     mock_db_session.refresh.side_effect = None
 
-    result = load_image_func(mock_db_session, mock_image_base, mock_tags, mock_user)
+    result = await load_image_func(mock_db_session, mock_image_base, mock_tags, mock_user)
 
     assert result.description == mock_image_base.description
     assert result.url == mock_image_base.url
     assert result.user_id == mock_user.id
-    assert len(result.tags) == 2
+    mock_attach.assert_awaited_once_with(result.id, mock_tags, mock_db_session)
+    mock_leaderboard.update.assert_awaited_once_with(result.id, result.rate)
     mock_db_session.add.assert_called()
-    mock_db_session.commit.assert_called()
+    mock_db_session.commit.assert_called_once()
     mock_db_session.refresh.assert_called()
 
 
-@patch("photoshare.repository.images.cloudinary.uploader.upload")
-def test_load_image_from_pc_func(mock_upload, mock_db_session, mock_upload_file, mock_user, mock_tags):
-    mock_upload.return_value = {"url": "http://example.com/uploaded_image.jpg"}
-    mock_tag = Tag(id=1, name="tag1")
-    mock_db_session.query().filter().first.side_effect = [mock_tag, None]
+@pytest.mark.asyncio
+@patch("photoshare.repository.images.leaderboard", new_callable=AsyncMock)
+@patch("photoshare.repository.images.attach_tags")
+@patch("photoshare.repository.images.storage.upload")
+async def test_load_image_from_pc_func(mock_upload, mock_attach, mock_leaderboard, mock_db_session, mock_upload_file, mock_user, mock_tags):
+    mock_upload.return_value = "http://example.com/uploaded_image.jpg"
+    mock_db_session.execute.return_value = MagicMock()
+    mock_db_session.execute.return_value.tuples.return_value.all.return_value = []
     mock_db_session.commit.side_effect = None
     mock_db_session.refresh.side_effect = None
 
-    result = load_image_from_pc_func(mock_db_session, "Test description", mock_user, mock_upload_file, ",".join(mock_tags))
+    result = await load_image_from_pc_func(mock_db_session, "Test description", mock_user, mock_upload_file, ", ".join(mock_tags))
 
+    mock_upload.assert_called_once_with(mock_upload_file.file, ".jpg")
     assert result.url == "http://example.com/uploaded_image.jpg"
+    assert result.content_hash == hashlib.sha256(b"\xff\xd8\xfffake image data").hexdigest()
     assert result.description == "Test description"
     assert result.user_id == mock_user.id
-    assert len(result.tags) == 2
+    mock_attach.assert_awaited_once_with(result.id, mock_tags, mock_db_session)
+    mock_leaderboard.update.assert_awaited_once_with(result.id, result.rate)
     mock_db_session.add.assert_called()
-    mock_db_session.commit.assert_called()
+    mock_db_session.commit.assert_called_once()
     mock_db_session.refresh.assert_called()
 
 
-def test_delete_image_func_as_admin(mock_db_session, mock_admin_user):
+@pytest.mark.asyncio
+@patch("photoshare.repository.images.leaderboard", new_callable=AsyncMock)
+@patch("photoshare.repository.images.attach_tags")
+@patch("photoshare.repository.images.storage.upload")
+async def test_load_image_from_pc_func_reuses_stored_file(mock_upload, mock_attach, mock_leaderboard, mock_db_session, mock_upload_file, mock_user):
+    digest = hashlib.sha256(b"\xff\xd8\xfffake image data").hexdigest()
+    mock_db_session.execute.return_value = MagicMock()
+    mock_db_session.execute.return_value.tuples.return_value.all.return_value = [
+        (digest, "http://example.com/stored_image.jpg")
+    ]
+
+    result = await load_image_from_pc_func(mock_db_session, "Same photo", mock_user, mock_upload_file)
+
+    mock_upload.assert_not_called()
+    assert result.url == "http://example.com/stored_image.jpg"
+    assert result.description == "Same photo"
+    mock_db_session.commit.assert_called_once()
+    lookup = mock_db_session.execute.await_args_list[0].args[0]
+    assert "FOR KEY SHARE" in str(lookup.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+@patch("photoshare.repository.images._discard_stored", new_callable=AsyncMock)
+@patch("photoshare.repository.images.leaderboard", new_callable=AsyncMock)
+@patch("photoshare.repository.images.attach_tags")
+@patch("photoshare.repository.images.storage.upload")
+async def test_load_image_from_pc_func_discards_file_on_failure(mock_upload, mock_attach, mock_leaderboard, mock_discard, mock_db_session, mock_upload_file, mock_user):
+    mock_upload.return_value = "http://example.com/uploaded_image.jpg"
+    mock_db_session.execute.return_value = MagicMock()
+    mock_db_session.execute.return_value.tuples.return_value.all.return_value = []
+    mock_db_session.commit.side_effect = RuntimeError("database is down")
+
+    with pytest.raises(RuntimeError):
+        await load_image_from_pc_func(mock_db_session, "Lost photo", mock_user, mock_upload_file)
+
+    mock_db_session.rollback.assert_awaited_once()
+    mock_discard.assert_awaited_once_with(mock_db_session, "http://example.com/uploaded_image.jpg")
+    mock_leaderboard.update.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_delete_image_func_as_admin(mock_db_session, mock_admin_user):
     mock_image = Image(id=1, user_id=1)
-    mock_db_session.query().filter().first.return_value = mock_image
+    mock_db_session.scalar.return_value = mock_image
 
-    result = delete_image_func(mock_db_session, 1, mock_admin_user)
+    result = await delete_image_func(mock_db_session, 1, mock_admin_user)
 
     assert result == mock_image
     mock_db_session.delete.assert_called_once_with(mock_image)
     mock_db_session.commit.assert_called()
 
 
-def test_delete_image_func_as_non_admin(mock_db_session, mock_user):
+@pytest.mark.asyncio
+async def test_delete_image_func_as_non_admin(mock_db_session, mock_user):
     mock_image = Image(id=1, user_id=1)
-    mock_db_session.query().filter().first.return_value = mock_image
+    mock_db_session.scalar.return_value = mock_image
 
-    result = delete_image_func(mock_db_session, 1, mock_user)
+    result = await delete_image_func(mock_db_session, 1, mock_user)
 
     assert result == mock_image
     mock_db_session.delete.assert_called_once_with(mock_image)
     mock_db_session.commit.assert_called()
 
 
-def test_delete_image_func_not_found(mock_db_session, mock_user):
-    mock_db_session.query().filter().first.return_value = None
+@pytest.mark.asyncio
+async def test_delete_image_func_not_found(mock_db_session, mock_user):
+    mock_db_session.scalar.return_value = None
 
     with pytest.raises(HTTPException) as exc_info:
-        delete_image_func(mock_db_session, 1, mock_user)
+        await delete_image_func(mock_db_session, 1, mock_user)
 
     assert exc_info.value.status_code == 404
     assert exc_info.value.detail == "Image not found or you don't have permission to delete it."
@@ -134,7 +189,7 @@ def test_delete_image_func_not_found(mock_db_session, mock_user):
 #         user_id=1,
 #         user=mock_user
 #     )
-#     mock_db_session.query().filter().first.return_value = mock_image
+#     mock_db_session.scalar.return_value = mock_image
 
 #     result = update_image_func(mock_db_session, 1, mock_image_update, mock_user)
 
@@ -146,68 +201,76 @@ def test_delete_image_func_not_found(mock_db_session, mock_user):
 #     assert result.comments == mock_image.comments
 #     mock_db_session.commit.assert_called_once()
 
-def test_get_image_url_func(mock_db_session):
+@pytest.mark.asyncio
+async def test_get_image_url_func(mock_db_session):
     mock_image = Image(id=1, url_view="http://example.com/image_view.jpg")
-    mock_db_session.query().filter().first.return_value = mock_image
+    mock_db_session.scalar.return_value = mock_image
 
-    result = get_image_url_func(mock_db_session, "http://example.com/image_view.jpg")
+    result = await get_image_url_func(mock_db_session, "http://example.com/image_view.jpg")
 
     assert result == mock_image
 
 
-def test_get_image_func(mock_db_session):
+@pytest.mark.asyncio
+async def test_get_image_func(mock_db_session):
     mock_image = Image(id=1)
-    mock_db_session.query().filter().first.return_value = mock_image
+    mock_db_session.scalar.return_value = mock_image
 
-    result = get_image_func(mock_db_session, 1)
+    result = await get_image_func(mock_db_session, 1)
 
     assert result == mock_image
 
 
-def test_rate_images_func_asc(mock_db_session):
+@pytest.mark.asyncio
+async def test_rate_images_func_asc(mock_db_session):
     mock_images = [
         Image(id=1, rate=1),
         Image(id=2, rate=2)
     ]
-    mock_db_session.query().order_by().all.return_value = mock_images
+    mock_db_session.scalars.return_value.all.return_value = mock_images
 
-    result = rate_images_func(mock_db_session, "asc")
+    result, next_cursor = await rate_images_func(mock_db_session, "asc")
 
     assert result == mock_images
+    assert next_cursor is None
 
 
-def test_rate_images_func_desc(mock_db_session):
+@pytest.mark.asyncio
+async def test_rate_images_func_desc(mock_db_session):
     mock_images = [
         Image(id=2, rate=2),
         Image(id=1, rate=1)
     ]
-    mock_db_session.query().order_by().all.return_value = mock_images
+    mock_db_session.scalars.return_value.all.return_value = mock_images
 
-    result = rate_images_func(mock_db_session, "desc")
+    result, next_cursor = await rate_images_func(mock_db_session, "desc")
 
     assert result == mock_images
+    assert next_cursor is None
 
 
-@patch("photoshare.repository.images.CloudinaryImage")
-def test_get_transformation_func(mock_cloudinary_image, mock_db_session, mock_user):
+@pytest.mark.asyncio
+@patch("photoshare.repository.images.storage.transform_url")
+async def test_get_transformation_func(mock_transform_url, mock_db_session, mock_user):
     mock_image = Image(id=1, url="http://example.com/image.jpg", user_id=1)
-    mock_db_session.query().filter().first.return_value = mock_image
+    mock_db_session.scalar.return_value = mock_image
 
     mock_transformed_image_url = "http://example.com/transformed_image.jpg"
-    mock_cloudinary_image.return_value.build_url.return_value = mock_transformed_image_url
+    mock_transform_url.return_value = mock_transformed_image_url
 
-    with patch("photoshare.repository.images.generate_qr_code", return_value="http://example.com/qr_code.jpg"):
-        result = get_transformation_func(mock_db_session, 1, 1, mock_user)
+    with patch("photoshare.repository.images.get_qr_code_url", return_value="http://example.com/qr_code.jpg") as mock_qr:
+        result = await get_transformation_func(mock_db_session, 1, 1, mock_user)
 
+    mock_qr.assert_awaited_once_with(mock_db_session, mock_transformed_image_url, generate_qr_code)
     assert result.url_view == mock_transformed_image_url
     assert result.qr_code_view == "http://example.com/qr_code.jpg"
     mock_db_session.commit.assert_called()
-    mock_db_session.refresh.assert_called_with(mock_image)
 
 
-def test_generate_qr_code():
+@pytest.mark.asyncio
+async def test_generate_qr_code():
     image_url = "http://example.com/image.jpg"
-    with patch("photoshare.repository.images.cloudinary.uploader.upload", return_value={"url": "http://example.com/qr_code.jpg"}) as mock_upload:
-        result = generate_qr_code(image_url)
+    with patch("photoshare.repository.images.storage.upload", return_value="http://example.com/qr_code.jpg") as mock_upload:
+        result = await generate_qr_code(image_url)
         assert result == "http://example.com/qr_code.jpg"
         mock_upload.assert_called()
@@ -0,0 +1,134 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql
+
+from photoshare.database.models import Image, User
+from photoshare.database.search import search_hits, search_terms
+from photoshare.repository.images import search_images_by_description_func
+from photoshare.services.pagination import encode_cursor
+
+DESCRIPTIONS = [
+    "Sunset over the sea",
+    "Sunset sunset, and a sunny beach",
+    "Mountain lake at sunrise",
+    "Кіт на дивані",
+    "A city street at night",
+]
+
+
+@pytest_asyncio.fixture
+async def images(session):
+    user = User(
+        username="searcher", email="searcher@example.com", password="password"
+    )
+    session.add(user)
+    await session.flush()
+    images = [
+        Image(url=f"http://example.com/s{i}.jpg", description=text,
+              user_id=user.id)
+        for i, text in enumerate(DESCRIPTIONS)
+    ]
+    session.add_all(images)
+    await session.commit()
+    yield images
+    await session.execute(delete(Image).where(Image.user_id == user.id))
+    await session.delete(user)
+    await session.commit()
+
+
+async def search(session, text, cursor=None, limit=20):
+    images, next_cursor = await search_images_by_description_func(
+        session, text, cursor, limit
+    )
+    return [image.description for image in images], next_cursor
+
+
+def test_search_terms_drop_operators():
+    assert search_terms('Sun* "OR" -sea: (Кіт)') == [
+        "sun", "or", "sea", "кіт"
+    ]
+
+
+def test_postgres_hits_use_tsvector():
+    sql = str(
+        select(search_hits("postgresql", ["sun", "sea"]))
+        .compile(dialect=postgresql.dialect())
+    )
+
+    assert "search_vector @@ to_tsquery" in sql
+    assert "ts_rank(images.search_vector" in sql
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_prefix_matches(session, images):
+    found, next_cursor = await search(session, "sun")
+
+    assert found == [DESCRIPTIONS[1], DESCRIPTIONS[0], DESCRIPTIONS[2]]
+    assert next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_search_requires_every_word(session, images):
+    assert (await search(session, "sunset sea"))[0] == [DESCRIPTIONS[0]]
+    assert (await search(session, "КІТ"))[0] == [DESCRIPTIONS[3]]
+    assert (await search(session, "sunset forest"))[0] == []
+    assert (await search(session, "?!"))[0] == []
+
+
+@pytest.mark.asyncio
+async def test_search_pages_follow_rank(session, images):
+    everything, _ = await search(session, "sun")
+    pages, cursor = [], None
+    while True:
+        page, cursor = await search(session, "sun", cursor, limit=1)
+        pages.extend(page)
+        if cursor is None:
+            break
+
+    assert pages == everything
+
+
+@pytest.mark.asyncio
+async def test_index_follows_updates_and_deletes(session, images):
+    images[4].description = "A sunlit street"
+    await session.delete(images[0])
+    await session.commit()
+
+    found, _ = await search(session, "sun")
+
+    assert "A sunlit street" in found
+    assert DESCRIPTIONS[0] not in found
+
+
+@pytest.mark.asyncio
+async def test_search_route(client, images):
+    response = client.get(
+        "/photoshare/images/search/sun", params={"limit": 2}
+    )
+
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [item["description"] for item in data] == [
+        DESCRIPTIONS[1], DESCRIPTIONS[0]
+    ]
+    assert all("comments" in item for item in data)
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(
+        "/photoshare/images/search/sun", params={"limit": 2, "cursor": cursor}
+    )
+    assert response.status_code == 200, response.text
+    rest = [item["description"] for item in response.json()]
+    assert rest and not set(rest) & {DESCRIPTIONS[0], DESCRIPTIONS[1]}
+
+
+@pytest.mark.parametrize("cursor", [
+    encode_cursor("x", "y"), encode_cursor(1.5, "2"), encode_cursor(None, 1)
+])
+def test_search_route_rejects_bad_cursor(client, cursor):
+    response = client.get(
+        "/photoshare/images/search/sun", params={"cursor": cursor}
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+
+from photoshare.database.models import Image, Tag, User
+from photoshare.repository.images import search_images_by_tags_func
+from photoshare.services.pagination import encode_cursor
+
+# description: tags, in upload order
+CATALOG = {
+    "red only": ["red"],
+    "red and blue": ["red", "blue"],
+    "blue only": ["blue"],
+    "all three": ["red", "blue", "green"],
+    "green only": ["green"],
+    "untagged": [],
+}
+
+
+@pytest_asyncio.fixture
+async def catalog(session):
+    user = User(
+        username="tagsearch", email="tagsearch@example.com",
+        password="password"
+    )
+    tags = {name: Tag(name=name) for name in ("red", "blue", "green")}
+    session.add_all([user, *tags.values()])
+    await session.flush()
+    start = datetime(2024, 1, 1)
+    for i, (description, names) in enumerate(CATALOG.items()):
+        image = Image(
+            url=f"http://example.com/t{i}.jpg", description=description,
+            created_at=start + timedelta(days=i), user_id=user.id
+        )
+        image.tags = [tags[name] for name in names]
+        session.add(image)
+    await session.commit()
+    yield
+    await session.execute(delete(Image).where(Image.user_id == user.id))
+    for item in [user, *tags.values()]:
+        await session.delete(item)
+    await session.commit()
+
+
+async def search(session, tags, *args, **kwargs):
+    images, next_cursor = await search_images_by_tags_func(
+        session, tags, *args, **kwargs
+    )
+    return [image.description for image in images], next_cursor
+
+
+@pytest.mark.asyncio
+async def test_any_orders_by_matched_tags_then_recency(session, catalog):
+    found, next_cursor = await search(session, ["red", "blue"])
+
+    assert found == ["all three", "red and blue", "blue only", "red only"]
+    assert next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_all_requires_every_tag(session, catalog):
+    found, _ = await search(session, ["red", "blue", "red"], "all")
+
+    assert found == ["all three", "red and blue"]
+    assert (await search(session, ["red", "missing"], "all"))[0] == []
+
+
+@pytest.mark.asyncio
+async def test_recent_order(session, catalog):
+    found, _ = await search(session, ["red", "green"], "any", "recent")
+
+    assert found == ["green only", "all three", "red and blue", "red only"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("order", ["relevance", "recent"])
+async def test_pages_match_single_query(session, catalog, order):
+    everything, _ = await search(session, ["red", "blue", "green"], "any", order)
+    pages, cursor = [], None
+    while True:
+        page, cursor = await search(
+            session, ["red", "blue", "green"], "any", order, cursor, 2
+        )
+        pages.extend(page)
+        if cursor is None:
+            break
+
+    assert len(everything) == 5
+    assert pages == everything
+
+
+def test_tag_search_route(client, catalog):
+    response = client.get(
+        "/photoshare/images/search/tags/red, blue",
+        params={"mode": "all", "limit": 1}
+    )
+
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [item["description"] for item in data] == ["all three"]
+    assert data[0]["comments"] == []
+    response = client.get(
+        "/photoshare/images/search/tags/red, blue",
+        params={"mode": "all", "limit": 1,
+                "cursor": response.headers["X-Next-Cursor"]}
+    )
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 1
+    assert "X-Next-Cursor" not in response.headers
+    response = client.get(
+        "/photoshare/images/search/tags/red", params={"mode": "some"}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("order, cursor", [
+    ("relevance", encode_cursor(1, "yesterday", 3)),
+    ("relevance", encode_cursor("1", datetime.now().isoformat(), 3)),
+    ("recent", encode_cursor(1, datetime.now().isoformat(), 3)),
+    ("recent", encode_cursor(datetime.now().isoformat(), None)),
+])
+def test_tag_search_route_rejects_bad_cursor(client, order, cursor):
+    response = client.get(
+        "/photoshare/images/search/tags/red",
+        params={"order": order, "cursor": cursor}
+    )
+
+    assert response.status_code == 400
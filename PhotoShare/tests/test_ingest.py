@@ -0,0 +1,133 @@
+import hashlib
+import os
+from io import BytesIO
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from photoshare.services.ingest import (
+    CHUNK_SIZE, UploadLimitMiddleware, inspect_upload, sniff_image_type
+)
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.mark.parametrize("head, suffix", [
+    (b"\xff\xd8\xff\xe0rest", ".jpg"),
+    (PNG + b"rest", ".png"),
+    (b"GIF89a rest", ".gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", ".webp"),
+    (b"<svg xmlns=", None),
+    (b"", None),
+])
+def test_sniff_image_type(head, suffix):
+    assert sniff_image_type(head) == suffix
+
+
+def test_inspect_upload_hashes_and_rewinds():
+    data = PNG + os.urandom(3 * CHUNK_SIZE)
+    file = BytesIO(data)
+
+    assert inspect_upload(file, len(data)) == (
+        hashlib.sha256(data).hexdigest(), ".png"
+    )
+    assert file.tell() == 0
+
+
+class CountingFile(BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.read_bytes = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.read_bytes += len(chunk)
+        return chunk
+
+
+@pytest.mark.parametrize("data, status_code", [
+    (PNG + bytes(10 * CHUNK_SIZE), 413),
+    (b"MZ" + bytes(10 * CHUNK_SIZE), 415),
+])
+def test_inspect_upload_stops_early(data, status_code):
+    file = CountingFile(data)
+
+    with pytest.raises(HTTPException) as error:
+        inspect_upload(file, 2 * CHUNK_SIZE)
+
+    assert error.value.status_code == status_code
+    assert file.read_bytes <= 3 * CHUNK_SIZE
+
+
+@pytest.fixture
+def limited():
+    app = FastAPI()
+    received = []
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        async for chunk in request.stream():
+            received.append(len(chunk))
+        return {"size": sum(received)}
+
+    app.add_middleware(UploadLimitMiddleware, limits={"/upload": 1000})
+    return TestClient(app), received
+
+
+def test_body_under_the_limit_passes(limited):
+    client, _ = limited
+
+    response = client.post("/upload", content=bytes(1000))
+
+    assert response.json() == {"size": 1000}
+
+
+def test_declared_oversized_body_is_refused_unread(limited):
+    client, received = limited
+
+    response = client.post("/upload", content=bytes(1001))
+
+    assert response.status_code == 413
+    assert received == []
+
+
+@pytest.mark.asyncio
+async def test_streamed_body_is_cut_off(limited):
+    client, received = limited
+    sent = []
+
+    async def body():
+        for _ in range(100):
+            sent.append(100)
+            yield bytes(100)
+
+    transport = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test"
+    ) as streaming:
+        response = await streaming.post("/upload", content=body())
+
+    assert response.status_code == 413
+    assert sum(received) <= 1000
+    assert sum(sent) <= 1100
+
+
+def test_non_image_upload_is_refused(client):
+    user = {"username": "sniffer", "email": "sniffer@example.com",
+            "password": "sniffpass"}
+    client.post("/api/auth/signup", json=user)
+    login = client.post("/api/auth/login", data={
+        "username": user["email"], "password": user["password"]
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    response = client.post(
+        "/photoshare/images/add_from_pc", headers=headers,
+        params={"description": "script"},
+        files={"file": ("photo.png", b"<script>alert(1)</script>",
+                        "image/png")}
+    )
+
+    assert response.status_code == 415
@@ -0,0 +1,244 @@
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from photoshare.services.jobs import (
+    DONE, FAILED, QUEUED, RUNNING, JobQueue, MemoryQueue
+)
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(MemoryQueue(), in_process=False, ttl=60)
+    queue.session_factory = nullcontext
+
+    @queue.handler("add")
+    async def add(db, a, b):
+        return {"sum": a + b}
+
+    @queue.handler("refuse")
+    async def refuse(db):
+        raise HTTPException(status_code=400, detail="refused")
+
+    @queue.handler("crash")
+    async def crash(db):
+        raise RuntimeError("secret details")
+
+    @queue.handler("hang")
+    async def hang(db):
+        await asyncio.Event().wait()
+
+    return queue
+
+
+@pytest.mark.asyncio
+async def test_workers_run_queued_jobs(queue):
+    jobs = [await queue.enqueue("add", {"a": i, "b": 1}, 7) for i in range(5)]
+    assert (await queue.get(jobs[0]["id"]))["status"] == QUEUED
+
+    worker = asyncio.create_task(queue.work(2, poll_interval=0.01))
+    for _ in range(100):
+        stored = [await queue.get(job["id"]) for job in jobs]
+        if all(job["status"] == DONE for job in stored):
+            break
+        await asyncio.sleep(0.01)
+    worker.cancel()
+
+    assert [job["result"] for job in stored] == [
+        {"sum": i + 1} for i in range(5)
+    ]
+    assert all(job["finished_at"] for job in stored)
+
+
+@pytest.mark.asyncio
+async def test_failures_are_recorded(queue):
+    refused = await queue.enqueue("refuse", {}, 7)
+    crashed = await queue.enqueue("crash", {}, 7)
+
+    refused = await queue.run(refused["id"])
+    crashed = await queue.run(crashed["id"])
+
+    assert (refused["status"], refused["error"]) == (FAILED, "refused")
+    assert (crashed["status"], crashed["error"]) == (FAILED, "Job failed")
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_once(queue):
+    job = await queue.enqueue("add", {"a": 1, "b": 1}, 7)
+
+    await queue.run(job["id"])
+    await queue.run(job["id"])
+
+    assert await queue.backend.rpop(queue.queue_key) == job["id"]
+    with pytest.raises(ValueError):
+        await queue.enqueue("unknown", {}, 7)
+
+
+async def abandon(queue, job, minutes):
+    # A worker took the job and died running it
+    assert await queue.backend.rpoplpush(
+        queue.queue_key, queue.processing_key
+    ) == job["id"]
+    job = await queue.get(job["id"])
+    started = datetime.now() - timedelta(minutes=minutes)
+    job.update(status=RUNNING, started_at=started.isoformat(),
+               attempts=job["attempts"] + 1)
+    await queue._save(job)
+
+
+@pytest.mark.asyncio
+async def test_abandoned_jobs_are_queued_again(queue):
+    job = await queue.enqueue("add", {"a": 2, "b": 2}, 7)
+    await abandon(queue, job, minutes=1)
+
+    # Still within the timeout, its worker may be alive
+    assert await queue.recover() == 0
+    fresh = await queue.enqueue("add", {"a": 0, "b": 0}, 7)
+    await abandon(queue, fresh, minutes=1)
+    job = await queue.get(job["id"])
+    job["started_at"] = (datetime.now() - timedelta(minutes=20)).isoformat()
+    await queue._save(job)
+
+    assert await queue.recover() == 1
+
+    assert (await queue.get(job["id"]))["status"] == QUEUED
+    assert await queue.backend.lrange(queue.processing_key, 0, -1) == [
+        fresh["id"]
+    ]
+    worker = asyncio.create_task(queue.work(1, poll_interval=0.01))
+    for _ in range(100):
+        if (await queue.get(job["id"]))["status"] == DONE:
+            break
+        await asyncio.sleep(0.01)
+    worker.cancel()
+    job = await queue.get(job["id"])
+    assert (job["status"], job["result"], job["attempts"]) == (
+        DONE, {"sum": 4}, 2
+    )
+
+
+@pytest.mark.asyncio
+async def test_jobs_abandoned_too_often_fail(queue):
+    job = await queue.enqueue("add", {"a": 1, "b": 1}, 7)
+    for attempt in range(queue.max_attempts):
+        await abandon(queue, job, minutes=20)
+        assert await queue.recover() == int(attempt < queue.max_attempts - 1)
+
+    job = await queue.get(job["id"])
+    assert (job["status"], job["error"]) == (FAILED, "Job timed out")
+    assert await queue.backend.lrange(queue.processing_key, 0, -1) == []
+
+
+@pytest.mark.asyncio
+async def test_taken_but_unstarted_jobs_are_queued_again(queue):
+    job = await queue.enqueue("add", {"a": 1, "b": 1}, 7)
+    await queue.backend.rpoplpush(queue.queue_key, queue.processing_key)
+
+    assert await queue.recover() == 0
+    assert await queue.recover() == 1
+    assert await queue.backend.rpop(queue.queue_key) == job["id"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_recoveries_queue_a_job_once(queue, monkeypatch):
+    job = await queue.enqueue("add", {"a": 1, "b": 1}, 7)
+    await abandon(queue, job, minutes=20)
+    abandoned = await queue.get(job["id"])
+
+    # Both workers read the processing list and the job before either one
+    # recovered it
+    async def stale_lrange(key, start, end):
+        return [job["id"]]
+
+    async def stale_get(job_id):
+        return dict(abandoned)
+
+    monkeypatch.setattr(queue.backend, "lrange", stale_lrange)
+    monkeypatch.setattr(queue, "get", stale_get)
+
+    assert [await queue.recover(), await queue.recover()] == [1, 0]
+    assert await queue.backend.rpop(queue.queue_key) == job["id"]
+    assert await queue.backend.rpop(queue.queue_key) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_of_a_job_run_it_once(queue, monkeypatch):
+    runs = []
+
+    @queue.handler("count")
+    async def count(db):
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return len(runs)
+
+    job = await queue.enqueue("count", {}, 7)
+    get = queue.get
+
+    async def stale_get(job_id):
+        # Both workers read the job before either marked it running
+        return dict(job)
+
+    monkeypatch.setattr(queue, "get", stale_get)
+    await asyncio.gather(queue.run(job["id"]), queue.run(job["id"]))
+
+    assert runs == [1]
+    assert (await get(job["id"]))["attempts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_jobs_time_out(queue):
+    queue.timeout = 0.01
+    job = await queue.enqueue("hang", {}, 7)
+
+    job = await queue.run(job["id"])
+
+    assert (job["status"], job["error"]) == (FAILED, "Job timed out")
+
+
+def login(client, name):
+    user = {"username": name, "email": f"{name}@example.com",
+            "password": "jobpass"}
+    client.post("/api/auth/signup", json=user)
+    response = client.post("/api/auth/login", data={
+        "username": user["email"], "password": user["password"]
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_transformation_runs_as_a_job(client):
+    headers = login(client, "jobowner")
+    image = client.post(
+        "/photoshare/images/add_from_pc", headers=headers,
+        params={"description": "to transform"},
+        files={"file": (
+            "photo.png", b"\x89PNG\r\n\x1a\npng bytes", "image/png"
+        )}
+    ).json()
+    url = f"/photoshare/images/{image['id']}"
+
+    assert client.post(
+        url, params={"choice": 9}, headers=headers
+    ).status_code == 400
+    assert client.post(
+        "/photoshare/images/0", params={"choice": 1}, headers=headers
+    ).status_code == 404
+
+    accepted = client.post(url, params={"choice": 2}, headers=headers)
+
+    assert accepted.status_code == 202, accepted.text
+    location = accepted.headers["Location"]
+    assert location == f"/photoshare/jobs/{accepted.json()['id']}"
+    job = client.get(location, headers=headers).json()
+    assert job["status"] == DONE, job
+    assert job["result"]["image_id"] == image["id"]
+    qr = client.get(job["result"]["qr_code_view"])
+    assert qr.content.startswith(b"\x89PNG")
+    assert client.get(url).json()["qr_code_view"] == (
+        job["result"]["qr_code_view"]
+    )
+    assert client.get(
+        location, headers=login(client, "jobstranger")
+    ).status_code == 404
@@ -0,0 +1,255 @@
+import random
+
+import pytest
+import pytest_asyncio
+from redis.exceptions import RedisError
+from sqlalchemy import delete
+
+from photoshare.database.models import Image, ImageReaction, User
+from photoshare.repository.images import (
+    delete_image_func, get_image_rank_func, rate_images_func, top_rated_func
+)
+from photoshare.repository.reactions import LIKE, DISLIKE, set_reaction_func
+from photoshare.services.leaderboard import MemorySortedSets
+
+RATES = [50.0, 100.0, 0.0, 50.0, 75.0, 100.0, 25.0]
+
+
+@pytest_asyncio.fixture
+async def images(session):
+    users = [
+        User(username=f"ranker{i}", email=f"ranker{i}@example.com",
+             password="password", role="admin")
+        for i in range(2)
+    ]
+    session.add_all(users)
+    await session.flush()
+    images = [
+        Image(url=f"http://example.com/rank/{i}.jpg", description=f"{i}",
+              rate=rate, user_id=users[0].id)
+        for i, rate in enumerate(RATES)
+    ]
+    session.add_all(images)
+    await session.commit()
+    yield images
+    await session.execute(delete(ImageReaction))
+    await session.execute(delete(Image))
+    for user in users:
+        await session.delete(user)
+    await session.commit()
+
+
+async def read_all(session, read_page, limit=3):
+    ids, cursor = [], None
+    while True:
+        page, cursor = await read_page(session, cursor, limit)
+        ids += [image.id for image in page]
+        if cursor is None:
+            return ids
+
+
+async def sql_order(session):
+    return await read_all(
+        session, lambda db, cursor, limit:
+        rate_images_func(db, "desc", cursor, limit)
+    )
+
+
+@pytest.mark.asyncio
+async def test_top_matches_the_rating_query(
+    session, images, memory_leaderboard
+):
+    assert await memory_leaderboard.rebuild(session) == len(images)
+
+    assert await read_all(session, top_rated_func) == await sql_order(session)
+
+
+@pytest.mark.asyncio
+async def test_database_answers_until_built(
+    session, images, memory_leaderboard, query_counter
+):
+    assert await memory_leaderboard.top(None, 10) is None
+
+    assert await read_all(session, top_rated_func) == await sql_order(session)
+
+
+@pytest.mark.asyncio
+async def test_database_answers_while_redis_is_down(
+    session, images, memory_leaderboard, monkeypatch
+):
+    await memory_leaderboard.rebuild(session)
+
+    def broken(*args, **kwargs):
+        raise RedisError("down")
+
+    monkeypatch.setattr(memory_leaderboard.backend, "pipeline", broken)
+    monkeypatch.setattr(memory_leaderboard.backend, "zadd", broken)
+
+    assert await read_all(session, top_rated_func) == await sql_order(session)
+    rank = await get_image_rank_func(session, images[1].id)
+    assert rank["rank"] in (1, 2)
+    await memory_leaderboard.update(images[0].id, 1.0)
+
+
+@pytest.mark.asyncio
+async def test_reactions_move_the_leaderboard(
+    session, images, memory_leaderboard
+):
+    await memory_leaderboard.rebuild(session)
+    user = await session.get(User, images[0].user_id)
+
+    await set_reaction_func(session, images[2].id, user, LIKE)
+
+    # Ties with two other images at 100%, only the newest one ranks higher
+    assert await memory_leaderboard.rank(images[2].id) == (2, 100.0)
+    assert await read_all(session, top_rated_func) == await sql_order(session)
+
+    await set_reaction_func(session, images[2].id, user, DISLIKE)
+
+    assert (await memory_leaderboard.rank(images[2].id))[1] == 0.0
+    assert await read_all(session, top_rated_func) == await sql_order(session)
+
+
+@pytest.mark.asyncio
+async def test_rank_matches_the_database(session, images, memory_leaderboard):
+    from_database = [
+        await get_image_rank_func(session, image.id) for image in images
+    ]
+    await memory_leaderboard.rebuild(session)
+
+    from_leaderboard = [
+        await get_image_rank_func(session, image.id) for image in images
+    ]
+
+    assert from_leaderboard == from_database
+    assert sorted(rank["rank"] for rank in from_database) == list(
+        range(1, len(images) + 1)
+    )
+
+
+@pytest.mark.asyncio
+async def test_deleted_image_leaves_the_leaderboard(
+    session, images, memory_leaderboard
+):
+    await memory_leaderboard.rebuild(session)
+    admin = await session.get(User, images[0].user_id)
+
+    await delete_image_func(session, images[1].id, admin)
+
+    assert await memory_leaderboard.rank(images[1].id) is None
+    assert images[1].id not in await read_all(session, top_rated_func)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_fixes_drift(session, images, memory_leaderboard):
+    await memory_leaderboard.rebuild(session)
+    await memory_leaderboard.update(images[2].id, 99.0)
+    await memory_leaderboard.update(10 ** 6, 100.0)
+
+    await memory_leaderboard.rebuild(session)
+
+    assert await read_all(session, top_rated_func) == await sql_order(session)
+
+
+@pytest.mark.asyncio
+async def test_pages_survive_rate_changes(
+    session, images, memory_leaderboard, query_counter
+):
+    await memory_leaderboard.rebuild(session)
+    first, cursor = await top_rated_func(session, None, 3)
+    # A better rated image would shift every rank after the first page
+    await memory_leaderboard.update(10 ** 6, 200.0)
+
+    query_counter.clear()
+
+    second, _ = await top_rated_func(session, cursor, 3)
+
+    # Served by the leaderboard: the images and their tags
+    assert len(query_counter) == 2
+    assert [image.id for image in first + second] == \
+        (await sql_order(session))[:6]
+
+
+@pytest.mark.asyncio
+async def test_moved_cursor_image_falls_back_to_the_database(
+    session, images, memory_leaderboard
+):
+    await memory_leaderboard.rebuild(session)
+    first, cursor = await top_rated_func(session, None, 3)
+    await memory_leaderboard.update(first[-1].id, 0.0)
+
+    assert await memory_leaderboard.top((first[-1].rate, first[-1].id), 3) \
+        is None
+    second, _ = await top_rated_func(session, cursor, 3)
+    assert [image.id for image in first + second] == \
+        (await sql_order(session))[:6]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_changes_made_meanwhile(
+    session, images, memory_leaderboard, monkeypatch
+):
+    await memory_leaderboard.rebuild(session)
+    backend = memory_leaderboard.backend
+    zadd = backend.zadd
+
+    async def zadd_while_rates_change(key, mapping):
+        if key.endswith(":staging"):
+            await memory_leaderboard.update(images[2].id, 99.0)
+            await memory_leaderboard.remove(images[0].id)
+        return await zadd(key, mapping)
+
+    monkeypatch.setattr(backend, "zadd", zadd_while_rates_change)
+    await memory_leaderboard.rebuild(session)
+    monkeypatch.setattr(backend, "zadd", zadd)
+
+    assert await memory_leaderboard.rank(images[2].id) == (3, 99.0)
+    assert await memory_leaderboard.rank(images[0].id) is None
+    assert not await backend.exists(
+        memory_leaderboard.rebuilding_key, memory_leaderboard.journal_key
+    )
+    await memory_leaderboard.update(images[2].id, 98.0)
+    assert not await backend.exists(memory_leaderboard.journal_key)
+
+
+def test_top_route_pages(client, images, memory_leaderboard):
+    response = client.get("/photoshare/images/top", params={"limit": 2})
+
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 2
+    response = client.get(
+        "/photoshare/images/top", params={"cursor": "garbage"}
+    )
+    assert response.status_code == 400
+
+
+def test_rank_route(client, images):
+    response = client.get(f"/photoshare/images/{images[2].id}/rank")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "image_id": images[2].id, "rank": len(images), "rate": 0.0
+    }
+    assert client.get("/photoshare/images/0/rank").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_memory_sorted_sets_match_a_full_sort():
+    backend = MemorySortedSets()
+    scores = {}
+    rng = random.Random(7)
+    for _ in range(500):
+        member = f"{rng.randrange(60):012d}"
+        if rng.random() < 0.2:
+            await backend.zrem("board", member)
+            scores.pop(member, None)
+        else:
+            scores[member] = rng.choice([0.0, 33.3, 50.0, 100.0])
+            await backend.zadd("board", {member: scores[member]})
+
+    expected = sorted(scores, key=lambda m: (scores[m], m), reverse=True)
+    assert await backend.zrevrange("board", 0, -1) == expected
+    assert await backend.zrevrange("board", 5, 9) == expected[5:10]
+    assert await backend.zrevrange("board", -2, -1) == expected[-2:]
+    for rank, member in enumerate(expected):
+        assert await backend.zrevrank("board", member) == rank
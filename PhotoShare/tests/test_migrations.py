@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from photoshare.database.models import create_schema
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The schema the backlog migrations start from
+BASELINE = "478377e897d5"
+
+
+@pytest.fixture
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    engine = create_engine(url)
+    yield url, engine
+    engine.dispose()
+
+
+def alembic(url, *args):
+    subprocess.run(
+        [sys.executable, "-m", "alembic", *args], cwd=PROJECT, check=True,
+        env={**os.environ, "SQLALCHEMY_DATABASE_URL": url},
+        capture_output=True
+    )
+
+
+def tables(engine):
+    return set(inspect(engine).get_table_names())
+
+
+def test_baseline_database_upgrades_to_head(database):
+    url, engine = database
+    with engine.begin() as connection:
+        create_schema(connection)
+    alembic(url, "stamp", "head")
+    alembic(url, "downgrade", BASELINE)
+    assert not {"image_reactions", "qr_codes"} & tables(engine)
+
+    alembic(url, "upgrade", "head")
+
+    assert {"image_reactions", "qr_codes"} <= tables(engine)
+
+
+def test_migrated_database_is_left_to_alembic(database):
+    url, engine = database
+    alembic(url, "stamp", BASELINE)
+
+    with engine.begin() as connection:
+        create_schema(connection)
+
+    assert tables(engine) == {"alembic_version"}
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select
+
+from photoshare.database.models import Image, QrCode, User
+from photoshare.repository.qr_codes import (
+    evict_orphan_qr_codes, get_qr_code_url, qr_cache_stats, qr_digest
+)
+
+
+@pytest_asyncio.fixture
+async def stats(monkeypatch):
+    monkeypatch.setattr(qr_cache_stats, "hits", 0)
+    monkeypatch.setattr(qr_cache_stats, "misses", 0)
+    monkeypatch.setattr(qr_cache_stats, "evicted", 0)
+    return qr_cache_stats
+
+
+@pytest_asyncio.fixture
+async def codes(session):
+    yield
+    await session.execute(delete(QrCode))
+    await session.execute(delete(Image))
+    await session.commit()
+
+
+def counting_create():
+    calls = []
+
+    async def create(data, digest):
+        calls.append(digest)
+        return f"/media/{digest}.png"
+
+    return calls, create
+
+
+@pytest.mark.asyncio
+async def test_repeat_is_a_lookup(session, codes, stats):
+    calls, create = counting_create()
+
+    first = await get_qr_code_url(session, "http://example.com/a", create)
+    await session.commit()
+    again = await get_qr_code_url(session, "http://example.com/a", create)
+    other = await get_qr_code_url(session, "http://example.com/b", create)
+
+    assert first == again != other
+    assert calls == [qr_digest("http://example.com/a"),
+                     qr_digest("http://example.com/b")]
+    assert stats.stats() == {
+        "hits": 1, "misses": 2, "hit_rate": 0.3333, "evicted": 0
+    }
+
+
+@pytest.mark.asyncio
+async def test_only_old_unused_codes_are_evicted(session, codes, stats):
+    user = User(username="qrowner", email="qrowner@example.com",
+                password="password")
+    session.add(user)
+    await session.flush()
+    old = datetime.now() - timedelta(days=2)
+    session.add_all([
+        QrCode(digest="used", url="/media/used.png", last_used_at=old),
+        QrCode(digest="unused", url="/media/unused.png", last_used_at=old),
+        QrCode(digest="fresh", url="/media/fresh.png"),
+        Image(url="http://example.com/a.jpg", description="qr",
+              qr_code_view="/media/used.png", user_id=user.id),
+    ])
+    await session.commit()
+
+    evicted = await evict_orphan_qr_codes(session, grace=3600)
+
+    assert evicted == ["/media/unused.png"]
+    assert set(await session.scalars(select(QrCode.digest))) == {
+        "used", "fresh"
+    }
+    assert stats.evicted == 1
+    await session.delete(user)
+    await session.commit()
+
+
+def test_repeated_transformation_reuses_the_code(client, codes, stats):
+    user = {"username": "qrmaker", "email": "qrmaker@example.com",
+            "password": "qrpass"}
+    client.post("/api/auth/signup", json=user)
+    login = client.post("/api/auth/login", data={
+        "username": user["email"], "password": user["password"]
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    image = client.post(
+        "/photoshare/images/add_from_pc", headers=headers,
+        params={"description": "qr"},
+        files={"file": (
+            "photo.png", b"\x89PNG\r\n\x1a\npng bytes", "image/png"
+        )}
+    ).json()
+
+    results = []
+    for _ in range(2):
+        job = client.post(
+            f"/photoshare/images/{image['id']}", params={"choice": 2},
+            headers=headers
+        ).json()
+        results.append(client.get(
+            f"/photoshare/jobs/{job['id']}", headers=headers
+        ).json()["result"]["qr_code_view"])
+
+    assert results[0] == results[1]
+    assert qr_digest(client.get(
+        f"/photoshare/images/{image['id']}"
+    ).json()["url_view"]) in results[0]
+    assert (stats.hits, stats.misses) == (1, 1)
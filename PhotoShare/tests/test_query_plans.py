@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, event
+
+from photoshare.database.models import Base, Comment, Image, Tag, User
+from photoshare.repository.comment import read_comments_func
+from photoshare.repository.images import (
+    get_feed_func, get_image_func, rate_images_func,
+    search_images_by_tags_func, search_images_by_user_func
+)
+from photoshare.repository.users import get_user_by_username
+from tests.conftest import async_engine, engine
+
+
+@pytest_asyncio.fixture
+async def seeded(session):
+    users = [
+        User(username=f"planner{i}", email=f"planner{i}@example.com",
+             password="password", role="admin")
+        for i in range(5)
+    ]
+    tags = [Tag(name=f"plantag{i}") for i in range(10)]
+    session.add_all(users + tags)
+    await session.flush()
+    start = datetime(2024, 1, 1)
+    images = []
+    for i in range(200):
+        image = Image(
+            url=f"http://example.com/plan/{i}.jpg", description=f"plan {i}",
+            rate=i % 100, created_at=start + timedelta(minutes=i),
+            user_id=users[i % 5].id
+        )
+        image.tags = [tags[i % 10], tags[(i + 3) % 10]]
+        image.comments = [
+            Comment(text="comment", user_id=users[0].id) for _ in range(2)
+        ]
+        images.append(image)
+    session.add_all(images)
+    await session.commit()
+    yield users, tags, images
+    await session.execute(delete(Comment))
+    await session.execute(delete(Image))
+    for item in users + tags:
+        await session.delete(item)
+    await session.commit()
+
+
+def plan(statement, parameters) -> list[str]:
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters
+        ).all()
+    return [row[-1] for row in rows]
+
+
+def is_full_scan(step: str) -> bool:
+    # "SCAN images" reads the whole table, "SCAN images USING INDEX ..."
+    # walks an index in order and stops at the LIMIT. Scans of subqueries
+    # only read rows that an index already found.
+    words = step.split()
+    return (
+        words[0] == "SCAN" and words[1] in Base.metadata.tables
+        and "INDEX" not in step
+    )
+
+
+def sorts_in_memory(statement: str, steps: list[str]) -> bool:
+    # Keyset pages must be read in index order; grouped results, like the
+    # tag matches, can only be sorted after grouping.
+    return (
+        "USE TEMP B-TREE FOR ORDER BY" in steps
+        and "GROUP BY" not in statement
+    )
+
+
+async def hot_queries(db, users, tags, images):
+    feed, cursor = await get_feed_func(db, limit=20)
+    await get_feed_func(db, cursor, 20)
+    for order in ("asc", "desc"):
+        page, cursor = await rate_images_func(db, order, limit=20)
+        await rate_images_func(db, order, cursor, 20)
+    await get_image_func(db, images[0].id)
+    for mode in ("any", "all"):
+        await search_images_by_tags_func(
+            db, [tags[0].name, tags[3].name], mode
+        )
+    await search_images_by_user_func(db, users[1].username)
+    await get_user_by_username(db, users[2].username)
+    await read_comments_func(images[3].id, db)
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes(session, seeded):
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        executed.append((statement, parameters))
+
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute",
+        before_cursor_execute
+    )
+    try:
+        await hot_queries(session, *seeded)
+    finally:
+        event.remove(
+            async_engine.sync_engine, "before_cursor_execute",
+            before_cursor_execute
+        )
+
+    assert executed
+    scans = {}
+    for statement, parameters in executed:
+        steps = plan(statement, parameters)
+        if any(map(is_full_scan, steps)) or sorts_in_memory(statement, steps):
+            scans[statement] = steps
+    assert not scans, scans
@@ -0,0 +1,204 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import Insert, delete, func, insert, select
+
+from photoshare.database.models import Comment, Image, ImageReaction, User
+from photoshare.repository.reactions import (
+    DISLIKE, LIKE, _counters_update, set_reaction_func
+)
+from tests.conftest import TestingSessionLocal
+
+
+@pytest_asyncio.fixture
+async def image(session):
+    users = [
+        User(username=f"reactor{i}", email=f"reactor{i}@example.com",
+             password="password")
+        for i in range(8)
+    ]
+    session.add_all(users)
+    await session.flush()
+    image = Image(
+        url="http://example.com/hot.jpg", description="hot",
+        user_id=users[0].id
+    )
+    session.add(image)
+    await session.commit()
+    image.users = users
+    yield image
+    await session.execute(delete(ImageReaction))
+    await session.delete(image)
+    for user in users:
+        await session.delete(user)
+    await session.commit()
+
+
+def test_new_image_counters_start_at_zero():
+    image = Image(url="http://example.com/a.jpg", description="a")
+
+    assert image.likes == 0
+    assert image.dislikes == 0
+
+
+@pytest.mark.asyncio
+async def test_like_is_idempotent(session, image):
+    user = image.users[1]
+
+    await set_reaction_func(session, image.id, user, LIKE)
+    result = await set_reaction_func(session, image.id, user, LIKE)
+
+    assert result == {
+        "image_id": image.id, "reaction": LIKE,
+        "likes": 1, "dislikes": 0, "rate": 100.0
+    }
+
+
+@pytest.mark.asyncio
+async def test_dislike_replaces_like(session, image):
+    user = image.users[1]
+    await set_reaction_func(session, image.id, user, LIKE)
+
+    result = await set_reaction_func(session, image.id, user, DISLIKE)
+
+    assert (result["likes"], result["dislikes"]) == (0, 1)
+    assert result["rate"] == 0.0
+    reactions = (await session.scalars(select(ImageReaction.value))).all()
+    assert reactions == [DISLIKE]
+
+
+@pytest.mark.asyncio
+async def test_unset_reaction(session, image):
+    first, second = image.users[1:3]
+    await set_reaction_func(session, image.id, first, LIKE)
+    await set_reaction_func(session, image.id, second, DISLIKE)
+
+    result = await set_reaction_func(session, image.id, first, 0)
+    again = await set_reaction_func(session, image.id, first, 0)
+
+    assert (result["likes"], result["dislikes"]) == (0, 1)
+    assert again == result
+
+
+@pytest.mark.asyncio
+async def test_rate_is_computed_in_sql(session, image):
+    for user, value in zip(image.users[1:4], (LIKE, LIKE, DISLIKE)):
+        result = await set_reaction_func(session, image.id, user, value)
+
+    assert result["rate"] == 66.7
+    stored = await session.scalar(
+        select(Image.rate).where(Image.id == image.id)
+    )
+    assert stored == 66.7
+
+
+@pytest.mark.asyncio
+async def test_reaction_racing_an_insert_flips_it(session, image, monkeypatch):
+    user = image.users[1]
+    scalar = session.scalar
+    raced = []
+
+    async def racing_scalar(statement, *args, **kwargs):
+        if isinstance(statement, Insert) and not raced:
+            raced.append(statement)
+            # A dislike of the same user lands between the flip and insert
+            await session.execute(insert(ImageReaction).values(
+                image_id=image.id, user_id=user.id, value=DISLIKE
+            ))
+            await session.execute(_counters_update(image.id, 0, DISLIKE))
+        return await scalar(statement, *args, **kwargs)
+
+    monkeypatch.setattr(session, "scalar", racing_scalar)
+    result = await set_reaction_func(session, image.id, user, LIKE)
+    monkeypatch.setattr(session, "scalar", scalar)
+
+    assert raced
+    assert result == {
+        "image_id": image.id, "reaction": LIKE,
+        "likes": 1, "dislikes": 0, "rate": 100.0
+    }
+    assert await session.scalar(
+        select(ImageReaction.value).where(ImageReaction.image_id == image.id)
+    ) == LIKE
+
+
+@pytest.mark.asyncio
+async def test_reaction_to_missing_image(session, image):
+    with pytest.raises(HTTPException) as exc_info:
+        await set_reaction_func(session, image.id + 1000, image.users[1], LIKE)
+
+    assert exc_info.value.status_code == 404
+    assert await session.scalar(select(func.count(ImageReaction.user_id))) == 0
+
+
+@pytest.mark.asyncio
+async def test_deleted_image_takes_its_rows_along(session, image):
+    owner, fan = image.users[:2]
+    doomed = Image(
+        url="http://example.com/doomed.jpg", description="doomed",
+        user_id=owner.id
+    )
+    session.add(doomed)
+    await session.flush()
+    session.add(Comment(text="bye", image_id=doomed.id, user_id=fan.id))
+    await session.commit()
+    await set_reaction_func(session, doomed.id, fan, LIKE)
+
+    # ON DELETE CASCADE in the database, not the ORM
+    await session.execute(delete(Image).where(Image.id == doomed.id))
+    await session.commit()
+
+    for model in (Comment, ImageReaction):
+        assert await session.scalar(
+            select(func.count()).select_from(model)
+            .where(model.image_id == doomed.id)
+        ) == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reactions_keep_counters_exact(image):
+    async def react(user, value):
+        async with TestingSessionLocal() as db:
+            await set_reaction_func(db, image.id, user, value)
+
+    values = [LIKE, DISLIKE, LIKE]
+    await asyncio.gather(*(
+        react(user, value)
+        for user in image.users for value in values
+    ))
+
+    async with TestingSessionLocal() as db:
+        stored = await db.get(Image, image.id)
+        reactions = (await db.scalars(
+            select(ImageReaction.value)
+            .where(ImageReaction.image_id == image.id)
+        )).all()
+    assert len(reactions) == len(image.users)
+    assert stored.likes_count == reactions.count(LIKE)
+    assert stored.dislikes_count == reactions.count(DISLIKE)
+
+
+@pytest.mark.asyncio
+async def test_reaction_routes(client, image):
+    user = {"username": "reactuser", "email": "react@example.com",
+            "password": "reactpass"}
+    client.post("/api/auth/signup", json=user)
+    login = client.post("/api/auth/login", data={
+        "username": user["email"], "password": user["password"]
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    url = f"/photoshare/images/{image.id}"
+
+    liked = client.put(f"{url}/like", headers=headers)
+    disliked = client.put(f"{url}/dislike", headers=headers)
+    unset = client.delete(f"{url}/reaction", headers=headers)
+
+    assert liked.status_code == 200, liked.text
+    assert liked.json()["likes"] == 1
+    assert disliked.json()["reaction"] == DISLIKE
+    assert disliked.json()["dislikes"] == 1
+    assert unset.json()["likes"] == unset.json()["dislikes"] == 0
+    assert client.put(f"{url}/like").status_code == 401
+    assert client.get(url).json()["likes"] == 0
@@ -1,5 +1,6 @@
 import pytest
-from sqlalchemy.orm import Session
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
 from photoshare.database.models import User, Image
 from photoshare.database.models import Base
 from photoshare.schemas import UserModel, UserUpdate
@@ -13,51 +14,19 @@ from photoshare.repository.users import (
     update_user_info,
 )
 from photoshare.database.db import get_db
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
 from main import app
 from fastapi.testclient import TestClient
+from tests.conftest import TestingSessionLocal
 
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-@pytest.fixture(scope="module")
-def db_session():
-    # Create the database
-
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-
-    db = TestingSessionLocal()
-    try:
+@pytest_asyncio.fixture
+async def db_session(database):
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
-
-@pytest.fixture(scope="module")
-def client(session):
-    # Dependency override
-
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
-
-    app.dependency_overrides[get_db] = override_get_db
-
-    yield TestClient(app)
 
 
 @pytest.mark.asyncio
-async def test_create_user(db_session: Session):
+async def test_create_user(db_session: AsyncSession):
     # Подготовка
     user_data = UserModel(username="test_user", email="test@example.com", password="password")
     
@@ -72,7 +41,7 @@ async def test_create_user(db_session: Session):
 
 
 @pytest.mark.asyncio
-async def test_get_user_by_email(db_session: Session):
+async def test_get_user_by_email(db_session: AsyncSession):
     # Подготовка
     email = "test@example.com"
     
@@ -85,7 +54,7 @@ async def test_get_user_by_email(db_session: Session):
 
 
 @pytest.mark.asyncio
-async def test_update_token(db_session: Session):
+async def test_update_token(db_session: AsyncSession):
     # Подготовка
     email = "test@example.com"
     
@@ -103,7 +72,7 @@ async def test_update_token(db_session: Session):
 
 
 @pytest.mark.asyncio
-async def test_update_user_role(db_session: Session):
+async def test_update_user_role(db_session: AsyncSession):
     email = "test@example.com"
     user = await get_user_by_email(email, db_session)
 
@@ -117,13 +86,13 @@ async def test_update_user_role(db_session: Session):
 
 
 @pytest.mark.asyncio
-async def test_set_user_active_status(db_session: Session):
+async def test_set_user_active_status(db_session: AsyncSession):
     # Подготовка
     email = "test@example.com"
     user = await get_user_by_email(email, db_session)
     
     # Действие
-    updated_user = set_user_active_status(db_session, user.id, True)
+    updated_user = await set_user_active_status(db_session, user.id, True)
     
     # Проверка
     assert updated_user
@@ -131,21 +100,21 @@ async def test_set_user_active_status(db_session: Session):
 
 
 @pytest.mark.asyncio
-async def test_get_user_by_username(db_session: Session):
+async def test_get_user_by_username(db_session: AsyncSession):
     # Подготовка
     username = "test_user"
     
     # Действие
-    retrieved_user, image_count = get_user_by_username(db_session, username)
+    retrieved_user = await get_user_by_username(db_session, username)
     
     # Проверка
     assert retrieved_user
     assert retrieved_user.username == username
-    assert image_count == 0  # Поскольку пользователь только что создан, у него нет изображений
+    assert retrieved_user.images_count == 0  # Поскольку пользователь только что создан, у него нет изображений
 
 
 @pytest.mark.asyncio
-async def test_update_user_info(db_session: Session):
+async def test_update_user_info(db_session: AsyncSession):
     # Подготовка
     email = "test@example.com"
     user = await get_user_by_email(email, db_session)
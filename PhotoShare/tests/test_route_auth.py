@@ -1,22 +1,25 @@
 import pytest
+import pytest_asyncio
 import asyncio
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from photoshare.database.models import User
 from photoshare.services.auth import auth_service
 from photoshare.repository.users import create_user, get_user_by_email
 
 
-@pytest.fixture(scope="module")
-def admin_user(session: Session, admin_user_data):
+@pytest_asyncio.fixture
+async def admin_user(session: AsyncSession, admin_user_data):
     user_data = admin_user_data.copy()
     user_data["password"] = auth_service.get_password_hash(user_data["password"])
-    db_user = create_user(session, user_data)
-    session.commit()
+    db_user = User(**user_data, role="admin")
+    session.add(db_user)
+    await session.commit()
     return db_user
 
 @pytest.mark.asyncio
-async def test_signup(client: TestClient, session: Session, test_user_data):
+async def test_signup(client: TestClient, session: AsyncSession, test_user_data):
     response = client.post("/api/auth/signup", json=test_user_data)
     print(response.json())  # Debugging line
     assert response.status_code == 201
@@ -29,15 +32,15 @@ async def test_signup(client: TestClient, session: Session, test_user_data):
     assert auth_service.verify_password(test_user_data["password"], user.password)
 
 @pytest.mark.asyncio
-async def test_login(client: TestClient, session: Session, test_user_data):
+async def test_login(client: TestClient, session: AsyncSession, test_user_data):
     # Ensure the user is created before trying to login
     user = await get_user_by_email(test_user_data["email"], session)
     if not user:
         # Create the user if it doesn't exist
         user_data = test_user_data.copy()
         user_data["password"] = auth_service.get_password_hash(user_data["password"])
-        create_user(session, user_data)
-        session.commit()
+        session.add(User(**user_data))
+        await session.commit()
 
     response = client.post("/api/auth/login", data={"username": test_user_data["email"], "password": test_user_data["password"]})
     print(response.json())  # Debugging line
@@ -55,7 +58,7 @@ def test_invalid_login(client: TestClient):
     assert data["detail"] == "Invalid email"  # Adjusted to the actual error message
 
 @pytest.mark.asyncio
-async def test_refresh_token(client: TestClient, session: Session, test_user_data):
+async def test_refresh_token(client: TestClient, session: AsyncSession, test_user_data):
     login_data = await test_login(client, session, test_user_data)
     refresh_token = login_data["refresh_token"]
     headers = {"Authorization": f"Bearer {refresh_token}"}
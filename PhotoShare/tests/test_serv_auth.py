@@ -20,14 +20,8 @@ class MockDB:
             return self.user
         return None
     
-    def query(self, model):
-        return self
-    
-    def filter(self, condition):
-        return self
-    
-    # Метод для эмуляции метода first
-    async def first(self):
+    # Метод для эмуляции метода scalar
+    async def scalar(self, statement):
         # Возвращаем первый элемент, в данном случае, просто возвращаем user
         return self.user
 
@@ -51,15 +45,15 @@ async def test_decode_refresh_token(auth_service):
 
 @pytest.mark.asyncio
 async def test_get_current_user(mock_db, auth_service):
-    user = User(id=1, email="test@example.com", password="password")
+    user = User(
+        id=1, email="test@example.com", password="password", is_active=True
+    )
     mock_db = MockDB(user=user)
     token = await auth_service.create_access_token({"sub": user.email})
     print(token)
     current_user = await auth_service.get_current_user(token, db=mock_db)
     print(current_user)
-    current_user_data = await current_user  # Await the coroutine to get the actual user object
-    print(current_user_data)
-    assert current_user_data.email == "test@example.com"
+    assert current_user.email == "test@example.com"
 
 @pytest.mark.asyncio
 async def test_get_current_user_raises_unauthorized(mock_db, auth_service):
@@ -0,0 +1,135 @@
+import os
+from io import BytesIO
+
+import pytest
+
+from photoshare.services.ingest import sniff_image_type
+from photoshare.services.storage import (
+    CloudinaryStorage, LocalStorage, storage
+)
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(str(tmp_path), "/files/")
+
+
+def test_local_upload_round_trip(local, tmp_path):
+    data = os.urandom(300 * 1024)
+
+    url = local.upload(BytesIO(data), ".JPG")
+
+    assert url.startswith("/files/") and url.endswith(".jpg")
+    assert local.owns(url)
+    stored = os.listdir(tmp_path)
+    assert stored == [url.rsplit("/", 1)[1]]
+    assert (tmp_path / stored[0]).read_bytes() == data
+    assert local.transform_url(url, 3) == f"/files/t/3/{stored[0]}"
+
+    local.delete(url)
+    local.delete(url)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_local_names_stay_inside_the_root(local):
+    url = local.upload(BytesIO(b"data"), "/../../x.py")
+
+    assert "." not in url.rsplit("/", 1)[1]
+    for foreign in (None, "http://example.com/a.jpg", "/files/../a.jpg",
+                    "/files/.hidden", "/files/"):
+        assert not local.owns(foreign), foreign
+        with pytest.raises(ValueError):
+            local.transform_url(foreign, 1)
+
+
+def test_cloudinary_urls():
+    cloudinary = CloudinaryStorage(timeout=1)
+    url = "http://res.cloudinary.com/demo/image/upload/v1/sample.jpg"
+
+    assert cloudinary.owns(url)
+    assert not cloudinary.owns("http://example.com/sample.jpg")
+    assert "c_thumb" in cloudinary.transform_url(url, 1)
+    assert "/sample" in cloudinary.transform_url(url, 2)
+
+
+@pytest.mark.parametrize("head", [
+    b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF89a", b"RIFF\0\0\0\0WEBP"
+])
+def test_cloudinary_owns_every_accepted_type(head):
+    cloudinary = CloudinaryStorage(timeout=1)
+    suffix = sniff_image_type(head)
+    url = f"http://res.cloudinary.com/demo/image/upload/v1/sample{suffix}"
+
+    assert cloudinary.owns(url)
+    assert "/sample" in cloudinary.transform_url(url, 3)
+
+
+def test_suite_uses_local_storage():
+    assert isinstance(storage, LocalStorage)
+
+
+def test_uploaded_image_is_served_and_deleted(client):
+    user = {"username": "storer", "email": "storer@example.com",
+            "password": "storerpass"}
+    client.post("/api/auth/signup", json=user)
+    login = client.post("/api/auth/login", data={
+        "username": user["email"], "password": user["password"]
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    created = client.post(
+        "/photoshare/images/add_from_pc", headers=headers,
+        params={"description": "stored", "tags": "disk"},
+        files={"file": (
+            "photo.png", b"\x89PNG\r\n\x1a\npng bytes", "image/png"
+        )}
+    )
+
+    assert created.status_code == 200, created.text
+    url = created.json()["url"]
+    assert url.endswith(".png")
+    assert client.get(url).content == b"\x89PNG\r\n\x1a\npng bytes"
+
+    deleted = client.delete(
+        f"/photoshare/images/{created.json()['id']}", headers=headers
+    )
+
+    assert deleted.status_code == 200, deleted.text
+    assert client.get(url).status_code == 404
+
+
+def test_duplicate_uploads_share_the_stored_file(client):
+    data = b"\xff\xd8\xff" + os.urandom(4096)
+    owners = []
+    for name in ("dupeone", "dupetwo"):
+        user = {"username": name, "email": f"{name}@example.com",
+                "password": "dupepass"}
+        client.post("/api/auth/signup", json=user)
+        login = client.post("/api/auth/login", data={
+            "username": user["email"], "password": user["password"]
+        })
+        headers = {
+            "Authorization": f"Bearer {login.json()['access_token']}"
+        }
+        image = client.post(
+            "/photoshare/images/add_from_pc", headers=headers,
+            params={"description": f"from {name}", "tags": name},
+            files={"file": ("photo.jpg", data, "image/jpeg")}
+        ).json()
+        owners.append((headers, image))
+
+    (first_headers, first), (second_headers, second) = owners
+    assert first["url"] == second["url"]
+    assert first["id"] != second["id"]
+    assert second["description"] == "from dupetwo"
+    assert [tag["name"] for tag in second["tags"]] == ["dupetwo"]
+    assert client.get(first["url"]).content == data
+
+    client.delete(f"/photoshare/images/{first['id']}", headers=first_headers)
+    assert client.get(second["url"]).content == data
+
+    client.delete(
+        f"/photoshare/images/{second['id']}", headers=second_headers
+    )
+    assert client.get(second["url"]).status_code == 404
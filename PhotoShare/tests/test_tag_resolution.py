@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select
+
+from photoshare.database.models import Image, Tag, User, image_m2m_tag
+from photoshare.repository.images import load_image_func
+from photoshare.repository.tags import resolve_tag_ids
+from photoshare.schemas import ImageBase
+from photoshare.services.cache import TagCache
+from tests.conftest import TestingSessionLocal
+
+
+@pytest_asyncio.fixture
+async def user(session):
+    user = User(username="tagger", email="tagger@example.com",
+                password="password")
+    session.add(user)
+    await session.commit()
+    yield user
+    await session.execute(delete(image_m2m_tag))
+    await session.execute(delete(Image))
+    await session.execute(delete(Tag))
+    await session.delete(user)
+    await session.commit()
+
+
+async def upload(db, user, tags):
+    image = ImageBase(url="http://example.com/t.jpg", description="tagged",
+                      created_at=datetime.now())
+    return await load_image_func(db, image, tags, user)
+
+
+async def tag_names(db):
+    return sorted(await db.scalars(select(Tag.name)))
+
+
+@pytest.mark.asyncio
+async def test_new_and_existing_tags_attached_once(session, user):
+    session.add(Tag(name="old"))
+    await session.commit()
+
+    image = await upload(session, user, ["old", "new", "old", "", "other"])
+
+    assert sorted(tag.name for tag in image.tags) == ["new", "old", "other"]
+    assert await tag_names(session) == ["new", "old", "other"]
+
+
+@pytest.mark.asyncio
+async def test_query_count_does_not_grow_with_tags(
+    session, user, query_counter
+):
+    await upload(session, user, ["one"])
+    single = len(query_counter)
+    query_counter.clear()
+
+    await upload(session, user, ["two", "three", "four", "five", "six"])
+
+    assert len(query_counter) == single, query_counter
+
+
+@pytest.mark.asyncio
+async def test_cached_tags_skip_the_lookup(
+    session, user, query_counter, empty_tag_cache
+):
+    await upload(session, user, ["cached"])
+    query_counter.clear()
+
+    await upload(session, user, ["cached"])
+
+    assert "cached" in empty_tag_cache.get_many(["cached"])
+    assert not any(
+        statement.startswith("SELECT tags.name, tags.id")
+        for statement in query_counter
+    ), query_counter
+
+
+@pytest.mark.asyncio
+async def test_stale_cached_id_is_resolved_again(
+    session, user, empty_tag_cache
+):
+    decoy, real = Tag(name="decoy"), Tag(name="real")
+    session.add_all([decoy, real])
+    await session.commit()
+    # As if "real" was renamed to "decoy" by another process
+    empty_tag_cache.put_many({"real": decoy.id})
+
+    image = await upload(session, user, ["real"])
+
+    assert [tag.id for tag in image.tags] == [real.id]
+    assert empty_tag_cache.get_many(["real"]) == {"real": real.id}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_uploads_share_a_new_tag(session, user):
+    async def upload_in_own_session():
+        async with TestingSessionLocal() as db:
+            image = await upload(db, user, ["fresh", "shared"])
+            return sorted(tag.name for tag in image.tags)
+
+    results = await asyncio.gather(
+        *(upload_in_own_session() for _ in range(4))
+    )
+
+    assert results == [["fresh", "shared"]] * 4
+    count = await session.scalar(
+        select(func.count()).select_from(Tag)
+        .filter(Tag.name.in_(["fresh", "shared"]))
+    )
+    assert count == 2
+
+
+@pytest.mark.asyncio
+async def test_resolve_tag_ids_does_not_commit(user):
+    async with TestingSessionLocal() as db:
+        await resolve_tag_ids(["uncommitted"], db)
+        await db.rollback()
+
+        assert await tag_names(db) == []
+
+
+def test_tag_cache_evicts_least_recently_used():
+    cache = TagCache(2)
+    cache.put_many({"a": 1, "b": 2})
+    cache.get_many(["a"])
+
+    cache.put_many({"c": 3})
+    cache.discard("c")
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1}
@@ -0,0 +1,97 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from photoshare.services import auth
+from photoshare.services.cache import TokenCache
+
+
+def claims(ttl=60, scope="access_token"):
+    return {"sub": "user@example.com", "exp": time.time() + ttl,
+            "scope": scope}
+
+
+def test_lru_evicts_least_recently_used():
+    cache = TokenCache(2)
+    cache.put("a", claims())
+    cache.put("b", claims())
+    cache.get("a")
+
+    cache.put("c", claims())
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats() == {
+        "hits": 3, "misses": 1, "hit_rate": 0.75, "size": 2, "maxsize": 2
+    }
+
+
+def test_expired_claims_are_dropped():
+    cache = TokenCache(4)
+    cache.put("token", claims(ttl=-1))
+
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_keys_are_token_hashes():
+    cache = TokenCache(4)
+    cache.put("secret.jwt.value", claims())
+
+    assert all(len(key) == 32 for key in cache._entries)
+    assert "secret.jwt.value" not in cache._entries
+
+
+def test_zero_size_disables_cache():
+    cache = TokenCache(0)
+    cache.put("token", claims())
+
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_reused_token_is_decoded_once(monkeypatch):
+    monkeypatch.setattr(auth, "token_cache", TokenCache(8))
+    token = await auth.auth_service.create_access_token(
+        {"sub": "user@example.com"}
+    )
+
+    with patch.object(auth.jwt, "decode", wraps=auth.jwt.decode) as decode:
+        emails = [auth.auth_service.decode_access_token(token)
+                  for _ in range(3)]
+
+    assert emails == ["user@example.com"] * 3
+    assert decode.call_count == 1
+    assert auth.token_cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_refresh_token_is_still_rejected(monkeypatch):
+    monkeypatch.setattr(auth, "token_cache", TokenCache(8))
+    token = await auth.auth_service.create_refresh_token(
+        {"sub": "user@example.com"}
+    )
+
+    assert auth.auth_service.decode_access_token(token) is None
+    assert auth.auth_service.decode_access_token(token) is None
+    assert auth.token_cache.stats()["hits"] == 1
+    assert auth.auth_service.decode_access_token("not.a.jwt") is None
+
+
+def test_auth_cache_stats_route(client, admin_user_data):
+    client.post("/api/auth/signup", json=admin_user_data)
+    login = client.post("/api/auth/login", data={
+        "username": admin_user_data["email"],
+        "password": admin_user_data["password"]
+    })
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    response = client.get("/api/metrics/auth_cache", headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert {"hits", "misses", "hit_rate", "size", "maxsize"} <= (
+        response.json().keys()
+    )
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+from photoshare.repository.images import _store
+from photoshare.services.uploads import UploadExecutor, UploadRejected
+
+
+def blocking_upload(release: threading.Event, started: list):
+    def upload(name):
+        started.append(name)
+        release.wait(5)
+        return {"url": f"http://example.com/{name}.jpg"}
+    return upload
+
+
+async def settle(executor, running):
+    for _ in range(100):
+        if executor.status()["running"] == running:
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_queue_is_bounded():
+    executor = UploadExecutor(workers=2, queue_size=1, timeout=5)
+    release, started = threading.Event(), []
+    upload = blocking_upload(release, started)
+
+    waiting = [
+        asyncio.ensure_future(executor.run(upload, i)) for i in range(3)
+    ]
+    await settle(executor, 2)
+    status = executor.status()
+    assert (status["running"], status["queued"]) == (2, 1)
+
+    with pytest.raises(UploadRejected):
+        await executor.run(upload, "extra")
+    release.set()
+
+    results = await asyncio.gather(*waiting)
+    assert results[0]["url"] == "http://example.com/0.jpg"
+    status = executor.status()
+    assert (status["completed"], status["rejected"]) == (3, 1)
+    assert (status["running"], status["queued"]) == (0, 0)
+    assert status["latency_max_ms"] >= status["latency_avg_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_timed_out_upload_keeps_its_slot():
+    executor = UploadExecutor(workers=1, queue_size=0, timeout=0.05)
+    release, started = threading.Event(), []
+    upload = blocking_upload(release, started)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await executor.run(upload, "slow")
+    # The worker is still busy with the abandoned upload
+    with pytest.raises(UploadRejected):
+        await executor.run(upload, "next")
+    release.set()
+    await settle(executor, 0)
+    await asyncio.sleep(0.01)
+
+    assert (await executor.run(upload, "next"))["url"].endswith("next.jpg")
+    assert executor.status()["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_are_counted():
+    executor = UploadExecutor(workers=1, queue_size=0, timeout=1)
+
+    def broken():
+        raise ValueError("upstream error")
+
+    with pytest.raises(ValueError):
+        await executor.run(broken)
+
+    assert executor.status()["failed"] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error, status_code", [
+    (UploadRejected("full"), 503), (asyncio.TimeoutError(), 504)
+])
+async def test_upload_errors_become_http_errors(error, status_code):
+    with patch(
+        "photoshare.repository.images.upload_executor.run", side_effect=error
+    ):
+        with pytest.raises(HTTPException) as raised:
+            await _store(print, b"image")
+
+    assert raised.value.status_code == status_code
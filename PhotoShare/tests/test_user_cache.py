@@ -0,0 +1,108 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+from sqlalchemy import delete
+
+from photoshare.database.models import User
+from photoshare.repository.users import (
+    set_user_active_status, update_user_info, update_user_role
+)
+from photoshare.schemas import UserUpdate
+from photoshare.services import cache
+from photoshare.services.auth import auth_service
+from photoshare.services.cache import MemoryCache
+
+
+@pytest_asyncio.fixture
+async def user(session):
+    user = User(
+        username="cached", email="cached@example.com", password="secret",
+        role="user", is_active=True
+    )
+    session.add(user)
+    await session.commit()
+    yield user
+    await session.execute(delete(User).where(User.id == user.id))
+    await session.commit()
+
+
+async def current_user(session, email="cached@example.com"):
+    token = await auth_service.create_access_token({"sub": email})
+    return await auth_service.get_current_user(token, session)
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_expires(monkeypatch):
+    backend = MemoryCache()
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+
+    await backend.set("key", "value", ex=10)
+    assert await backend.get("key") == "value"
+    now[0] += 10
+    assert await backend.get("key") is None
+    assert await backend.delete("key") == 0
+
+
+@pytest.mark.asyncio
+async def test_second_request_skips_database(session, user, query_counter):
+    first = await current_user(session)
+    queries = len(query_counter)
+    second = await current_user(session)
+
+    assert queries == 1
+    assert len(query_counter) == queries
+    assert (second.id, second.role, second.is_active) == (user.id, "user", True)
+    assert second.password is None
+    assert first.email == second.email
+
+
+@pytest.mark.asyncio
+async def test_ban_takes_effect_immediately(session, user):
+    await current_user(session)
+
+    await set_user_active_status(session, user.id, False)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await current_user(session)
+    assert exc_info.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_role_change_takes_effect_immediately(session, user):
+    await current_user(session)
+
+    await update_user_role(session, user.id, "moderator")
+
+    assert (await current_user(session)).role == "moderator"
+
+
+@pytest.mark.asyncio
+async def test_email_change_drops_both_entries(session, user):
+    await current_user(session)
+
+    await update_user_info(session, UserUpdate(
+        username="renamed", email="renamed@example.com", password="secret"
+    ), user)
+
+    with pytest.raises(HTTPException):
+        await current_user(session)
+    assert (await current_user(session, "renamed@example.com")).username == (
+        "renamed"
+    )
+
+
+@pytest.mark.asyncio
+async def test_redis_outage_falls_back_to_database(
+    session, user, memory_user_cache
+):
+    broken = AsyncMock()
+    broken.get.side_effect = ConnectionError("down")
+    broken.set.side_effect = ConnectionError("down")
+    memory_user_cache.backend = broken
+
+    assert (await current_user(session)).id == user.id
+    broken.set.assert_awaited_once()
@@ -0,0 +1,120 @@
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select
+
+from photoshare.database.models import Comment, Image, ImageReaction, User
+from photoshare.repository.comment import (
+    create_comment_func, delete_comment_func
+)
+from photoshare.repository.images import delete_image_func, load_image_func
+from photoshare.repository.reactions import (
+    DISLIKE, LIKE, set_reaction_func
+)
+from photoshare.schemas import CommentCreate, ImageBase
+
+COUNTERS = ("images_count", "comments_count", "likes_received")
+
+
+@pytest_asyncio.fixture
+async def users(session):
+    users = [
+        User(username=f"counted{i}", email=f"counted{i}@example.com",
+             password="password", role="admin" if i == 0 else "user")
+        for i in range(3)
+    ]
+    session.add_all(users)
+    await session.commit()
+    yield users
+    await session.execute(delete(ImageReaction))
+    await session.execute(delete(Comment))
+    await session.execute(delete(Image))
+    for user in users:
+        await session.delete(user)
+    await session.commit()
+
+
+async def counters(session, user):
+    row = (await session.execute(
+        select(*(getattr(User, name) for name in COUNTERS))
+        .filter(User.id == user.id)
+    )).one()
+    return tuple(row)
+
+
+async def upload(session, user):
+    image = ImageBase(url="http://example.com/c.jpg", description="counted",
+                      created_at=datetime.now())
+    return await load_image_func(session, image, [], user)
+
+
+@pytest.mark.asyncio
+async def test_counters_follow_uploads_comments_and_likes(session, users):
+    owner, fan, critic = users
+
+    image = await upload(session, owner)
+    await create_comment_func(image.id, CommentCreate(text="a"), session, fan)
+    await create_comment_func(image.id, CommentCreate(text="b"), session, fan)
+    await set_reaction_func(session, image.id, fan, LIKE)
+    await set_reaction_func(session, image.id, critic, LIKE)
+    await set_reaction_func(session, image.id, critic, LIKE)
+
+    assert await counters(session, owner) == (1, 0, 2)
+    assert await counters(session, fan) == (0, 2, 0)
+
+    await set_reaction_func(session, image.id, critic, DISLIKE)
+    await set_reaction_func(session, image.id, fan, 0)
+
+    assert await counters(session, owner) == (1, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_deleted_comment_is_uncounted(session, users):
+    owner, fan, _ = users
+    image = await upload(session, owner)
+    comment = await create_comment_func(
+        image.id, CommentCreate(text="a"), session, fan
+    )
+
+    await delete_comment_func(comment.id, session, owner)
+
+    assert await counters(session, fan) == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_deleted_image_is_uncounted(session, users):
+    owner, fan, critic = users
+    kept = await upload(session, owner)
+    image = await upload(session, owner)
+    for user in (fan, critic, owner):
+        await create_comment_func(
+            image.id, CommentCreate(text="a"), session, user
+        )
+        await set_reaction_func(session, image.id, user, LIKE)
+    await create_comment_func(kept.id, CommentCreate(text="b"), session, fan)
+    await set_reaction_func(session, kept.id, fan, LIKE)
+
+    await delete_image_func(session, image.id, owner)
+
+    assert await counters(session, owner) == (1, 0, 1)
+    assert await counters(session, fan) == (0, 1, 0)
+    assert await counters(session, critic) == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_profile_is_a_single_query(
+    client, session, users, query_counter
+):
+    owner, fan, _ = users
+    image = await upload(session, owner)
+    await set_reaction_func(session, image.id, fan, LIKE)
+    query_counter.clear()
+
+    response = client.get(f"/photoshare/user/{owner.username}")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["images_count"], data["comments_count"]) == (1, 0)
+    assert data["likes_received"] == 1
+    assert len(query_counter) == 1, query_counter